@@ -0,0 +1,116 @@
+import contextlib
+import multiprocessing as mp
+from ctypes import c_int, c_long
+import perfil
+import travas
+from logger import log
+from robot import MOVER, ATACAR, executa_ataque, executa_movimento
+
+"""
+Anel de intenções em memória compartilhada.
+Cada trabalhador reserva, com uma só aquisição do lock, os registros do lote
+de intenções do seu trecho de robôs e os preenche sem lock; o árbitro lê
+tudo o que foi escrito desde a última leitura. Como cada robô envia no
+máximo uma intenção por tick e o árbitro esvazia o anel a cada tick, a
+capacidade de um registro por robô basta. Com compartilhada=False (motor
+assíncrono), o anel é comum do processo e o lock não faz nada.
+"""
+class Intencoes():
+    CAMPOS = 3          # robô, tipo, alvo
+
+    def __init__(self, capacidade, compartilhada=True):
+        self.capacidade = capacidade
+        if compartilhada:
+            self.registros = mp.RawArray(c_int, self.CAMPOS * capacidade)
+            self.escrita = mp.RawValue(c_long, 0)
+            self.leitura = mp.RawValue(c_long, 0)
+            self.lock = mp.Lock()
+        else:
+            self.registros = (c_int * (self.CAMPOS * capacidade))()
+            self.escrita = c_long(0)
+            self.leitura = c_long(0)
+            self.lock = contextlib.nullcontext()
+
+    # Lote de tuplas (robô, tipo, alvo)
+    def publica(self, lote):
+        if not lote:
+            return
+        with self.lock:
+            inicio = self.escrita.value
+            self.escrita.value = inicio + len(lote)
+        for k, registro in enumerate(lote):
+            p = (inicio + k) % self.capacidade * self.CAMPOS
+            self.registros[p:p + self.CAMPOS] = registro
+
+    # Intenções escritas desde a última leitura (só o árbitro, entre ticks)
+    def consome(self):
+        fim = self.escrita.value
+        for pos in range(self.leitura.value, fim):
+            p = pos % self.capacidade * self.CAMPOS
+            yield self.registros[p:p + self.CAMPOS]
+        self.leitura.value = fim
+
+"""
+Árbitro dos movimentos e batalhas.
+Os robôs não escrevem no jogo: no tick, cada um só lê o estado e envia a sua
+intenção (mover para uma célula vizinha ou atacar um robô adjacente). No fim
+do tick, quando nenhum trabalhador está agindo, o árbitro (no processo do
+escalonador) aplica todas as intenções em uma passada determinística, na
+ordem dos índices dos robôs, com custo O(robôs):
+    - primeiro as batalhas: cada par luta uma vez só, mesmo que os dois
+      tenham se atacado no mesmo tick, e quem perdeu não age mais no tick
+    - depois os movimentos: se dois robôs querem a mesma célula, o de menor
+      índice fica com ela e o outro continua parado; baterias coletadas são
+      consumidas (e repostas, com BATTERY_RESPAWN) na mesma passada
+O resultado é publicado no próprio estado compartilhado (grid, posições,
+energia e flags) antes de o próximo tick começar. Com `fases` (ver
+perfil.py), o tempo de aplicar a intenção de cada robô conta como movimento
+dele, e o resto do tempo do processo fica na linha "árbitro".
+"""
+class Arbitro():
+    def __init__(self, grid, regioes, posicoes, indice, caminhos, livres, flags, flags_mutex, escalonador, num_robos, fases=None,
+                 compartilhada=True):
+        self.grid = grid
+        self.regioes = regioes
+        self.posicoes = posicoes
+        self.indice = indice
+        self.caminhos = caminhos
+        self.livres = livres
+        self.flags = flags
+        self.flags_mutex = flags_mutex
+        self.escalonador = escalonador
+        self.num_robos = num_robos
+        self.intencoes = Intencoes(num_robos, compartilhada)
+        self.linha = fases.linha("árbitro") if fases else None
+        self.cronometro = perfil.cronometro(fases, self.linha)
+
+    def resolve(self, tick):
+        self.cronometro.troca(perfil.MOVIMENTO, self.linha)
+
+        # Intenções do tick indexadas pelo robô (sem ordenação)
+        pedidos = [None] * self.num_robos
+        for robo, tipo, alvo in self.intencoes.consome():
+            pedidos[robo] = (tipo, alvo)
+
+        for i, pedido in enumerate(pedidos):
+            if pedido is not None and pedido[0] == ATACAR:
+                self.cronometro.troca(perfil.MOVIMENTO, i)
+                travas.define_robo(i)
+                executa_ataque(self.grid, self.regioes, self.posicoes, self.indice, self.livres,
+                               self.flags, self.flags_mutex, i, pedido[1])
+
+        for i, pedido in enumerate(pedidos):
+            if pedido is not None and pedido[0] == MOVER:
+                self.cronometro.troca(perfil.MOVIMENTO, i)
+                travas.define_robo(i)
+                executa_movimento(self.grid, self.regioes, self.posicoes, self.indice, self.caminhos, self.livres,
+                                  self.flags, self.flags_mutex, i, pedido[1])
+        # Os locks tomados fora da resolução voltam à linha dos outros processos
+        travas.define_robo(None)
+        self.cronometro.troca(perfil.SONO, self.linha)
+
+        robos_vivos = self.flags.vivos
+        if robos_vivos <= 1 and not self.flags.game_over:
+            self.flags.game_over = True
+            self.escalonador.encerra()
+            log("arena", f"Fim de jogo detectado no tick {tick} ({robos_vivos} robôs restantes).")
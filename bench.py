@@ -0,0 +1,257 @@
+"""
+Benchmarks da arena.
+
+    python3 bench.py regioes --processos 1 2 4 8
+
+Compara movimentos/s com um lock global (uma única faixa) e com locks por
+faixa de linhas, variando o número de processos movendo robôs.
+
+    python3 bench.py partidas --motor main v2 --robos 4 16 64 --grades 40x20 100x60 --saida antes.json
+    python3 bench.py compara antes.json depois.json
+
+Roda partidas completas (main.py, robot_v2.py e/ou motor_async.py) sem viewer e em
+velocidade máxima, variando número de robôs, tamanho do grid e densidade de
+barreiras e baterias. Cada partida roda num subprocesso próprio, com os
+parâmetros passados pelas variáveis ARENA_* (ver constants.py) e com os logs
+gravados num diretório temporário. Para cada partida são medidos
+movimentos/s, ticks/s, esperas e tempo esperando pelos locks das faixas,
+tempo até o vencedor e CPU por processo. O resultado pode ser salvo em JSON
+(com o commit atual) e comparado com o de outro commit.
+"""
+
+import argparse
+import json
+import multiprocessing as mp
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from ctypes import c_long
+import celulas
+from regioes import Regioes
+
+DIRECOES = [(0, 1), (1, 0), (0, -1), (-1, 0)]
+
+# Simula o trabalho feito dentro da seção crítica de um movimento
+def _ocupa(trabalho_us):
+    fim = time.perf_counter() + trabalho_us / 1e6
+    while time.perf_counter() < fim:
+        pass
+
+def _robo_bench(grid, largura, altura, regioes, contadores, k, inicio, duracao, trabalho_us):
+    rnd = random.Random(k)
+
+    # Escolhe uma célula vazia para o robô
+    while True:
+        x = rnd.randrange(largura)
+        y = rnd.randrange(altura)
+        with regioes.trava(y * largura + x):
+            if grid[y * largura + x] == celulas.VAZIO:
+                grid[y * largura + x] = celulas.robo(k)
+                break
+
+    inicio.wait()
+    fim = time.perf_counter() + duracao
+    movimentos = 0
+    while time.perf_counter() < fim:
+        dx, dy = rnd.choice(DIRECOES)
+        nx, ny = x + dx, y + dy
+        if not (0 <= nx < largura and 0 <= ny < altura):
+            continue
+        old_idx = y * largura + x
+        new_idx = ny * largura + nx
+        with regioes.trava(old_idx, new_idx):
+            if grid[new_idx] == celulas.VAZIO:
+                grid[old_idx] = celulas.VAZIO
+                grid[new_idx] = celulas.robo(k)
+                x, y = nx, ny
+                movimentos += 1
+            _ocupa(trabalho_us)
+    contadores[k] = movimentos
+
+def bench_regioes(largura, altura, num_processos, altura_faixa, duracao, trabalho_us):
+    # Mesmo formato de célula dos motores (celulas.py)
+    grid = mp.RawArray(celulas.c_celula, largura * altura)
+    for i in range(largura * altura):
+        grid[i] = celulas.VAZIO
+    regioes = Regioes(largura, altura, altura_faixa)
+    contadores = mp.RawArray(c_long, num_processos)
+    inicio = mp.Event()
+
+    processos = [mp.Process(target=_robo_bench, args=(grid, largura, altura, regioes, contadores, k, inicio, duracao, trabalho_us))
+                 for k in range(num_processos)]
+    for p in processos:
+        p.start()
+    inicio.set()
+    for p in processos:
+        p.join()
+
+    return sum(contadores) / duracao
+
+# Executado no subprocesso de cada partida (parâmetros já no ambiente)
+def _roda_partida(motor, limite):
+    if motor == "main":
+        import main as jogo
+        resultado = jogo.main(0, viewer=False, limite=limite)
+    elif motor == "async":
+        import motor_async as jogo
+        resultado = jogo.main(0, viewer=False, limite=limite)
+    else:
+        import robot_v2 as jogo
+        resultado = jogo.main(0, viewer=False, limite=limite)
+
+    proprio = resource.getrusage(resource.RUSAGE_SELF)
+    filhos = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu_robos = resultado.pop('cpu_robos')
+    resultado['cpu_principal_s'] = proprio.ru_utime + proprio.ru_stime
+    resultado['cpu_filhos_s'] = filhos.ru_utime + filhos.ru_stime
+    resultado['cpu_robo_medio_s'] = statistics.mean(cpu_robos)
+    resultado['cpu_robo_max_s'] = max(cpu_robos)
+    # Escalonador e escritor do log: CPU dos filhos que não é dos robôs
+    resultado['cpu_outros_s'] = resultado['cpu_filhos_s'] - sum(cpu_robos)
+    print(json.dumps(resultado))
+
+def _partida(motor, robos, largura, altura, barreiras, baterias, limite):
+    ambiente = dict(os.environ,
+                    ARENA_NUM_ROBOTS=str(robos),
+                    ARENA_GRID_WIDTH=str(largura),
+                    ARENA_GRID_HEIGHT=str(altura),
+                    ARENA_NUM_BARRIERS=str(barreiras),
+                    ARENA_NUM_BATTERIES=str(baterias),
+                    ARENA_TICK_INTERVAL="0")
+    with tempfile.TemporaryDirectory() as pasta:
+        saida = subprocess.run([sys.executable, os.path.abspath(__file__), "_partida", motor, str(limite)],
+                               cwd=pasta, env=ambiente, capture_output=True, text=True)
+    if saida.returncode != 0:
+        raise RuntimeError(f"partida {motor} falhou:\n{saida.stderr}")
+    return json.loads(saida.stdout.strip().splitlines()[-1])
+
+def _commit_atual():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def bench_partidas(motores, robos, grades, dens_barreiras, dens_baterias, repeticoes, limite):
+    execucoes = []
+    print(f"{'motor':>5} {'robôs':>5} {'grid':>9} {'barr':>5} {'bat':>4} {'mov/s':>9} {'ticks/s':>8} "
+          f"{'esperas':>8} {'espera s':>8} {'vencedor s':>10} {'cpu robô':>8}")
+    for motor in motores:
+        for largura, altura in grades:
+            internas = (largura - 2) * (altura - 2)
+            for n in robos:
+                for db in dens_barreiras:
+                    for dbat in dens_baterias:
+                        barreiras = int(db * internas)
+                        baterias = max(1, int(dbat * internas))
+                        if barreiras + baterias + n > internas:
+                            continue
+                        for rep in range(repeticoes):
+                            r = _partida(motor, n, largura, altura, barreiras, baterias, limite)
+                            r.update(motor=motor, robos=n, largura=largura, altura=altura,
+                                     barreiras=barreiras, baterias=baterias, repeticao=rep)
+                            execucoes.append(r)
+                            vencedor = f"{r['tempo_vencedor']:.2f}" if r['tempo_vencedor'] is not None else "-"
+                            print(f"{motor:>5} {n:>5} {f'{largura}x{altura}':>9} {barreiras:>5} {baterias:>4} "
+                                  f"{r['movimentos_s']:>9.0f} {r['ticks_s']:>8.1f} {r['contencoes_lock']:>8} "
+                                  f"{r['espera_lock_s']:>8.3f} {vencedor:>10} {r['cpu_robo_medio_s']:>8.2f}", flush=True)
+    return execucoes
+
+# Chave de uma configuração de partida, para comparar arquivos de resultado
+def _chave(r):
+    return (r['motor'], r['robos'], r['largura'], r['altura'], r['barreiras'], r['baterias'])
+
+def compara(antes, depois):
+    def medias(caminho):
+        with open(caminho) as f:
+            dados = json.load(f)
+        grupos = {}
+        for r in dados['execucoes']:
+            grupos.setdefault(_chave(r), []).append(r)
+        return dados.get('commit'), {k: {m: statistics.mean(r[m] for r in rs) for m in ('movimentos_s', 'ticks_s', 'espera_lock_s')}
+                                     for k, rs in grupos.items()}
+
+    commit_a, a = medias(antes)
+    commit_d, d = medias(depois)
+    print(f"{commit_a} -> {commit_d}")
+    print(f"{'motor':>5} {'robôs':>5} {'grid':>9} {'barr':>5} {'bat':>4} {'mov/s':>18} {'ticks/s':>16} {'espera s':>16}")
+    for k in sorted(set(a) & set(d)):
+        motor, n, largura, altura, barreiras, baterias = k
+        colunas = []
+        for m in ('movimentos_s', 'ticks_s', 'espera_lock_s'):
+            razao = d[k][m] / a[k][m] if a[k][m] else float('nan')
+            colunas.append(f"{d[k][m]:>9.1f} ({razao:>4.2f}x)")
+        print(f"{motor:>5} {n:>5} {f'{largura}x{altura}':>9} {barreiras:>5} {baterias:>4} " + " ".join(colunas))
+
+def _grade(texto):
+    largura, altura = texto.lower().split("x")
+    return int(largura), int(altura)
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "_partida":
+        _roda_partida(sys.argv[2], float(sys.argv[3]))
+        return
+
+    parser = argparse.ArgumentParser(description="Benchmarks da arena dos robôs")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p_reg = sub.add_parser("regioes", help="lock global vs locks por faixa")
+    p_reg.add_argument("--processos", type=int, nargs="+", default=[1, 2, 4, 8])
+    p_reg.add_argument("--largura", type=int, default=200)
+    p_reg.add_argument("--altura", type=int, default=200)
+    p_reg.add_argument("--altura-faixa", type=int, default=4)
+    p_reg.add_argument("--duracao", type=float, default=2.0)
+    p_reg.add_argument("--trabalho-us", type=float, default=20.0,
+                       help="tempo simulado dentro da seção crítica (µs)")
+
+    p_par = sub.add_parser("partidas", help="partidas completas sem viewer, em velocidade máxima")
+    p_par.add_argument("--motor", nargs="+", choices=["main", "v2", "async"], default=["main"])
+    p_par.add_argument("--robos", type=int, nargs="+", default=[4, 16])
+    p_par.add_argument("--grades", type=_grade, nargs="+", default=[(40, 20)],
+                       help="tamanhos do grid no formato LARGURAxALTURA")
+    p_par.add_argument("--barreiras", type=float, nargs="+", default=[0.04],
+                       help="fração das células internas com barreira")
+    p_par.add_argument("--baterias", type=float, nargs="+", default=[0.007],
+                       help="fração das células internas com bateria")
+    p_par.add_argument("--repeticoes", type=int, default=3)
+    p_par.add_argument("--limite", type=float, default=60.0,
+                       help="encerra cada partida depois de LIMITE segundos")
+    p_par.add_argument("--saida", help="grava os resultados neste arquivo JSON")
+
+    p_cmp = sub.add_parser("compara", help="compara dois arquivos JSON de `partidas`")
+    p_cmp.add_argument("antes")
+    p_cmp.add_argument("depois")
+
+    args = parser.parse_args()
+
+    if args.comando == "partidas":
+        execucoes = bench_partidas(args.motor, args.robos, args.grades, args.barreiras,
+                                   args.baterias, args.repeticoes, args.limite)
+        if args.saida:
+            with open(args.saida, "w") as f:
+                json.dump({
+                    'commit': _commit_atual(),
+                    'data': time.strftime('%Y-%m-%d %H:%M:%S'),
+                    'python': platform.python_version(),
+                    'cpus': os.cpu_count(),
+                    'execucoes': execucoes,
+                }, f, indent=2)
+
+    elif args.comando == "compara":
+        compara(args.antes, args.depois)
+
+    elif args.comando == "regioes":
+        print(f"{'processos':>9} {'global mov/s':>14} {'faixas mov/s':>14}")
+        for n in args.processos:
+            glob = bench_regioes(args.largura, args.altura, n, args.altura, args.duracao, args.trabalho_us)
+            faixas = bench_regioes(args.largura, args.altura, n, args.altura_faixa, args.duracao, args.trabalho_us)
+            print(f"{n:>9} {glob:>14.0f} {faixas:>14.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+import contextlib
+import multiprocessing as mp
+from collections import deque
+from ctypes import c_bool, c_int32
+import celulas
+
+# Distância de uma célula sem caminho até a bateria (ou bateria já coletada)
+INALCANCAVEL = -1
+
+"""
+Campos de distância (flow fields) para navegação sem busca por robô.
+Para cada bateria é guardado, em memória compartilhada, o número de passos
+de qualquer célula até ela, calculado por BFS sobre o mapa estático (só as
+barreiras bloqueiam; robôs se movem e são tratados na hora do passo). Um
+campo combinado guarda a distância até a bateria ativa mais próxima.
+
+Os robôs só leem os campos: o próximo passo é um vizinho com distância uma
+unidade menor, lido em O(1). As escritas são serializadas por um lock:
+    - consome(): a bateria sai do campo combinado, recalculando só as
+      células cuja bateria mais próxima era ela
+    - repoe(): a bateria reaparece em outra célula; só o campo dela é
+      recalculado, e o combinado fica com o mínimo entre ele e o atual
+    - constroi(): refaz todos os campos; usado na inicialização e sempre
+      que as barreiras mudam
+
+Os índices são de células do grid linearizado (linha * largura + coluna),
+então a mesma estrutura serve para main.py e para robot_v2.py. Com
+compartilhada=False (motor assíncrono), os arrays são comuns do processo e
+o lock não faz nada.
+"""
+class Caminhos():
+    def __init__(self, largura, altura, num_baterias, compartilhada=True):
+        self.largura = largura
+        self.altura = altura
+        self.num_baterias = num_baterias
+        self.num_celulas = largura * altura
+        cria = mp.RawArray if compartilhada else lambda tipo, n: (tipo * n)()
+        self.campos = cria(c_int32, num_baterias * self.num_celulas)
+        self.combinado = cria(c_int32, self.num_celulas)
+        self.ativas = cria(c_bool, num_baterias)
+        self.lock = mp.Lock() if compartilhada else contextlib.nullcontext()
+
+    def _vizinhos(self, idx):
+        x = idx % self.largura
+        if x > 0:
+            yield idx - 1
+        if x < self.largura - 1:
+            yield idx + 1
+        if idx >= self.largura:
+            yield idx - self.largura
+        if idx + self.largura < self.num_celulas:
+            yield idx + self.largura
+
+    def _campo(self, numero):
+        inicio = numero * self.num_celulas
+        return self.campos[inicio:inicio + self.num_celulas]
+
+    # Leva `combinado` (lista) ao mínimo, célula a célula, entre ele e `campo`
+    @staticmethod
+    def _minimo(combinado, campo):
+        for i, d in enumerate(campo):
+            if d != INALCANCAVEL and (combinado[i] == INALCANCAVEL or d < combinado[i]):
+                combinado[i] = d
+
+    # BFS a partir de `origem` sobre as células livres do mapa estático
+    def _bfs(self, livre, origem):
+        dist = [INALCANCAVEL] * self.num_celulas
+        dist[origem] = 0
+        fila = deque([origem])
+        while fila:
+            idx = fila.popleft()
+            d = dist[idx] + 1
+            for v in self._vizinhos(idx):
+                if livre[v] and dist[v] == INALCANCAVEL:
+                    dist[v] = d
+                    fila.append(v)
+        return dist
+
+    # Recalcula o campo combinado só nas células afetadas, lendo direto
+    # dessas células nos campos das baterias ativas (sem copiar os campos)
+    def _combina(self, celulas_afetadas):
+        bases = [n * self.num_celulas for n in range(self.num_baterias) if self.ativas[n]]
+        campos = self.campos
+        for i in celulas_afetadas:
+            melhor = INALCANCAVEL
+            for base in bases:
+                d = campos[base + i]
+                if d != INALCANCAVEL and (melhor == INALCANCAVEL or d < melhor):
+                    melhor = d
+            self.combinado[i] = melhor
+
+    # Refaz todos os campos a partir do grid (inicialização ou barreiras novas)
+    def constroi(self, grid):
+        with self.lock:
+            mapa = grid[:]
+            livre = [celulas.tipo(c) != celulas.BARREIRA for c in mapa]
+
+            combinado = [INALCANCAVEL] * self.num_celulas
+            for numero in range(self.num_baterias):
+                self.ativas[numero] = False
+            for idx, c in enumerate(mapa):
+                if celulas.tipo(c) == celulas.BATERIA and celulas.ident(c) < self.num_baterias:
+                    numero = celulas.ident(c)
+                    campo = self._bfs(livre, idx)
+                    inicio = numero * self.num_celulas
+                    self.campos[inicio:inicio + self.num_celulas] = campo
+                    self.ativas[numero] = True
+                    self._minimo(combinado, campo)
+            self.combinado[:] = combinado
+
+    # A bateria `numero` foi coletada: desativa o campo dela
+    def consome(self, numero):
+        with self.lock:
+            if not self.ativas[numero]:
+                return
+            self.ativas[numero] = False
+
+            # Só as células cuja bateria mais próxima era esta mudam
+            afetadas = [i for i, (d, atual) in enumerate(zip(self._campo(numero), self.combinado[:]))
+                        if d != INALCANCAVEL and d == atual]
+            self._combina(afetadas)
+
+    # A bateria `numero` reapareceu na célula `idx`
+    def repoe(self, grid, numero, idx):
+        with self.lock:
+            livre = [celulas.tipo(c) != celulas.BARREIRA for c in grid[:]]
+            campo = self._bfs(livre, idx)
+            inicio = numero * self.num_celulas
+            self.campos[inicio:inicio + self.num_celulas] = campo
+            self.ativas[numero] = True
+
+            combinado = self.combinado[:]
+            self._minimo(combinado, campo)
+            self.combinado[:] = combinado
+
+    # Distância de `idx` até a bateria `numero` (ou até a mais próxima se None)
+    def distancia(self, idx, numero=None):
+        if numero is None:
+            return self.combinado[idx]
+        if not self.ativas[numero]:
+            return INALCANCAVEL
+        return self.campos[numero * self.num_celulas + idx]
+
+    def passos(self, idx, numero=None):
+        """
+        Próximos passos de `idx` rumo à bateria `numero` (ou à mais próxima):
+        os vizinhos com distância uma unidade menor. Leitura sem lock; um
+        campo sendo atualizado no momento só gera um passo pior, que o
+        movimento valida de novo sob o lock da região.
+        """
+        d = self.distancia(idx, numero)
+        if d <= 0:
+            return []
+        if numero is None:
+            return [v for v in self._vizinhos(idx) if self.combinado[v] == d - 1]
+        base = numero * self.num_celulas
+        return [v for v in self._vizinhos(idx) if self.campos[base + v] == d - 1]
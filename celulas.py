@@ -0,0 +1,55 @@
+import string
+from array import array
+from ctypes import c_uint32
+
+"""
+Codificação das células do grid.
+Cada célula é um inteiro sem sinal de 32 bits: os 2 bits baixos guardam o
+tipo (vazio, barreira, bateria, robô) e os bits restantes guardam o id do
+robô ou o número da bateria. Assim o grid comporta milhões de robôs, sem o
+limite das letras 'A'..'Z' de quando cada célula era um único c_char.
+"""
+
+c_celula = c_uint32
+TAMANHO_CELULA = 4
+CODIGO_ARRAY = 'I'          # Código de array.array para ler snapshots do grid
+
+TIPO_BITS = 2
+TIPO_MASCARA = (1 << TIPO_BITS) - 1
+
+VAZIO = 0
+BARREIRA = 1
+BATERIA = 2
+ROBO = 3
+
+# Símbolos usados para desenhar robôs no terminal (repetem depois do último)
+SIMBOLOS_ROBOS = string.ascii_uppercase + string.ascii_lowercase + string.digits
+SIMBOLOS_TIPOS = (' ', '#', '&')
+
+def tipo(celula):
+    return celula & TIPO_MASCARA
+
+def ident(celula):
+    return celula >> TIPO_BITS
+
+def robo(robot_id_index):
+    return ROBO | (robot_id_index << TIPO_BITS)
+
+def bateria(numero=0):
+    return BATERIA | (numero << TIPO_BITS)
+
+def eh_robo(celula):
+    return celula & TIPO_MASCARA == ROBO
+
+def simbolo(celula):
+    if celula & TIPO_MASCARA == ROBO:
+        return SIMBOLOS_ROBOS[(celula >> TIPO_BITS) % len(SIMBOLOS_ROBOS)]
+    return SIMBOLOS_TIPOS[celula & TIPO_MASCARA]
+
+# Converte os bytes de um snapshot (ou de uma linha dele) em células
+def decodifica(dados):
+    return array(CODIGO_ARRAY, dados)
+
+# Converte os bytes de uma linha do snapshot no texto exibido no terminal
+def texto(dados):
+    return ''.join(map(simbolo, decodifica(dados)))
@@ -1,18 +1,53 @@
+import os
+
+# Os parâmetros da arena podem ser trocados por variáveis de ambiente
+# ARENA_<NOME> (ex.: ARENA_NUM_ROBOTS=2000) para testes de carga
+def _env(nome, padrao):
+    return type(padrao)(os.environ.get(f"ARENA_{nome}", padrao))
+
 # Dimensões do tabuleiro
-GRID_WIDTH = 40
-GRID_HEIGHT = 20
+GRID_WIDTH = _env("GRID_WIDTH", 40)
+GRID_HEIGHT = _env("GRID_HEIGHT", 20)
 
 # Energia máxima que um robô pode ter
 MAX_ENERGY = 100
 
 # Número total de robôs na arena
-NUM_ROBOTS = 4
+NUM_ROBOTS = _env("NUM_ROBOTS", 4)
 
 # Número de baterias a serem colocadas no grid
-NUM_BATTERIES = 5
+NUM_BATTERIES = _env("NUM_BATTERIES", 5)
 
 # Número de barreiras fixas a serem colocadas no grid
-NUM_BARRIERS = 30
+NUM_BARRIERS = _env("NUM_BARRIERS", 30)
+
+# 1 = uma bateria coletada reaparece numa célula livre sorteada
+BATTERY_RESPAWN = _env("BATTERY_RESPAWN", 0)
+
+# Identificacao dos robos: 'A'..'Z' e depois 'R26', 'R27', ...
+ROBOT_IDS = [chr(65 + i) if i < 26 else f"R{i}" for i in range(NUM_ROBOTS)]
+
+# Lado (em células) dos buckets do índice espacial de baterias e robôs
+BUCKET_SIZE = _env("BUCKET_SIZE", 4)
+
+# Altura (em linhas) de cada faixa do grid com lock próprio.
+# Deve ser múltiplo de BUCKET_SIZE para que cada bucket fique numa só faixa.
+REGION_HEIGHT = _env("REGION_HEIGHT", 4)
+
+# Formato do log dos robôs: 'texto' (log_<id>.txt) ou 'binario' (log.bin)
+LOG_FORMAT = _env("LOG_FORMAT", 'texto')
+
+# Intervalo (em segundos) entre ticks do escalonador; 0 = velocidade máxima
+TICK_INTERVAL = _env("TICK_INTERVAL", 0.3)
+
+# Processos trabalhadores que agem pelos robôs (padrão: um por núcleo)
+NUM_WORKERS = _env("NUM_WORKERS", os.cpu_count() or 1)
+
+# 1 = registra histogramas de espera/posse dos locks (ver travas.py)
+LOCK_STATS = _env("LOCK_STATS", 0)
+
+# 1 = mede o tempo de cada robô por fase do tick (ver perfil.py)
+PHASE_STATS = _env("PHASE_STATS", 0)
 
-# Identificacao dos robos
-ROBOT_IDS = ['A','B','C','D']
+# 1 = roda cada processo de robô sob o cProfile e junta os perfis no fim (ver perfil.py)
+CPROFILE = _env("CPROFILE", 0)
@@ -0,0 +1,113 @@
+import multiprocessing as mp
+import time
+from ctypes import c_bool, c_int, c_long
+
+"""
+Escalonador de ticks em lockstep.
+Todos os robôs participantes agem no tick atual e chamam proximo_tick() ao
+terminar; o processo do escalonador (executa) só avança o contador quando
+todos os participantes ativos concluíram o tick. Com `intervalo` > 0 os ticks
+são espaçados no tempo (para acompanhar no viewer); com `intervalo` == 0 o
+jogo roda na velocidade máxima permitida pela disputa pelos locks.
+
+Um robô que sai do jogo chama sai() para deixar de ser esperado, e encerra()
+acorda todos os participantes imediatamente no fim de jogo. Um participante
+que pode sair do jogo enquanto espera (ex.: robô derrotado por outro) passa
+a condição `saiu` para proximo_tick(); quem causou a saída chama acorda() e
+o participante volta na hora, sem esperar o próximo tick.
+
+Observadores (ex.: manutenção periódica) acompanham os ticks com observa()
+sem serem participantes: dormem na mesma condição até o tick mudar.
+
+O processo do escalonador também pode chamar ao_fim_do_tick(tick) quando
+todos concluíram o tick e nenhum robô está agindo (ex.: gravar um quadro
+consistente do grid para o replay).
+"""
+class Escalonador():
+    def __init__(self, num_participantes):
+        self.cond = mp.Condition(mp.Lock())
+        self.tick = mp.RawValue(c_long, 0)
+        self.ativos = mp.RawValue(c_int, num_participantes)
+        self.pendentes = mp.RawValue(c_int, num_participantes)
+        self.encerrado = mp.RawValue(c_bool, False)
+
+    def proximo_tick(self, visto, saiu=None):
+        """
+        Conclui o tick `visto` e espera o próximo. Retorna o tick atual.
+        Se `saiu()` ficar verdadeiro durante a espera, retorna `visto` sem
+        concluir o tick; o participante deve então chamar sai(visto).
+        """
+        with self.cond:
+            concluiu = False
+            if not self.encerrado.value and visto == self.tick.value:
+                self.pendentes.value -= 1
+                concluiu = True
+                if self.pendentes.value == 0:
+                    self.cond.notify_all()
+            self.cond.wait_for(lambda: self.tick.value > visto or self.encerrado.value or (saiu is not None and saiu()))
+            if self.tick.value == visto and not self.encerrado.value and concluiu:
+                # Saiu do jogo antes do próximo tick: desfaz a conclusão,
+                # que sai(visto) conta de novo junto com a saída
+                self.pendentes.value += 1
+            return self.tick.value
+
+    # Espera `n` ticks (ex.: velocidade do robô = uma ação a cada n ticks)
+    def espera_ticks(self, visto, n, saiu=None):
+        for _ in range(n):
+            visto = self.proximo_tick(visto, saiu)
+            if self.encerrado.value or (saiu is not None and saiu()):
+                break
+        return visto
+
+    # Espera o tick passar de `visto` sem ser participante. Retorna o tick
+    # atual (ainda `visto` se passaram `timeout` segundos sem tick novo).
+    def observa(self, visto, timeout=None):
+        with self.cond:
+            self.cond.wait_for(lambda: self.tick.value > visto or self.encerrado.value, timeout)
+            return self.tick.value
+
+    # Acorda quem espera para reavaliar a condição de saída (ex.: robô derrotado)
+    def acorda(self):
+        with self.cond:
+            self.cond.notify_all()
+
+    # Remove um participante que agiu no tick `visto` e não vai mais concluí-lo
+    def sai(self, visto):
+        with self.cond:
+            self.ativos.value -= 1
+            if not self.encerrado.value and visto == self.tick.value:
+                self.pendentes.value -= 1
+            self.cond.notify_all()
+
+    # Fim de jogo: acorda todos os participantes e o escalonador
+    def encerra(self):
+        with self.cond:
+            self.encerrado.value = True
+            self.cond.notify_all()
+
+    # Loop do processo escalonador
+    def executa(self, intervalo, ao_fim_do_tick=None):
+        proximo = time.monotonic() + intervalo
+        while True:
+            with self.cond:
+                self.cond.wait_for(lambda: self.pendentes.value <= 0 or self.encerrado.value)
+                if self.encerrado.value or self.ativos.value <= 0:
+                    self.encerrado.value = True
+                    self.cond.notify_all()
+                    return
+
+            # Todos esperam o próximo tick: o estado do jogo está parado
+            if ao_fim_do_tick:
+                ao_fim_do_tick(self.tick.value)
+
+            # Ritmo configurável; sem espera no modo de velocidade máxima
+            if intervalo > 0:
+                agora = time.monotonic()
+                if proximo > agora:
+                    time.sleep(proximo - agora)
+                proximo = max(proximo + intervalo, time.monotonic())
+
+            with self.cond:
+                self.tick.value += 1
+                self.pendentes.value = self.ativos.value
+                self.cond.notify_all()
@@ -0,0 +1,82 @@
+from constants import GRID_WIDTH, GRID_HEIGHT, BUCKET_SIZE
+import celulas
+
+# Índice espacial em buckets uniformes de BUCKET_SIZE x BUCKET_SIZE células.
+# Cada posição do array compartilhado guarda quantas entidades (baterias e
+# robôs) existem no bucket. As atualizações devem ser feitas com o lock da
+# região (faixa) que contém o bucket, junto com a escrita correspondente no grid.
+BUCKETS_X = (GRID_WIDTH + BUCKET_SIZE - 1) // BUCKET_SIZE
+BUCKETS_Y = (GRID_HEIGHT + BUCKET_SIZE - 1) // BUCKET_SIZE
+NUM_BUCKETS = BUCKETS_X * BUCKETS_Y
+
+def bucket_de(pos):
+    return (pos[1] // BUCKET_SIZE) * BUCKETS_X + (pos[0] // BUCKET_SIZE)
+
+def adiciona(indice, pos):
+    indice[bucket_de(pos)] += 1
+
+def remove(indice, pos):
+    indice[bucket_de(pos)] -= 1
+
+def move(indice, old_pos, new_pos, coletou_bateria=False):
+    # Um robô que entra numa célula com bateria substitui a bateria no bucket
+    remove(indice, old_pos)
+    if not coletou_bateria:
+        adiciona(indice, new_pos)
+
+def constroi(grid, indice):
+    # Reconstrói o índice a partir do grid inteiro (usado só na inicialização)
+    for b in range(NUM_BUCKETS):
+        indice[b] = 0
+    for i in range(GRID_WIDTH * GRID_HEIGHT):
+        if celulas.tipo(grid[i]) in (celulas.BATERIA, celulas.ROBO):
+            adiciona(indice, (i % GRID_WIDTH, i // GRID_WIDTH))
+
+def _varre_bucket(grid, bx, by, pos, eh_alvo, melhor):
+    x0 = bx * BUCKET_SIZE
+    y0 = by * BUCKET_SIZE
+    x1 = min(x0 + BUCKET_SIZE, GRID_WIDTH)
+    y1 = min(y0 + BUCKET_SIZE, GRID_HEIGHT)
+    for y in range(y0, y1):
+        for x in range(x0, x1):
+            idx = y * GRID_WIDTH + x
+            conteudo = grid[idx]
+            if eh_alvo(conteudo):
+                # Desempate pela ordem de varredura do grid (linha a linha)
+                chave = ((x - pos[0])**2 + (y - pos[1])**2, idx)
+                if melhor is None or chave < melhor[0]:
+                    melhor = (chave, (x, y), conteudo)
+    return melhor
+
+def alvo_mais_proximo(grid, indice, pos, eh_alvo):
+    """
+    Busca o alvo mais próximo de pos em anéis de buckets ao redor do bucket
+    de pos, visitando apenas buckets não vazios. Retorna o alvo, que é
+    (dist_sq, (x, y), conteudo) ou None se nenhuma célula satisfaz
+    eh_alvo(conteudo), e o intervalo de linhas [y0, y1) do grid que foi lido.
+    """
+    bx = pos[0] // BUCKET_SIZE
+    by = pos[1] // BUCKET_SIZE
+    melhor = None
+    raio = 0
+
+    for r in range(max(BUCKETS_X, BUCKETS_Y)):
+        # Qualquer célula do anel r está a pelo menos (r-1)*B+1 em algum eixo
+        if melhor is not None and r > 0 and ((r - 1) * BUCKET_SIZE + 1)**2 > melhor[0][0]:
+            break
+        raio = r
+        for cy in range(by - r, by + r + 1):
+            if cy < 0 or cy >= BUCKETS_Y:
+                continue
+            borda = cy == by - r or cy == by + r
+            passo = 1 if borda else 2 * r
+            for cx in range(bx - r, bx + r + 1, passo):
+                if cx < 0 or cx >= BUCKETS_X:
+                    continue
+                if indice[cy * BUCKETS_X + cx] > 0:
+                    melhor = _varre_bucket(grid, cx, cy, pos, eh_alvo, melhor)
+
+    linhas = (max(by - raio, 0) * BUCKET_SIZE, min((by + raio + 1) * BUCKET_SIZE, GRID_HEIGHT))
+    if melhor is None:
+        return None, linhas
+    return (melhor[0][0], melhor[1], melhor[2]), linhas
@@ -0,0 +1,319 @@
+"""
+Transmissão da partida para espectadores.
+
+Um único processo servidor acompanha os ticks do escalonador como observador
+(sem ser participante), tira um snapshot consistente do grid por tick
+(seqlock das faixas, sem lock) e o codifica uma vez só:
+    - quadro-chave: o grid inteiro, a cada `quadros_a_cada` ticks e para
+      cada espectador que acabou de conectar ou ficou para trás
+    - delta: só as corridas de células que mudaram desde o tick anterior
+      (primeira célula, quantidade e as células novas)
+Os mesmos bytes são enviados a todos os espectadores por um socket local
+(Unix ou TCP), sem bloquear: um espectador lento só acumula mensagens no seu
+buffer e, se ele passar do limite, as pendentes são descartadas e ele volta
+a receber um quadro-chave. A simulação nunca espera o servidor, e o custo
+dela não depende de quantos espectadores estão conectados.
+
+O cliente remonta o grid e o desenha com o mesmo layout do viewer:
+
+    python3 main.py --espectadores /tmp/arena.sock
+    python3 espectadores.py /tmp/arena.sock
+    python3 main.py --espectadores :7000
+    python3 espectadores.py localhost:7000
+"""
+
+import argparse
+import os
+import selectors
+import socket
+import struct
+import time
+from array import array
+from collections import deque
+import celulas
+from renderizador import RenderizadorDiff
+from viewer import converte_linha, monta_linhas
+
+MENSAGEM = struct.Struct('<BqI')            # tipo, tick, tamanho do conteúdo
+DIMENSOES = struct.Struct('<II')            # largura, altura (início do quadro-chave)
+CORRIDA = struct.Struct('<II')              # primeira célula, quantidade
+
+# Tipos de mensagem
+CHAVE = 1
+DELTA = 2
+FIM = 3
+
+# Células iguais entre duas mudanças que custam menos que um novo cabeçalho
+# de corrida são enviadas junto, na mesma corrida
+LACUNA_MAXIMA = CORRIDA.size // celulas.TAMANHO_CELULA
+
+# Bytes pendentes a partir dos quais um espectador lento é ressincronizado
+BUFFER_MAXIMO = 1 << 20
+
+# "caminho" = socket Unix; "host:porta" ou ":porta" = TCP
+def endereco(texto):
+    if '/' not in texto and ':' in texto:
+        host, porta = texto.rsplit(':', 1)
+        return socket.AF_INET, (host or '127.0.0.1', int(porta))
+    return socket.AF_UNIX, texto
+
+def codifica_delta(anterior, atual, largura):
+    """
+    Corridas das células de `atual` que diferem de `anterior` (bytes crus
+    do grid). As linhas iguais são descartadas comparando os bytes, sem
+    olhar célula por célula.
+    """
+    tam_linha = largura * celulas.TAMANHO_CELULA
+    a = b = None
+    partes = []
+    for inicio_linha in range(0, len(atual), tam_linha):
+        if atual[inicio_linha:inicio_linha + tam_linha] == anterior[inicio_linha:inicio_linha + tam_linha]:
+            continue
+        if a is None:
+            a = array(celulas.CODIGO_ARRAY, anterior)
+            b = array(celulas.CODIGO_ARRAY, atual)
+
+        base = inicio_linha // celulas.TAMANHO_CELULA
+        x = 0
+        while x < largura:
+            if a[base + x] == b[base + x]:
+                x += 1
+                continue
+            inicio = fim = x
+            while x < largura and x - fim <= LACUNA_MAXIMA:
+                if a[base + x] != b[base + x]:
+                    fim = x
+                x += 1
+            x = fim + 1
+            partes.append(CORRIDA.pack(base + inicio, fim + 1 - inicio))
+            partes.append(atual[(base + inicio) * celulas.TAMANHO_CELULA:(base + fim + 1) * celulas.TAMANHO_CELULA])
+    return b''.join(partes)
+
+# Aplica as corridas de um delta no quadro (bytearray)
+def aplica_delta(quadro, conteudo):
+    pos = 0
+    while pos < len(conteudo):
+        inicio, quantidade = CORRIDA.unpack_from(conteudo, pos)
+        pos += CORRIDA.size
+        tamanho = quantidade * celulas.TAMANHO_CELULA
+        quadro[inicio * celulas.TAMANHO_CELULA:inicio * celulas.TAMANHO_CELULA + tamanho] = conteudo[pos:pos + tamanho]
+        pos += tamanho
+
+def mensagem(tipo, tick, conteudo=b''):
+    return MENSAGEM.pack(tipo, tick, len(conteudo)) + conteudo
+
+"""
+Conexão de um espectador: fila de mensagens a enviar e quanto da primeira
+já foi enviado. Um quadro-chave torna inúteis as mensagens que ainda não
+começaram a ser enviadas, e elas são descartadas; o mesmo acontece quando o
+espectador passa do limite do buffer, e ele fica esperando um quadro-chave.
+A mensagem em andamento é sempre mantida, para o fluxo não ser cortado.
+"""
+class Espectador():
+    def __init__(self, sock):
+        self.sock = sock
+        self.fila = deque()
+        self.enviado = 0
+        self.pendente = 0
+        self.precisa_chave = True
+
+    def _descarta_pendentes(self):
+        em_andamento = self.fila.popleft() if self.enviado else None
+        self.fila.clear()
+        self.pendente = 0
+        if em_andamento is not None:
+            self.fila.append(em_andamento)
+            self.pendente = len(em_andamento) - self.enviado
+
+    def enfileira(self, dados, quadro_chave=False):
+        if quadro_chave:
+            self._descarta_pendentes()
+            self.precisa_chave = False
+        elif self.precisa_chave:
+            return
+        elif self.pendente + len(dados) > BUFFER_MAXIMO:
+            self._descarta_pendentes()
+            self.precisa_chave = True
+            return
+        self.fila.append(dados)
+        self.pendente += len(dados)
+
+    # Envia o que o socket aceitar sem bloquear; False se a conexão caiu
+    def descarrega(self):
+        while self.fila:
+            dados = self.fila[0]
+            try:
+                n = self.sock.send(memoryview(dados)[self.enviado:])
+            except BlockingIOError:
+                return True
+            except OSError:
+                return False
+            self.enviado += n
+            self.pendente -= n
+            if self.enviado < len(dados):
+                return True
+            self.fila.popleft()
+            self.enviado = 0
+        return True
+
+class Servidor():
+    def __init__(self, texto_endereco, largura, altura, quadros_a_cada=100):
+        self.largura = largura
+        self.altura = altura
+        self.quadros_a_cada = quadros_a_cada
+        self.anterior = None            # Último quadro publicado
+        self.tick = None
+        self.tick_chave = None
+        self.espectadores = {}
+
+        familia, self.endereco = endereco(texto_endereco)
+        if familia == socket.AF_UNIX and os.path.exists(self.endereco):
+            os.unlink(self.endereco)
+        self.sock = socket.socket(familia, socket.SOCK_STREAM)
+        if familia == socket.AF_INET:
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(self.endereco)
+        self.sock.listen()
+        self.sock.setblocking(False)
+        self.seletor = selectors.DefaultSelector()
+        self.seletor.register(self.sock, selectors.EVENT_READ)
+
+    def _chave(self, tick, quadro):
+        return mensagem(CHAVE, tick, DIMENSOES.pack(self.largura, self.altura) + quadro)
+
+    # Codifica o quadro do tick uma vez e o enfileira para todos os espectadores
+    def publica(self, tick, quadro):
+        chave = delta = None
+        if self.anterior is None or tick - self.tick_chave >= self.quadros_a_cada:
+            chave = self._chave(tick, quadro)
+            self.tick_chave = tick
+        else:
+            delta = mensagem(DELTA, tick, codifica_delta(self.anterior, quadro, self.largura))
+        self.anterior = quadro
+        self.tick = tick
+
+        for espectador in self.espectadores.values():
+            if delta is None or espectador.precisa_chave:
+                chave = chave or self._chave(tick, quadro)
+                espectador.enfileira(chave, quadro_chave=True)
+            else:
+                espectador.enfileira(delta)
+
+    def _remove(self, sock):
+        self.seletor.unregister(sock)
+        del self.espectadores[sock]
+        sock.close()
+
+    # Aceita conexões novas e envia o pendente, esperando até `timeout` segundos
+    def atende(self, timeout=0):
+        for chave, eventos in self.seletor.select(timeout):
+            if chave.fileobj is self.sock:
+                try:
+                    sock, _ = self.sock.accept()
+                except BlockingIOError:
+                    continue
+                sock.setblocking(False)
+                self.espectadores[sock] = Espectador(sock)
+                self.seletor.register(sock, selectors.EVENT_READ)
+                if self.anterior is not None:
+                    self.espectadores[sock].enfileira(self._chave(self.tick, self.anterior), quadro_chave=True)
+            else:
+                # Espectadores não enviam nada: leitura só no fechamento da conexão
+                try:
+                    fechou = not chave.fileobj.recv(4096)
+                except OSError:
+                    fechou = True
+                if fechou:
+                    self._remove(chave.fileobj)
+
+        for sock, espectador in list(self.espectadores.items()):
+            if not espectador.descarrega():
+                self._remove(sock)
+
+    # Avisa o fim da partida e tenta entregar o que falta por até `espera` segundos
+    def fecha(self, tick, espera=2.0):
+        fim = mensagem(FIM, tick)
+        for espectador in self.espectadores.values():
+            # Mesmo para quem espera um quadro-chave: a transmissão acabou
+            espectador.fila.append(fim)
+        limite = time.monotonic() + espera
+        while any(e.fila for e in self.espectadores.values()) and time.monotonic() < limite:
+            self.atende(0.01)
+        for sock in list(self.espectadores):
+            self._remove(sock)
+        self.seletor.close()
+        unix = self.sock.family == socket.AF_UNIX
+        self.sock.close()
+        if unix:
+            os.unlink(self.endereco)
+
+# Processo servidor: um snapshot por tick, observando o escalonador
+def servidor_process(grid, regioes, escalonador, texto_endereco, largura, altura):
+    servidor = Servidor(texto_endereco, largura, altura)
+    tick = -1
+    while not escalonador.encerrado.value:
+        # Espera pouco pelo tick para continuar atendendo os espectadores
+        atual = escalonador.observa(tick, timeout=0.05)
+        if atual != tick:
+            tick = atual
+            servidor.publica(tick, regioes.snapshot(grid))
+        servidor.atende()
+
+    servidor.publica(escalonador.tick.value, regioes.snapshot(grid))
+    servidor.fecha(escalonador.tick.value)
+
+# Cliente: remonta o grid a partir das mensagens e o desenha como o viewer
+def assiste(texto_endereco, max_fps=10):
+    familia, end = endereco(texto_endereco)
+    sock = socket.socket(familia, socket.SOCK_STREAM)
+    sock.connect(end)
+    entrada = sock.makefile('rb')
+    renderizador = RenderizadorDiff(max_fps, converte=converte_linha)
+    quadro = None
+    tick = 0
+    proximo = time.monotonic()
+
+    def desenha():
+        titulo = f"=== Arena dos Robôs (Espectador) === tick {tick}"
+        renderizador.desenha(monta_linhas(bytes(quadro), titulo, "Ctrl+C para sair.", largura, altura))
+
+    try:
+        while True:
+            cabecalho = entrada.read(MENSAGEM.size)
+            if len(cabecalho) < MENSAGEM.size:
+                break
+            tipo, tick, tamanho = MENSAGEM.unpack(cabecalho)
+            conteudo = entrada.read(tamanho)
+            if tipo == FIM:
+                break
+            if tipo == CHAVE:
+                largura, altura = DIMENSOES.unpack_from(conteudo)
+                quadro = bytearray(conteudo[DIMENSOES.size:])
+            elif quadro is not None:
+                aplica_delta(quadro, conteudo)
+
+            # Desenha no máximo `max_fps` quadros por segundo
+            agora = time.monotonic()
+            if quadro is not None and agora >= proximo:
+                desenha()
+                proximo = agora + renderizador.periodo
+    finally:
+        if quadro is not None:
+            desenha()
+            renderizador.fim()
+        sock.close()
+    print("Transmissão encerrada.")
+
+def main():
+    parser = argparse.ArgumentParser(description="Assiste uma partida transmitida com main.py --espectadores")
+    parser.add_argument("endereco", help="caminho do socket Unix ou host:porta")
+    parser.add_argument("--fps", type=float, default=10.0, help="quadros desenhados por segundo")
+    args = parser.parse_args()
+
+    try:
+        assiste(args.endereco, args.fps)
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
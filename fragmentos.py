@@ -0,0 +1,29 @@
+import multiprocessing as mp
+from ctypes import c_int
+
+"""
+Divisão dos robôs entre os processos trabalhadores.
+Em vez de um processo por robô, um número fixo de trabalhadores (por padrão
+um por núcleo) age pelos robôs a cada tick: o trabalhador w fica com o
+trecho w da lista compartilhada dos robôs ainda no jogo, dividida em partes
+de tamanho quase igual. Entre dois ticks, quando nenhum trabalhador está
+agindo, o escalonador retira da lista os robôs que saíram do jogo (compacta)
+e os trechos são recalculados no tick seguinte, então a carga continua
+dividida por igual à medida que os robôs morrem.
+"""
+class Fragmentos():
+    def __init__(self, num_robos, num_trabalhadores):
+        self.num_trabalhadores = num_trabalhadores
+        self.robos = mp.RawArray(c_int, range(num_robos))
+        self.tamanho = mp.RawValue(c_int, num_robos)
+
+    # Robôs do trabalhador `w` no tick atual
+    def trecho(self, w):
+        n = self.tamanho.value
+        return self.robos[w * n // self.num_trabalhadores:(w + 1) * n // self.num_trabalhadores]
+
+    # Retira da lista os robôs para os quais `no_jogo(i)` é falso (só entre ticks)
+    def compacta(self, no_jogo):
+        restantes = [i for i in self.robos[:self.tamanho.value] if no_jogo(i)]
+        self.robos[:len(restantes)] = restantes
+        self.tamanho.value = len(restantes)
@@ -0,0 +1,113 @@
+import multiprocessing as mp
+import random
+from ctypes import c_int
+import celulas
+
+"""
+Conjunto compartilhado das células vazias do grid.
+Para cada faixa de linhas (as mesmas de Regioes) há um array com as células
+livres da faixa, sem ordem, e um índice posição -> slot nesse array. Incluir
+ou remover uma célula é O(1): a remoção troca a célula com a última do
+array da faixa. Sortear uma célula livre escolhe a faixa pelo número de
+células livres (O(número de faixas)) e um slot aleatório dentro dela, sem
+tentativa e erro, então o custo não depende da ocupação do grid.
+
+As células da faixa f ocupam no array global o mesmo intervalo de índices
+que elas têm no grid, e cada faixa só é alterada com o lock dela adquirido,
+junto com a escrita correspondente no grid. Movimentos e remoções já travam
+as faixas envolvidas, então manter o conjunto não custa nenhum lock a mais.
+Com compartilhada=False (motor assíncrono), os arrays são comuns do processo.
+"""
+class CelulasLivres():
+    def __init__(self, regioes, compartilhada=True):
+        self.regioes = regioes
+        self.num_celulas = regioes.largura * regioes.altura
+        self.celulas_faixa = regioes.largura * regioes.altura_faixa
+        cria = mp.RawArray if compartilhada else lambda tipo, n: (tipo * n)()
+        self.livres = cria(c_int, self.num_celulas)
+        self.slots = cria(c_int, self.num_celulas)
+        self.tamanhos = cria(c_int, regioes.num_faixas)
+
+    # Reconstrói o conjunto a partir do grid (com todas as faixas travadas)
+    def enche(self, grid):
+        for f in range(len(self.tamanhos)):
+            self.tamanhos[f] = 0
+        for idx, c in enumerate(grid[:]):
+            self.slots[idx] = -1
+            if c == celulas.VAZIO:
+                self.adiciona(idx)
+
+    def adiciona(self, idx):
+        if self.slots[idx] >= 0:
+            return
+        f = idx // self.celulas_faixa
+        slot = f * self.celulas_faixa + self.tamanhos[f]
+        self.livres[slot] = idx
+        self.slots[idx] = slot
+        self.tamanhos[f] += 1
+
+    def remove(self, idx):
+        slot = self.slots[idx]
+        if slot < 0:
+            return
+        f = idx // self.celulas_faixa
+        ultimo = f * self.celulas_faixa + self.tamanhos[f] - 1
+        outra = self.livres[ultimo]
+        self.livres[slot] = outra
+        self.slots[outra] = slot
+        self.slots[idx] = -1
+        self.tamanhos[f] -= 1
+
+    # Um robô saiu de `old_idx` e entrou em `new_idx`
+    def move(self, old_idx, new_idx):
+        self.adiciona(old_idx)
+        self.remove(new_idx)
+
+    def __len__(self):
+        return sum(self.tamanhos)
+
+    # Faixa sorteada com peso igual ao número de células livres (None se cheio)
+    def _escolhe_faixa(self, rng):
+        total = len(self)
+        if total == 0:
+            return None
+        r = rng.randrange(total)
+        for f, tamanho in enumerate(self.tamanhos[:]):
+            if r < tamanho:
+                return f
+            r -= tamanho
+        return None
+
+    def sorteia(self, rng=random):
+        """
+        Retira e retorna uma célula livre sorteada. Quem chama já deve ter as
+        faixas travadas (ex.: inicialização com trava_tudo).
+        """
+        f = self._escolhe_faixa(rng)
+        if f is None:
+            raise ValueError("não há células livres no grid")
+        idx = self.livres[f * self.celulas_faixa + rng.randrange(self.tamanhos[f])]
+        self.remove(idx)
+        return idx
+
+    def ocupa(self, grid, valor, ao_ocupar=None, rng=random):
+        """
+        Sorteia uma célula livre e grava `valor` nela, com o lock da faixa
+        (ex.: reposição de bateria durante o jogo). `ao_ocupar(idx)` roda
+        ainda com o lock, para atualizar outras estruturas da faixa.
+        Retorna o índice da célula, ou None se o grid está cheio.
+        """
+        while True:
+            f = self._escolhe_faixa(rng)
+            if f is None:
+                return None
+            with self.regioes.trava(f * self.celulas_faixa):
+                tamanho = self.tamanhos[f]
+                if tamanho == 0:
+                    continue        # A faixa encheu antes do lock; sorteia de novo
+                idx = self.livres[f * self.celulas_faixa + rng.randrange(tamanho)]
+                self.remove(idx)
+                grid[idx] = valor
+                if ao_ocupar:
+                    ao_ocupar(idx)
+                return idx
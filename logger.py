@@ -0,0 +1,126 @@
+import queue
+import struct
+import sys
+import time
+
+"""
+Subsistema de log assíncrono.
+Os robôs só enfileiram registros (log() não abre arquivo nem espera disco);
+um único processo escritor (logger_process) agrupa os registros em lotes e
+grava quando o lote enche ou quando passa o intervalo de flush. Qualquer
+processo conectado pode pedir a gravação imediata do lote com descarrega().
+O escritor termina ao receber None na fila, depois de gravar tudo o que falta.
+
+Formatos:
+    - 'texto': uma linha "[HH:MM:SS] mensagem" em log_<id>.txt por robô
+    - 'binario': registros compactos em log.bin (ver REGISTRO_BINARIO),
+      que podem ser lidos com `python3 logger.py log.bin`
+"""
+
+FORMATO_TEXTO = 'texto'
+FORMATO_BINARIO = 'binario'
+ARQUIVO_BINARIO = 'log.bin'
+
+# Cabeçalho de um registro binário: instante, tamanho do id, tamanho da mensagem
+REGISTRO_BINARIO = struct.Struct('<dBH')
+
+# Marcador na fila: grava o lote atual sem esperar o intervalo de flush
+DESCARGA = 'descarga'
+
+_fila = None
+_formato = FORMATO_TEXTO
+
+# Conecta o processo atual à fila do escritor
+def conecta(fila, formato=FORMATO_TEXTO):
+    global _fila, _formato
+    _fila = fila
+    _formato = formato
+
+def empacota(instante, robot_char, message):
+    rid = robot_char.encode()
+    msg = message.encode()[:0xFFFF]
+    return REGISTRO_BINARIO.pack(instante, len(rid), len(msg)) + rid + msg
+
+def log(robot_char, message):
+    if _fila is None:
+        # Sem escritor (ex.: função usada fora do jogo): grava direto
+        with open(f"log_{robot_char}.txt", "a") as f:
+            f.write(f"[{time.strftime('%H:%M:%S')}] {message}\n")
+        return
+
+    if _formato == FORMATO_BINARIO:
+        _fila.put(empacota(time.time(), robot_char, message))
+    else:
+        _fila.put((time.time(), robot_char, message))
+
+def descarrega():
+    if _fila is not None:
+        _fila.put(DESCARGA)
+
+def grava_lote(lote, arquivos, formato):
+    if formato == FORMATO_BINARIO:
+        f = arquivos.get(ARQUIVO_BINARIO)
+        if f is None:
+            f = arquivos[ARQUIVO_BINARIO] = open(ARQUIVO_BINARIO, "ab")
+        f.write(b''.join(lote))
+        f.flush()
+        return
+
+    # Agrupa as linhas por arquivo para uma escrita por arquivo
+    por_arquivo = {}
+    for instante, robot_char, message in lote:
+        linha = f"[{time.strftime('%H:%M:%S', time.localtime(instante))}] {message}\n"
+        por_arquivo.setdefault(f"log_{robot_char}.txt", []).append(linha)
+
+    for nome, linhas in por_arquivo.items():
+        f = arquivos.get(nome)
+        if f is None:
+            f = arquivos[nome] = open(nome, "a")
+        f.write(''.join(linhas))
+        f.flush()
+
+def logger_process(fila, formato=FORMATO_TEXTO, lote_maximo=256, intervalo=0.5):
+    arquivos = {}
+    lote = []
+    proximo_flush = time.monotonic() + intervalo
+    ativo = True
+
+    while ativo:
+        descarga = False
+        try:
+            registro = fila.get(timeout=max(0.0, proximo_flush - time.monotonic()))
+            if registro is None:
+                ativo = False
+            elif registro == DESCARGA:
+                descarga = True
+            else:
+                lote.append(registro)
+        except queue.Empty:
+            pass
+
+        if lote and (descarga or len(lote) >= lote_maximo or time.monotonic() >= proximo_flush or not ativo):
+            grava_lote(lote, arquivos, formato)
+            lote = []
+        if time.monotonic() >= proximo_flush:
+            proximo_flush = time.monotonic() + intervalo
+
+    for f in arquivos.values():
+        f.close()
+
+# Lê os registros de um arquivo binário como tuplas (instante, id, mensagem)
+def le_binario(caminho):
+    with open(caminho, "rb") as f:
+        dados = f.read()
+    pos = 0
+    while pos + REGISTRO_BINARIO.size <= len(dados):
+        instante, tam_id, tam_msg = REGISTRO_BINARIO.unpack_from(dados, pos)
+        pos += REGISTRO_BINARIO.size
+        robot_char = dados[pos:pos + tam_id].decode()
+        pos += tam_id
+        message = dados[pos:pos + tam_msg].decode(errors='replace')
+        pos += tam_msg
+        yield instante, robot_char, message
+
+if __name__ == "__main__":
+    for instante, robot_char, message in le_binario(sys.argv[1] if len(sys.argv) > 1 else ARQUIVO_BINARIO):
+        print(f"[{time.strftime('%H:%M:%S', time.localtime(instante))}] {robot_char}: {message}")
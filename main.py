@@ -1,87 +1,261 @@
+import argparse
+import functools
 import multiprocessing as mp
-from ctypes import c_char, c_bool
+from ctypes import c_int
 import time
 import random
-from constants import GRID_WIDTH, GRID_HEIGHT, NUM_ROBOTS, NUM_BARRIERS, NUM_BATTERIES
-from robot import robot_process
+from constants import GRID_WIDTH, GRID_HEIGHT, MAX_ENERGY, NUM_ROBOTS, ROBOT_IDS, NUM_BARRIERS, NUM_BATTERIES, REGION_HEIGHT, LOG_FORMAT, TICK_INTERVAL, LOCK_STATS, NUM_WORKERS, PHASE_STATS, CPROFILE
+from shared import Flags
+import celulas
+from regioes import Regioes
+import travas
+import perfil
+import logger
+import replay
+from replay import Gravador
+from robot import worker_process
+import espacial
+from caminhos import Caminhos
+from livres import CelulasLivres
 from viewer import viewer_process
+from viewer_curses import viewer_curses_process
+from logger import logger_process
+from escalonador import Escalonador
+from fragmentos import Fragmentos
+from arbitro import Arbitro
+from espectadores import servidor_process
 
-def inicializa_grid(grid, grid_mutex):
-    with grid_mutex:
-        # Limpa o grid e preenche com espaços vazio ' '
+def inicializa_grid(grid, regioes, posicoes, indice, livres):
+    with regioes.trava_tudo():
+        # Limpa o grid (células vazias)
         for i in range(GRID_WIDTH * GRID_HEIGHT):
-            grid[i] = b' '
+            grid[i] = celulas.VAZIO
 
-        # Cria a borda do GRID usando o caractere '#'
+        # Cria a borda do GRID com barreiras
         for x in range(GRID_WIDTH):
-            grid[0 * GRID_WIDTH + x] = b'#'
-            grid[(GRID_HEIGHT - 1) * GRID_WIDTH + x] = b'#'
+            grid[0 * GRID_WIDTH + x] = celulas.BARREIRA
+            grid[(GRID_HEIGHT - 1) * GRID_WIDTH + x] = celulas.BARREIRA
         for y in range(GRID_HEIGHT):
-            grid[y * GRID_WIDTH + 0] = b'#'
-            grid[y * GRID_WIDTH + (GRID_WIDTH - 1)] = b'#'
+            grid[y * GRID_WIDTH + 0] = celulas.BARREIRA
+            grid[y * GRID_WIDTH + (GRID_WIDTH - 1)] = celulas.BARREIRA
+
+        # Conjunto de células livres: cada item abaixo é sorteado em O(1),
+        # sem tentativa e erro, mesmo em mapas densos
+        livres.enche(grid)
 
         # Posiciona as barreiras de forma aleatória
         for _ in range(NUM_BARRIERS):
-            while True:
-                x = random.randint(1, GRID_WIDTH - 2)
-                y = random.randint(1, GRID_HEIGHT - 2)
-                idx = y * GRID_WIDTH + x
-                if grid[idx] == b' ':
-                    grid[idx] = b'#'
-                    break
-
-        # Posiciona as baterias de forma aleatória
-        for _ in range(NUM_BATTERIES):
-            while True:
-                x = random.randint(1, GRID_WIDTH - 2)
-                y = random.randint(1, GRID_HEIGHT - 2)
-                idx = y * GRID_WIDTH + x
-                if grid[idx] == b' ':
-                    grid[idx] = b'&'
-                    break
-
-        # Posiciona robôs com IDs 'A', 'B', 'C', 'D'
-        rob_ids = [b'A', b'B', b'C', b'D']
-        for rid in rob_ids:
-            while True:
-                x = random.randint(1, GRID_WIDTH - 2)
-                y = random.randint(1, GRID_HEIGHT - 2)
-                idx = y * GRID_WIDTH + x
-                if grid[idx] == b' ':
-                    grid[idx] = rid
-                    break
-
-def cria_flags(manager):
-    flags = manager.dict()
-    flags['game_over'] = False
-    return flags
+            grid[livres.sorteia()] = celulas.BARREIRA
 
-def main():
-    grid = mp.Array(c_char, GRID_WIDTH * GRID_HEIGHT)
-    grid_mutex = mp.Lock()
+        # Posiciona as baterias de forma aleatória (numeradas na própria célula)
+        for numero in range(NUM_BATTERIES):
+            grid[livres.sorteia()] = celulas.bateria(numero)
 
-    manager = mp.Manager()
-    flags = cria_flags(manager)
+        # Posiciona os robôs; a célula guarda o índice do robô
+        for i in range(NUM_ROBOTS):
+            idx = livres.sorteia()
+            grid[idx] = celulas.robo(i)
+            # Registra a posição na tabela indexada pelo id do robô
+            posicoes[2 * i] = idx % GRID_WIDTH
+            posicoes[2 * i + 1] = idx // GRID_WIDTH
 
-    inicializa_grid(grid, grid_mutex)
+        # Monta o índice espacial com as baterias e robôs posicionados
+        espacial.constroi(grid, indice)
 
-    robos = []
+def cria_flags(compartilhada=True):
+    # Bloco de estado em memória compartilhada (sem processo Manager); o
+    # motor assíncrono, de um processo só, usa um bloco comum
+    flags = mp.RawValue(Flags) if compartilhada else Flags()
+    flags.game_over = False
+    flags.vivos = NUM_ROBOTS
     for i in range(NUM_ROBOTS):
-        # A chamada do processo continua a mesma
-        p = mp.Process(target=robot_process, args=(grid, grid_mutex, flags, i))
+        flags.robos[i].energia = MAX_ENERGY
+        flags.robos[i].forca = random.randint(5, 15)
+    return flags
+
+# Entre dois ticks (nenhum trabalhador agindo): o árbitro aplica as
+# intenções do tick, os robôs que continuam no jogo são redivididos e o
+# quadro-chave do replay é gravado, se houver
+def fim_do_tick(grid, flags, posicoes, arbitro, fragmentos, gravador, tick):
+    arbitro.resolve(tick)
+    fragmentos.compacta(lambda i: flags.robos[i].energia > 0 and posicoes[2 * i] >= 0)
+    if gravador:
+        gravador.fim_do_tick(grid, tick)
+
+# Processo do escalonador, onde também roda o árbitro (que registra no log e no replay)
+def escalonador_process(escalonador, intervalo, ao_fim_do_tick, fila_log, gravador):
+    logger.conecta(fila_log, LOG_FORMAT)
+    replay.conecta(gravador)
+    perfil.perfilado("arbitro", escalonador.executa, intervalo, ao_fim_do_tick)
+
+def main(intervalo=TICK_INTERVAL, viewer=True, limite=None, gravar=None, espectadores=None):
+    """
+    Roda uma partida. Com viewer=False a partida roda sem exibição (usado
+    pelos benchmarks) e com viewer="curses" ela é exibida numa janela
+    rolável (ver viewer_curses.py); com `limite` (segundos) a partida é
+    encerrada se não acabar antes; com `gravar`, a partida é gravada em
+    <gravar>.eventos e <gravar>.quadros (ver replay.py); com `espectadores`
+    (caminho de socket Unix ou host:porta), a partida é transmitida nesse
+    endereço (ver espectadores.py). Retorna as métricas da partida em um
+    dicionário.
+    """
+    grid = mp.RawArray(celulas.c_celula, GRID_WIDTH * GRID_HEIGHT)
+
+    # Histogramas de espera/posse dos locks, lidos ao vivo com `python3 travas.py`
+    estatisticas = travas.EstatisticasLocks(["grid", "flags_mutex"], NUM_ROBOTS) if LOCK_STATS else None
+
+    # Robôs divididos entre um número fixo de processos trabalhadores
+    num_trabalhadores = max(1, min(NUM_WORKERS, NUM_ROBOTS))
+
+    # Tempo de cada robô por fase do tick, impresso no fim (ver perfil.py)
+    fases = None
+    if PHASE_STATS:
+        rotulos = list(ROBOT_IDS) + [f"trabalhador {w}" for w in range(num_trabalhadores)] + ["árbitro"]
+        fases = perfil.EstatisticasFases(rotulos, NUM_ROBOTS)
+    if CPROFILE:
+        perfil.limpa_perfis()
+
+    # Locks por faixa de linhas do grid no lugar de um único grid_mutex
+    regioes = Regioes(GRID_WIDTH, GRID_HEIGHT, REGION_HEIGHT, estatisticas)
+
+    # Tabela de posições (x, y) de cada robô, protegida pelos locks das regiões.
+    # Um robô removido do grid fica com posição (-1, -1).
+    posicoes = mp.RawArray(c_int, 2 * NUM_ROBOTS)
+
+    # Contagem de baterias e robôs por bucket do índice espacial
+    indice = mp.RawArray(c_int, espacial.NUM_BUCKETS)
+
+    flags = cria_flags()
+    flags_mutex = travas.cria_lock(estatisticas, "flags_mutex")
+
+    # Células vazias do grid, mantidas pelos movimentos, coletas e mortes
+    livres = CelulasLivres(regioes)
+
+    inicializa_grid(grid, regioes, posicoes, indice, livres)
+
+    # Campos de distância até cada bateria, calculados uma vez sobre o mapa
+    caminhos = Caminhos(GRID_WIDTH, GRID_HEIGHT, NUM_BATTERIES)
+    caminhos.constroi(grid)
+
+    # Processo escritor do log: os robôs só enfileiram as mensagens
+    fila_log = mp.Queue()
+    escritor_log = mp.Process(target=logger_process, args=(fila_log, LOG_FORMAT))
+    escritor_log.start()
+
+    # Trecho de robôs de cada trabalhador, redividido quando robôs saem do jogo
+    fragmentos = Fragmentos(NUM_ROBOTS, num_trabalhadores)
+
+    # Escalonador de ticks: todos os trabalhadores avançam juntos, um tick por vez
+    escalonador = Escalonador(num_trabalhadores)
+
+    # Árbitro: recebe as intenções dos robôs e as aplica no fim de cada tick
+    arbitro = Arbitro(grid, regioes, posicoes, indice, caminhos, livres, flags, flags_mutex, escalonador, NUM_ROBOTS, fases)
+
+    # Gravação para replay: eventos e quadros-chave escritos no processo do escalonador
+    gravador = None
+    if gravar:
+        gravador = Gravador(gravar, GRID_WIDTH, GRID_HEIGHT, escalonador.tick)
+        gravador.quadro_chave(grid, -1)
+
+    ao_fim_do_tick = functools.partial(fim_do_tick, grid, flags, posicoes, arbitro, fragmentos, gravador)
+    proc_escalonador = mp.Process(target=escalonador_process, args=(escalonador, intervalo, ao_fim_do_tick, fila_log, gravador))
+    proc_escalonador.start()
+
+    inicio = time.perf_counter()
+    trabalhadores = []
+    for w in range(num_trabalhadores):
+        p = mp.Process(target=perfil.perfilado,
+                       args=(f"trabalhador{w}", worker_process, grid, regioes, posicoes, indice, caminhos, flags,
+                             fila_log, escalonador, fragmentos, arbitro.intencoes, w, fases))
         p.start()
-        robos.append(p)
+        trabalhadores.append(p)
+
+    if viewer == "curses":
+        proc_viewer = mp.Process(target=viewer_curses_process,
+                                 args=(grid, regioes, posicoes, flags, GRID_WIDTH, GRID_HEIGHT, ROBOT_IDS))
+        proc_viewer.start()
+    elif viewer:
+        proc_viewer = mp.Process(target=viewer_process, args=(grid, regioes, flags))
+        proc_viewer.start()
+
+    # Servidor dos espectadores: um snapshot por tick, para qualquer número de clientes
+    if espectadores:
+        proc_espectadores = mp.Process(target=servidor_process,
+                                       args=(grid, regioes, escalonador, espectadores, GRID_WIDTH, GRID_HEIGHT))
+        proc_espectadores.start()
 
-    viewer = mp.Process(target=viewer_process, args=(grid, flags))
-    viewer.start()
+    encerrada = False
+    for p in trabalhadores:
+        restante = None if limite is None else max(0.0, inicio + limite - time.perf_counter())
+        p.join(restante)
+        if p.is_alive():
+            # Tempo esgotado: encerra a partida e espera os trabalhadores saírem
+            encerrada = True
+            flags.game_over = True
+            escalonador.encerra()
+            p.join()
+    duracao = time.perf_counter() - inicio
 
-    for p in robos:
-        p.join()
+    flags.game_over = True
+    escalonador.encerra()
+    proc_escalonador.join()
+    if viewer:
+        proc_viewer.join()
+    if espectadores:
+        proc_espectadores.join()
 
-    flags['game_over'] = True
-    viewer.join()
+    # Fim de jogo: o escritor grava o que falta e termina
+    fila_log.put(None)
+    escritor_log.join()
+
+    if gravador:
+        gravador.fecha(grid)
 
     print("Jogo finalizado.")
+    if estatisticas:
+        travas.imprime(estatisticas, ROBOT_IDS)
+        estatisticas.fecha()
+    if fases:
+        perfil.imprime(fases, por_robo=NUM_ROBOTS <= 26)
+    if CPROFILE:
+        perfil.junta_perfis()
+
+    vencedor = None
+    if not encerrada and flags.vivos == 1:
+        vencedor = next(ROBOT_IDS[i] for i in range(NUM_ROBOTS) if flags.robos[i].energia > 0)
+    movimentos = sum(flags.robos[i].movimentos for i in range(NUM_ROBOTS))
+    contencoes, espera = regioes.estatisticas()
+    return {
+        'duracao': duracao,
+        'ticks': escalonador.tick.value,
+        'movimentos': movimentos,
+        'movimentos_s': movimentos / duracao,
+        'ticks_s': escalonador.tick.value / duracao,
+        'contencoes_lock': contencoes,
+        'espera_lock_s': espera,
+        'vencedor': vencedor,
+        'tempo_vencedor': duracao if vencedor else None,
+        'encerrada_por_limite': encerrada,
+        'cpu_robos': [flags.robos[i].cpu for i in range(NUM_ROBOTS)],
+    }
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Arena dos Robôs")
+    parser.add_argument("--max-speed", action="store_true",
+                        help="roda os ticks sem espera, o mais rápido possível")
+    parser.add_argument("--tick", type=float, default=TICK_INTERVAL,
+                        help="intervalo entre ticks em segundos")
+    parser.add_argument("--sem-viewer", action="store_true",
+                        help="roda sem exibir a arena")
+    parser.add_argument("--curses", action="store_true",
+                        help="exibe só uma janela rolável da arena (para arenas maiores que o terminal)")
+    parser.add_argument("--limite", type=float, default=None,
+                        help="encerra a partida depois de LIMITE segundos")
+    parser.add_argument("--gravar", metavar="NOME",
+                        help="grava a partida para replay em NOME.eventos e NOME.quadros")
+    parser.add_argument("--espectadores", metavar="ENDERECO",
+                        help="transmite a partida num socket Unix (caminho) ou TCP (host:porta)")
+    args = parser.parse_args()
+
+    viewer = False if args.sem_viewer else ("curses" if args.curses else True)
+    main(0 if args.max_speed else args.tick, viewer, args.limite, args.gravar, args.espectadores)
@@ -0,0 +1,251 @@
+"""
+Motor assíncrono: a partida inteira em um processo, com os robôs como corrotinas.
+
+Cada robô é uma corrotina no mesmo event loop: a cada tick decide a ação
+(decide_robo, as mesmas regras de robot.py) e a envia ao árbitro, que a
+aplica no fim do tick (arbitro.py), como no motor com processos. O grid, as
+posições, as flags, as faixas, as células livres, os campos de distância e
+o anel de intenções são arrays ctypes comuns do processo, com locks que não
+fazem nada; o viewer e o escritor do log também são corrotinas, e todo ritmo
+é dado por asyncio.sleep.
+Não há spawn de processo nem memória compartilhada por robô, então centenas
+de robôs sobem em uma fração do tempo e da memória de main.py:
+
+    python3 motor_async.py
+    python3 motor_async.py --max-speed
+    ARENA_NUM_ROBOTS=500 ARENA_GRID_WIDTH=300 ARENA_GRID_HEIGHT=100 python3 motor_async.py --max-speed --sem-viewer
+
+Para comparar com main.py: `python3 bench.py partidas --motor main async`.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import queue
+import time
+from ctypes import c_int
+from constants import GRID_WIDTH, GRID_HEIGHT, NUM_ROBOTS, ROBOT_IDS, NUM_BATTERIES, REGION_HEIGHT, LOG_FORMAT, TICK_INTERVAL
+import celulas
+import espacial
+import logger
+from logger import log
+from regioes import Regioes
+from livres import CelulasLivres
+from caminhos import Caminhos
+from arbitro import Arbitro
+from robot import NADA, decide_robo
+from main import inicializa_grid, cria_flags
+from renderizador import RenderizadorDiff
+from viewer import converte_linha, monta_linhas
+
+"""
+Escalonador de ticks em lockstep para corrotinas, com a mesma interface de
+escalonador.py (proximo_tick, sai, encerra, executa). Tudo roda em uma
+thread só: a condição do asyncio só serve para as corrotinas dormirem até o
+tick mudar. encerra() não é corrotina, para o árbitro chamá-la como faz com
+o escalonador de processos; o aviso aos participantes fica agendado no loop.
+"""
+class EscalonadorAsync():
+    def __init__(self, num_participantes):
+        self.cond = asyncio.Condition()
+        self.tick = 0
+        self.ativos = num_participantes
+        self.pendentes = num_participantes
+        self.encerrado = False
+
+    # Conclui o tick `visto` e espera o próximo. Retorna o tick atual.
+    async def proximo_tick(self, visto):
+        async with self.cond:
+            if not self.encerrado and visto == self.tick:
+                self.pendentes -= 1
+                if self.pendentes == 0:
+                    self.cond.notify_all()
+            await self.cond.wait_for(lambda: self.tick > visto or self.encerrado)
+            return self.tick
+
+    # Remove um participante que não vai mais concluir ticks
+    async def sai(self, visto):
+        async with self.cond:
+            self.ativos -= 1
+            if not self.encerrado and visto == self.tick:
+                self.pendentes -= 1
+            self.cond.notify_all()
+
+    async def _acorda(self):
+        async with self.cond:
+            self.cond.notify_all()
+
+    # Fim de jogo: acorda todos os participantes e o escalonador
+    def encerra(self):
+        self.encerrado = True
+        asyncio.get_running_loop().create_task(self._acorda())
+
+    async def executa(self, intervalo, ao_fim_do_tick=None):
+        proximo = time.monotonic() + intervalo
+        while True:
+            async with self.cond:
+                await self.cond.wait_for(lambda: self.pendentes <= 0 or self.encerrado)
+                if self.encerrado or self.ativos <= 0:
+                    self.encerrado = True
+                    self.cond.notify_all()
+                    return
+
+            # Todos esperam o próximo tick: o estado do jogo está parado
+            if ao_fim_do_tick:
+                ao_fim_do_tick(self.tick)
+
+            # Ritmo configurável; na velocidade máxima só cede a vez (viewer, log)
+            if intervalo > 0:
+                agora = time.monotonic()
+                await asyncio.sleep(max(0.0, proximo - agora))
+                proximo = max(proximo + intervalo, time.monotonic())
+            else:
+                await asyncio.sleep(0)
+
+            async with self.cond:
+                self.tick += 1
+                self.pendentes = self.ativos
+                self.cond.notify_all()
+
+# Corrotina de um robô: o loop de worker_process para um robô só
+async def robo(grid, regioes, posicoes, indice, caminhos, flags, escalonador, intencoes, robot_id_index):
+    status = flags.robos[robot_id_index]
+    log(ROBOT_IDS[robot_id_index], f"Robô IA '{ROBOT_IDS[robot_id_index]}' iniciado. Força: {status.forca}")
+
+    tick = 0
+    while not flags.game_over:
+        inicio_cpu = time.process_time()
+        intencao = decide_robo(grid, regioes, posicoes, indice, caminhos, flags, robot_id_index)
+        status.cpu += time.process_time() - inicio_cpu
+        if intencao is None:
+            log(ROBOT_IDS[robot_id_index], "Fora do jogo.")
+            break
+        if intencao[0] != NADA:
+            intencoes.publica([(robot_id_index,) + intencao])
+
+        tick = await escalonador.proximo_tick(tick)
+
+    await escalonador.sai(tick)
+
+async def viewer(grid, flags, max_fps=10):
+    renderizador = RenderizadorDiff(max_fps, converte=converte_linha)
+
+    while not flags.game_over:
+        # Nenhum robô age enquanto o viewer copia: o quadro já é consistente
+        renderizador.desenha(monta_linhas(bytes(grid)))
+        await asyncio.sleep(renderizador.atraso_quadro())
+
+    renderizador.fim()
+    print("Viewer finalizado - jogo acabou.")
+
+# Escritor do log: grava o que os robôs enfileiraram a cada `intervalo`
+async def escritor_log(fila, fim, formato, intervalo=0.5):
+    arquivos = {}
+    while True:
+        lote = []
+        while True:
+            try:
+                lote.append(fila.get_nowait())
+            except queue.Empty:
+                break
+        if lote:
+            logger.grava_lote(lote, arquivos, formato)
+        if fim.is_set():
+            break
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(fim.wait(), intervalo)
+
+    for f in arquivos.values():
+        f.close()
+
+async def partida(intervalo, mostrar, limite):
+    grid = (celulas.c_celula * (GRID_WIDTH * GRID_HEIGHT))()
+    # Estruturas comuns do processo, sem memória compartilhada nem locks de verdade
+    regioes = Regioes(GRID_WIDTH, GRID_HEIGHT, REGION_HEIGHT, compartilhada=False)
+    posicoes = (c_int * (2 * NUM_ROBOTS))()
+    indice = (c_int * espacial.NUM_BUCKETS)()
+    flags = cria_flags(compartilhada=False)
+    livres = CelulasLivres(regioes, compartilhada=False)
+    inicializa_grid(grid, regioes, posicoes, indice, livres)
+
+    caminhos = Caminhos(GRID_WIDTH, GRID_HEIGHT, NUM_BATTERIES, compartilhada=False)
+    caminhos.constroi(grid)
+
+    # Log enfileirado em memória; a corrotina escritora grava em lotes
+    fila_log = queue.SimpleQueue()
+    logger.conecta(fila_log, LOG_FORMAT)
+    fim_log = asyncio.Event()
+    tarefa_log = asyncio.create_task(escritor_log(fila_log, fim_log, LOG_FORMAT))
+
+    # Um participante por robô; o árbitro roda entre os ticks, na mesma thread,
+    # então o mutex das flags não precisa ser um lock de verdade
+    escalonador = EscalonadorAsync(NUM_ROBOTS)
+    arbitro = Arbitro(grid, regioes, posicoes, indice, caminhos, livres, flags, contextlib.nullcontext(),
+                      escalonador, NUM_ROBOTS, compartilhada=False)
+    tarefa_escalonador = asyncio.create_task(escalonador.executa(intervalo, arbitro.resolve))
+
+    inicio = time.perf_counter()
+    robos = [asyncio.create_task(robo(grid, regioes, posicoes, indice, caminhos, flags, escalonador,
+                                      arbitro.intencoes, i))
+             for i in range(NUM_ROBOTS)]
+    tarefa_viewer = asyncio.create_task(viewer(grid, flags)) if mostrar else None
+
+    _, pendentes = await asyncio.wait(robos, timeout=limite)
+    encerrada = bool(pendentes)
+    if encerrada:
+        # Tempo esgotado: encerra a partida e espera os robôs saírem
+        flags.game_over = True
+        escalonador.encerra()
+        await asyncio.wait(pendentes)
+    duracao = time.perf_counter() - inicio
+
+    flags.game_over = True
+    escalonador.encerra()
+    await tarefa_escalonador
+    if tarefa_viewer:
+        await tarefa_viewer
+
+    fim_log.set()
+    await tarefa_log
+
+    print("Jogo finalizado.")
+
+    vencedor = None
+    if not encerrada and flags.vivos == 1:
+        vencedor = next(ROBOT_IDS[i] for i in range(NUM_ROBOTS) if flags.robos[i].energia > 0)
+    movimentos = sum(flags.robos[i].movimentos for i in range(NUM_ROBOTS))
+    contencoes, espera = regioes.estatisticas()
+    return {
+        'duracao': duracao,
+        'ticks': escalonador.tick,
+        'movimentos': movimentos,
+        'movimentos_s': movimentos / duracao,
+        'ticks_s': escalonador.tick / duracao,
+        'contencoes_lock': contencoes,
+        'espera_lock_s': espera,
+        'vencedor': vencedor,
+        'tempo_vencedor': duracao if vencedor else None,
+        'encerrada_por_limite': encerrada,
+        'cpu_robos': [flags.robos[i].cpu for i in range(NUM_ROBOTS)],
+    }
+
+def main(intervalo=TICK_INTERVAL, viewer=True, limite=None):
+    """
+    Roda uma partida no event loop e retorna as mesmas métricas de
+    main.main(), para comparar os dois motores.
+    """
+    return asyncio.run(partida(intervalo, viewer, limite))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Arena dos Robôs (motor assíncrono, um processo)")
+    parser.add_argument("--max-speed", action="store_true",
+                        help="roda os ticks sem espera, o mais rápido possível")
+    parser.add_argument("--tick", type=float, default=TICK_INTERVAL,
+                        help="intervalo entre ticks em segundos")
+    parser.add_argument("--sem-viewer", action="store_true",
+                        help="roda sem exibir a arena")
+    parser.add_argument("--limite", type=float, default=None,
+                        help="encerra a partida depois de LIMITE segundos")
+    args = parser.parse_args()
+
+    main(0 if args.max_speed else args.tick, not args.sem_viewer, args.limite)
@@ -0,0 +1,413 @@
+"""
+Motor headless vetorizado com NumPy.
+
+Simula várias partidas ao mesmo tempo em um único processo, sem sleeps, sem
+viewer e sem log. O estado de todos os robôs de todas as partidas fica em
+arrays (posição, energia, força) e cada tick é calculado com operações em
+lote, seguindo as regras de robot.py:
+
+    - alvo = bateria ou robô vivo mais próximo (distância ao quadrado,
+      desempate pela ordem de varredura do grid)
+    - robô inimigo adjacente (dist² == 1): batalha com poder 2*força + energia;
+      o perdedor (ou ambos, no empate) fica com energia 0 e sai do grid
+    - alvo bateria: passo pelo campo de distância dessa bateria (caminhos.py,
+      BFS sobre as barreiras), no primeiro vizinho com distância uma unidade
+      menor que esteja vazio ou tenha bateria; sem caminho até ela, passo
+      preferencial (eixo de maior distância e depois o outro)
+    - alvo robô: passo preferencial; se os dois estiverem bloqueados, passo
+      pelo campo da bateria ativa mais próxima
+    - cada movimento gasta 1 de energia; bateria dá +20 (até MAX_ENERGY)
+    - robô sem energia para, mas continua no grid como obstáculo
+    - a partida acaba quando resta no máximo um robô com energia
+
+Com campos=False (--sem-campos), o passo é sempre o preferencial: sem os
+campos de distância, que são a maior parte do custo de montar as partidas. É
+o movimento de robot.py antes de caminhos.py, bem mais rápido, mas as
+partidas travam mais (robôs presos atrás de barreiras).
+
+Com velocidade_max > 1, cada robô recebe uma velocidade v entre 1 e
+velocidade_max (como em robot_v2.py) e só age nos ticks múltiplos de v.
+
+Como um tick é determinístico, uma partida em que nenhum robô se moveu nem
+batalhou durante velocidade_max ticks seguidos (todos tentaram agir sobre o
+mesmo estado) está travada para sempre (robôs presos atrás de barreiras).
+Ela é encerrada na hora, sem vencedor, e marcada em `travada`. As que ainda
+estiverem em andamento em max_ticks (executa) terminam empatadas e ficam
+marcadas em `no_limite`. Partidas encerradas saem dos arrays de trabalho,
+então o custo de um tick acompanha só as partidas em andamento; os campos de
+distância, que não mudam, ficam indexados pelo número da partida.
+
+Como no árbitro de main.py (arbitro.py), todos os robôs de um tick decidem
+com base no estado do início do tick. As batalhas são resolvidas antes dos
+movimentos, na ordem dos atacantes, e quem já perdeu uma não luta outra; se
+dois robôs escolhem a mesma célula, o de menor id se move. Não há reposição
+de baterias (BATTERY_RESPAWN).
+
+    python3 motor_numpy.py --partidas 1000 --semente 0
+"""
+
+import argparse
+import time
+import numpy as np
+from constants import GRID_WIDTH, GRID_HEIGHT, MAX_ENERGY, NUM_ROBOTS, NUM_BATTERIES, NUM_BARRIERS
+
+VAZIO = 0
+BARREIRA = 1
+BATERIA = 2
+ROBO = 3
+
+BONUS_BATERIA = 20
+SEM_ALVO = np.iinfo(np.int64).max
+
+# Distância sem caminho nos campos (caminhos.INALCANCAVEL)
+INALCANCAVEL = -1
+
+# Vizinhos na ordem de caminhos.Caminhos._vizinhos: esquerda, direita, cima, baixo
+VIZINHOS_X = np.array([-1, 1, 0, 0])
+VIZINHOS_Y = np.array([0, 0, -1, 1])
+
+class MotorVetorizado():
+    def __init__(self, num_partidas, semente=None, largura=GRID_WIDTH, altura=GRID_HEIGHT,
+                 num_robos=NUM_ROBOTS, num_baterias=NUM_BATTERIES, num_barreiras=NUM_BARRIERS,
+                 velocidade_max=1, campos=True):
+        self.M = num_partidas
+        self.N = num_robos
+        self.NB = num_baterias
+        self.W = largura
+        self.H = altura
+        self.velocidade_max = velocidade_max
+        self.usa_campos = campos
+        self.rng = np.random.default_rng(semente)
+
+        self.tick = 0
+        self.passos_robo = 0            # Ações de robôs simuladas (robô x tick)
+
+        # Resultados, indexados pelo número da partida
+        self.vencedor = np.full(self.M, -1, dtype=np.int32)
+        self.ticks_fim = np.zeros(self.M, dtype=np.int64)
+        self.travada = np.zeros(self.M, dtype=bool)
+        self.no_limite = np.zeros(self.M, dtype=bool)
+        self.terminada = np.zeros(self.M, dtype=bool)
+
+        self._inicializa(num_barreiras)
+
+        # Partidas em andamento: linhas dos arrays de trabalho -> número da partida
+        self.ids = np.arange(self.M)
+
+    # Equivalente vetorizado de inicializa_grid em main.py
+    def _inicializa(self, num_barreiras):
+        M, N, NB, W, H = self.M, self.N, self.NB, self.W, self.H
+
+        self.grid = np.zeros((M, H, W), dtype=np.uint8)
+        self.grid[:, 0, :] = BARREIRA
+        self.grid[:, H - 1, :] = BARREIRA
+        self.grid[:, :, 0] = BARREIRA
+        self.grid[:, :, W - 1] = BARREIRA
+
+        # Sorteia células internas distintas para barreiras, baterias e robôs
+        internas = (W - 2) * (H - 2)
+        k = num_barreiras + NB + N
+        chaves = self.rng.random((M, internas))
+        escolhidas = np.argpartition(chaves, k - 1, axis=1)[:, :k]
+        ordem = np.argsort(np.take_along_axis(chaves, escolhidas, axis=1), axis=1)
+        escolhidas = np.take_along_axis(escolhidas, ordem, axis=1)
+        cx = 1 + escolhidas % (W - 2)
+        cy = 1 + escolhidas // (W - 2)
+
+        m = np.arange(M)[:, None]
+        self.grid[m, cy[:, :num_barreiras], cx[:, :num_barreiras]] = BARREIRA
+
+        self.bx = cx[:, num_barreiras:num_barreiras + NB].astype(np.int64)
+        self.by = cy[:, num_barreiras:num_barreiras + NB].astype(np.int64)
+        self.bviva = np.ones((M, NB), dtype=bool)
+        self.grid[m, self.by, self.bx] = BATERIA
+
+        self.x = cx[:, num_barreiras + NB:].astype(np.int64)
+        self.y = cy[:, num_barreiras + NB:].astype(np.int64)
+        self.no_grid = np.ones((M, N), dtype=bool)
+        self.grid[m, self.y, self.x] = ROBO
+
+        # Campos por bateria e o combinado (bateria ativa mais próxima), como
+        # em caminhos.Caminhos; o combinado só muda quando uma bateria é coletada
+        if self.usa_campos:
+            self.campos = self._campos_distancia(self.grid != BARREIRA)
+            self.combinado = self._combina(self.campos)
+
+        self.energia = np.full((M, N), MAX_ENERGY, dtype=np.int64)
+        self.forca = self.rng.integers(5, 16, size=(M, N)).astype(np.int64)
+        self.velocidade = self.rng.integers(1, self.velocidade_max + 1, size=(M, N)).astype(np.int64)
+        self.parado = np.zeros(M, dtype=np.int64)      # Ticks seguidos sem movimento nem batalha
+
+    # Campos de distância (M, NB, H, W) até cada bateria, como em
+    # caminhos.Caminhos.constroi: BFS em todas as partidas e baterias juntas,
+    # uma camada de distância por iteração. Cada linha do grid vira palavras de
+    # 64 bits (célula x no bit x % 64 da palavra x // 64), e a distância de
+    # cada célula é guardada bit a bit em planos, desempacotados no fim
+    def _campos_distancia(self, livre):
+        M, NB, H, W = self.M, self.NB, self.H, self.W
+        largura = -(-W // 64) * 64
+
+        def empacota(bits):
+            completo = np.zeros(bits.shape[:-1] + (largura,), dtype=bool)
+            completo[..., :W] = bits
+            return np.packbits(completo, axis=-1, bitorder='little').view('<u8')
+
+        fronteira = np.zeros((M, NB, H, W), dtype=bool)
+        fronteira[np.arange(M)[:, None], np.arange(NB)[None, :], self.by, self.bx] = True
+        fronteira = empacota(fronteira)
+        alcancada = fronteira.copy()
+        aberta = empacota(livre)[:, None] & ~fronteira
+        planos = []         # Plano k: bit k da distância de cada célula
+        um, ultimo = np.uint64(1), np.uint64(63)
+        d = 0
+        while True:
+            vizinhos = (fronteira << um) | (fronteira >> um)
+            vizinhos[..., 1:] |= fronteira[..., :-1] >> ultimo
+            vizinhos[..., :-1] |= fronteira[..., 1:] << ultimo
+            vizinhos[..., 1:, :] |= fronteira[..., :-1, :]
+            vizinhos[..., :-1, :] |= fronteira[..., 1:, :]
+            fronteira = vizinhos & aberta
+            if not fronteira.any():
+                break
+            d += 1
+            aberta &= ~fronteira
+            alcancada |= fronteira
+            if d.bit_length() > len(planos):
+                planos.append(np.zeros_like(fronteira))
+            for k in range(d.bit_length()):
+                if d >> k & 1:
+                    planos[k] |= fronteira
+
+        def desempacota(palavras):
+            return np.unpackbits(palavras.view(np.uint8), axis=-1, bitorder='little')
+
+        # Junta os planos em uint8 quando as distâncias cabem em 8 bits (bem mais rápido)
+        tipo = np.uint8 if len(planos) <= 8 else np.int32
+        campos = np.zeros((M, NB, H, largura), dtype=tipo)
+        for k, plano in enumerate(planos):
+            bits = desempacota(plano).astype(tipo, copy=False)
+            bits <<= k
+            campos |= bits
+        campos = campos[..., :W].astype(np.int32)
+        campos[desempacota(alcancada)[..., :W] == 0] = INALCANCAVEL
+        return campos
+
+    # Mínimo entre os campos (..., NB, H, W): em uint32, INALCANCAVEL é o
+    # maior valor e só fica onde nenhuma bateria alcança a célula
+    @staticmethod
+    def _combina(campos):
+        return campos.view(np.uint32).min(axis=-3).view(np.int32)
+
+    # Bateria `b` das partidas `ids` coletada: como nenhum robô volta a mirá-la,
+    # o campo dela vira INALCANCAVEL e só o combinado dessas partidas é recalculado
+    def _consome(self, ids, b):
+        self.campos[ids, b] = INALCANCAVEL
+        ids = np.unique(ids)
+        self.combinado[ids] = self._combina(self.campos[ids])
+
+    @staticmethod
+    def _passo_campo(d_aqui, d_vizinhos, livre_vizinhos):
+        """
+        Passo de caminhos.passos + escolhe_passo, para todos os robôs:
+        candidatos são os vizinhos com distância uma unidade menor. Retorna
+        se há candidatos, se algum está livre e o índice do primeiro livre.
+        """
+        candidato = (d_aqui[..., None] > 0) & (d_vizinhos == d_aqui[..., None] - 1)
+        ok = candidato & livre_vizinhos
+        return candidato.any(axis=-1), ok.any(axis=-1), ok.argmax(axis=-1)
+
+    # _passo_campo para os robôs (pm, pi), no campo achatado `campo` que começa
+    # em `base` para cada robô; retorna a célula do primeiro vizinho livre
+    def _passo_robos(self, campo, base, pm, pi):
+        W, H = self.W, self.H
+        x = self.x[pm, pi]
+        y = self.y[pm, pi]
+        vx = np.clip(x[:, None] + VIZINHOS_X, 0, W - 1)
+        vy = np.clip(y[:, None] + VIZINHOS_Y, 0, H - 1)
+        cv = self.grid.reshape(-1)[(pm * H * W)[:, None] + vy * W + vx]
+        livre = (cv == VAZIO) | (cv == BATERIA)
+        tem_passos, ok, k = self._passo_campo(campo[base + y * W + x], campo[base[:, None] + vy * W + vx], livre)
+        j = np.arange(len(k))
+        return tem_passos, ok, vx[j, k], vy[j, k]
+
+    # Remove dos arrays de trabalho as partidas que já terminaram
+    def _compacta(self, manter):
+        for nome in ('grid', 'bx', 'by', 'bviva', 'x', 'y', 'no_grid', 'energia', 'forca', 'velocidade', 'parado', 'ids'):
+            setattr(self, nome, getattr(self, nome)[manter])
+
+    # Avança um tick em todas as partidas que ainda não terminaram
+    def passo(self):
+        M, N, NB, W, H = len(self.ids), self.N, self.NB, self.W, self.H
+        HW = H * W
+        if M == 0:
+            return
+
+        ativo = self.energia > 0
+        self.tick += 1
+        age = ativo & (self.tick % self.velocidade == 0)
+        self.passos_robo += int(age.sum())
+        mudou = np.zeros(M, dtype=bool)
+
+        # --- Alvo mais próximo: baterias vivas e outros robôs com energia ---
+        db = (self.bx[:, None, :] - self.x[:, :, None])**2 + (self.by[:, None, :] - self.y[:, :, None])**2
+        kb = db * HW + (self.by * W + self.bx)[:, None, :]
+        kb = np.where(self.bviva[:, None, :], kb, SEM_ALVO)
+
+        dr = (self.x[:, None, :] - self.x[:, :, None])**2 + (self.y[:, None, :] - self.y[:, :, None])**2
+        kr = dr * HW + (self.y * W + self.x)[:, None, :]
+        valido = ativo[:, None, :] & ~np.eye(N, dtype=bool)[None]
+        kr = np.where(valido, kr, SEM_ALVO)
+
+        chaves = np.concatenate([kb, kr], axis=2)
+        escolha = chaves.argmin(axis=2)
+        chave_min = np.take_along_axis(chaves, escolha[:, :, None], axis=2)[:, :, 0]
+        tem_alvo = age & (chave_min != SEM_ALVO)
+        dist = np.where(tem_alvo, chave_min // HW, 0)
+        e_robo = escolha >= NB
+
+        tx = np.take_along_axis(np.concatenate([self.bx, self.x], axis=1), escolha, axis=1)
+        ty = np.take_along_axis(np.concatenate([self.by, self.y], axis=1), escolha, axis=1)
+
+        # --- Batalhas (executa_ataque), na ordem dos atacantes: quem já
+        # perdeu neste tick não luta de novo. São poucas por tick, então o
+        # laço é em Python ---
+        batalha = tem_alvo & e_robo & (dist == 1)
+        perdedor = np.zeros((M, N), dtype=bool)
+        if batalha.any():
+            bm, bi = np.nonzero(batalha)
+            bj = escolha[bm, bi] - NB
+            poder = 2 * self.forca + self.energia
+            for m, i, j in zip(bm.tolist(), bi.tolist(), bj.tolist()):
+                if perdedor[m, i] or perdedor[m, j]:
+                    continue
+                if poder[m, i] <= poder[m, j]:
+                    perdedor[m, i] = True
+                if poder[m, i] >= poder[m, j]:
+                    perdedor[m, j] = True
+
+            removidos = perdedor & self.no_grid
+            rm, ri = np.nonzero(removidos)
+            self.grid[rm, self.y[rm, ri], self.x[rm, ri]] = VAZIO
+            self.no_grid &= ~perdedor
+            self.energia[perdedor] = 0
+            mudou[bm] = True
+
+        # --- Movimento (decide_robo): campo de distância ou passo preferencial ---
+        dx = tx - self.x
+        dy = ty - self.y
+        quer_mover = tem_alvo & ~batalha & ~perdedor & ((dx != 0) | (dy != 0))
+        if quer_mover.any():
+            m = np.arange(M)[:, None]
+            sx = np.sign(dx)
+            sy = np.sign(dy)
+            horizontal = np.abs(dx) > np.abs(dy)
+            p1x = np.where(horizontal, self.x + sx, self.x)
+            p1y = np.where(horizontal, self.y, self.y + sy)
+            p2x = np.where(horizontal, self.x, self.x + sx)
+            p2y = np.where(horizontal, self.y + sy, self.y)
+            tem_p2 = np.where(horizontal, dy != 0, dx != 0)
+
+            c1 = self.grid[m, np.clip(p1y, 0, H - 1), np.clip(p1x, 0, W - 1)]
+            c2 = self.grid[m, np.clip(p2y, 0, H - 1), np.clip(p2x, 0, W - 1)]
+            ok1 = (c1 == VAZIO) | (c1 == BATERIA)
+            ok2 = tem_p2 & ((c2 == VAZIO) | (c2 == BATERIA))
+            nx = np.where(ok1, p1x, p2x)
+            ny = np.where(ok1, p1y, p2y)
+            pode = ok1 | ok2
+
+            if self.usa_campos:
+                # Alvo bateria: campo dela; sem caminho, fica o passo preferencial
+                fm, fi = np.nonzero(quer_mover & ~e_robo)
+                tem_passos, ok_campo, vx, vy = self._passo_robos(self.campos.reshape(-1),
+                                                                 (self.ids[fm] * NB + escolha[fm, fi]) * HW, fm, fi)
+                fm, fi = fm[tem_passos], fi[tem_passos]
+                nx[fm, fi] = vx[tem_passos]
+                ny[fm, fi] = vy[tem_passos]
+                pode[fm, fi] = ok_campo[tem_passos]
+
+                # Alvo robô bloqueado: campo combinado (bateria ativa mais próxima)
+                dm, di = np.nonzero(quer_mover & e_robo & ~pode)
+                if len(dm):
+                    _, ok_campo, vx, vy = self._passo_robos(self.combinado.reshape(-1), self.ids[dm] * HW, dm, di)
+                    nx[dm, di] = vx
+                    ny[dm, di] = vy
+                    pode[dm, di] = ok_campo
+
+            quer_mover &= pode
+
+            # Conflito: vários robôs querendo a mesma célula, vence o de menor id
+            mm, mi = np.nonzero(quer_mover)
+            destino = mm * HW + ny[mm, mi] * W + nx[mm, mi]
+            _, primeiros = np.unique(destino, return_index=True)
+            mm = mm[primeiros]
+            mi = mi[primeiros]
+            nx = nx[mm, mi]
+            ny = ny[mm, mi]
+
+            bateria = self.grid[mm, ny, nx] == BATERIA
+            self.grid[mm, self.y[mm, mi], self.x[mm, mi]] = VAZIO
+            self.grid[mm, ny, nx] = ROBO
+            self.x[mm, mi] = nx
+            self.y[mm, mi] = ny
+            mudou[mm] = True
+
+            energia = self.energia[mm, mi] - 1
+            self.energia[mm, mi] = np.where(bateria, np.minimum(MAX_ENERGY, energia + BONUS_BATERIA), energia)
+
+            if bateria.any():
+                coletou = (self.bx[mm] == nx[:, None]) & (self.by[mm] == ny[:, None]) & bateria[:, None]
+                linhas, cols = np.nonzero(coletou)
+                self.bviva[mm[linhas], cols] = False
+                if self.usa_campos:
+                    self._consome(self.ids[mm[linhas]], cols)
+
+        # --- Fim de jogo: no máximo um robô com energia, ou partida travada ---
+        vivos = (self.energia > 0).sum(axis=1)
+        self.parado = np.where(mudou, 0, self.parado + 1)
+        acabou = (vivos <= 1) | (self.parado >= self.velocidade_max)
+        if acabou.any():
+            ids = self.ids[acabou]
+            self.vencedor[ids] = np.where(vivos[acabou] == 1, (self.energia[acabou] > 0).argmax(axis=1), -1)
+            self.ticks_fim[ids] = self.tick
+            self.travada[ids] = (vivos[acabou] > 1)
+            self.terminada[ids] = True
+            self._compacta(~acabou)
+
+    # Roda até todas as partidas acabarem; as que chegam a max_ticks terminam empatadas
+    def executa(self, max_ticks=10000):
+        while len(self.ids) and self.tick < max_ticks:
+            self.passo()
+        self.ticks_fim[self.ids] = self.tick
+        self.no_limite[self.ids] = True
+        self.terminada[self.ids] = True
+        self._compacta(np.zeros(len(self.ids), dtype=bool))
+        return self.vencedor, self.ticks_fim
+
+def main():
+    parser = argparse.ArgumentParser(description="Motor headless vetorizado da arena")
+    parser.add_argument("--partidas", type=int, default=1000)
+    parser.add_argument("--semente", type=int, default=None)
+    parser.add_argument("--max-ticks", type=int, default=2000)
+    parser.add_argument("--robos", type=int, default=NUM_ROBOTS)
+    parser.add_argument("--largura", type=int, default=GRID_WIDTH)
+    parser.add_argument("--altura", type=int, default=GRID_HEIGHT)
+    parser.add_argument("--velocidade-max", type=int, default=1)
+    parser.add_argument("--sem-campos", action="store_true", help="só o passo preferencial (mais rápido)")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    motor = MotorVetorizado(args.partidas, args.semente, args.largura, args.altura, args.robos,
+                            velocidade_max=args.velocidade_max, campos=not args.sem_campos)
+    vencedor, ticks = motor.executa(args.max_ticks)
+    duracao = time.perf_counter() - inicio
+
+    print(f"{args.partidas} partidas, {motor.tick} ticks em {duracao:.2f}s")
+    print(f"{motor.passos_robo / duracao:,.0f} passos de robô/s")
+    print(f"  travadas: {motor.travada.sum()}")
+    print(f"  no limite de ticks: {motor.no_limite.sum()}")
+    print(f"  sem vencedor: {(vencedor < 0).sum()}")
+    for r in range(min(motor.N, 10)):
+        print(f"  robô {r}: {(vencedor == r).sum()}")
+
+if __name__ == "__main__":
+    main()
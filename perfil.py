@@ -0,0 +1,151 @@
+"""
+Perfil do tick dos robôs: tempo por fase e cProfile por processo.
+
+Com ARENA_PHASE_STATS=1, cada processo que age pelos robôs mede com
+perf_counter_ns onde vai o tempo de cada robô, dividido nas fases de FASES,
+e soma os tempos numa área de memória compartilhada com uma linha por robô
+(mais linhas para os processos que não são robôs, como os trabalhadores e o
+árbitro de main.py). A medição é um cronômetro de voltas: trocar de fase
+custa duas leituras do relógio e duas somas num RawArray, sem lock (cada
+célula da área só tem um escritor por vez). No fim da partida, a tabela de
+tempos por fase é impressa.
+
+Com ARENA_CPROFILE=1, cada processo de robô (ou trabalhador) roda sob o
+cProfile e grava perfil_<nome>.prof ao terminar; no fim da partida os
+arquivos são juntados em perfil.prof e as funções mais caras são impressas:
+
+    ARENA_PHASE_STATS=1 python3 main.py --max-speed --sem-viewer
+    ARENA_CPROFILE=1 python3 robot_v2.py --max-speed --sem-viewer
+    python3 -m pstats perfil.prof
+"""
+
+import cProfile
+import glob
+import multiprocessing as mp
+import os
+import pstats
+import time
+from ctypes import c_longlong
+from constants import CPROFILE
+from travas import formata_ns
+
+FASES = ("sensor", "espera_lock", "decisao", "movimento", "log", "sono")
+SENSOR = 0          # Leitura do grid ao redor do robô
+ESPERA_LOCK = 1     # Esperando um lock (faixas do grid, anel de intenções)
+DECISAO = 2         # Escolha do alvo e do passo
+MOVIMENTO = 3       # Aplicação do movimento, coleta ou batalha
+LOG = 4             # Registro no log
+SONO = 5            # Esperando o tick ou a vez do robô, ou dormindo
+
+PREFIXO_PERFIS = "perfil_"
+ARQUIVO_PERFIL = "perfil.prof"
+
+"""
+Área compartilhada com o tempo total (ns) e o número de ocorrências de cada
+fase, por linha. As linhas são nomeadas por `rotulos`; as `num_robos`
+primeiras são as dos robôs.
+"""
+class EstatisticasFases():
+    def __init__(self, rotulos, num_robos):
+        self.rotulos = list(rotulos)
+        self.num_robos = num_robos
+        self.valores = mp.RawArray(c_longlong, len(self.rotulos) * len(FASES) * 2)
+        # Vista sem a conversão do ctypes a cada acesso (herdada no fork)
+        self.contadores = memoryview(self.valores).cast('B').cast('q')
+
+    def linha(self, rotulo):
+        return self.rotulos.index(rotulo)
+
+    # (tempo total, ocorrências) de cada fase, somando as linhas pedidas
+    def totais(self, linhas):
+        totais = [[0, 0] for _ in FASES]
+        for linha in linhas:
+            base = linha * len(FASES) * 2
+            valores = self.contadores[base:base + len(FASES) * 2]
+            for fase in range(len(FASES)):
+                totais[fase][0] += valores[2 * fase]
+                totais[fase][1] += valores[2 * fase + 1]
+        return totais
+
+"""
+Cronômetro de voltas de um processo: troca(fase) encerra a fase atual,
+somando o tempo desde a última troca à linha atual, e começa `fase`
+(opcionalmente já em outra linha, ex.: o próximo robô de um trabalhador).
+"""
+class Cronometro():
+    __slots__ = ('contadores', 'base', 'fase', 'inicio')
+
+    def __init__(self, estatisticas, linha, fase=SONO):
+        self.contadores = estatisticas.contadores
+        self.base = linha * len(FASES) * 2
+        self.fase = fase
+        self.inicio = time.perf_counter_ns()
+
+    # Retorna a fase encerrada, para voltar a ela depois de um desvio (ex.: log)
+    def troca(self, fase, linha=None):
+        agora = time.perf_counter_ns()
+        i = self.base + 2 * self.fase
+        self.contadores[i] += agora - self.inicio
+        self.contadores[i + 1] += 1
+        self.inicio = agora
+        anterior = self.fase
+        self.fase = fase
+        if linha is not None:
+            self.base = linha * len(FASES) * 2
+        return anterior
+
+# Sem estatísticas: as trocas não medem nada
+class CronometroNulo():
+    __slots__ = ()
+
+    def troca(self, fase, linha=None):
+        return fase
+
+NULO = CronometroNulo()
+
+def cronometro(estatisticas, linha, fase=SONO):
+    if estatisticas is None:
+        return NULO
+    return Cronometro(estatisticas, linha, fase)
+
+def imprime(estatisticas, por_robo=False):
+    print(f"{'tempo por fase':<16}" + "".join(f"{f:>16}" for f in FASES) + f"{'total':>10}")
+    grupos = [("robôs", range(estatisticas.num_robos))]
+    if por_robo:
+        grupos += [(estatisticas.rotulos[i], [i]) for i in range(estatisticas.num_robos)]
+    grupos += [(estatisticas.rotulos[i], [i]) for i in range(estatisticas.num_robos, len(estatisticas.rotulos))]
+
+    for rotulo, linhas in grupos:
+        totais = estatisticas.totais(linhas)
+        total = sum(ns for ns, _ in totais)
+        if total == 0:
+            continue
+        colunas = "".join(f"{formata_ns(ns):>11} {ns / total:>4.0%}" if qtd else f"{'-':>16}" for ns, qtd in totais)
+        print(f"{rotulo:<16}{colunas}{formata_ns(total):>10}")
+
+# Roda `alvo(*args)` sob o cProfile se ARENA_CPROFILE=1, gravando perfil_<nome>.prof
+def perfilado(nome, alvo, *args):
+    if not CPROFILE:
+        return alvo(*args)
+    perfilador = cProfile.Profile()
+    try:
+        return perfilador.runcall(alvo, *args)
+    finally:
+        perfilador.dump_stats(f"{PREFIXO_PERFIS}{nome}.prof")
+
+# Apaga os perfis parciais de uma partida anterior
+def limpa_perfis():
+    for caminho in glob.glob(PREFIXO_PERFIS + "*.prof"):
+        os.remove(caminho)
+
+# Junta os perfis dos processos em perfil.prof e imprime as `linhas` funções mais caras
+def junta_perfis(linhas=20):
+    partes = sorted(glob.glob(PREFIXO_PERFIS + "*.prof"))
+    if not partes:
+        return
+    estatisticas = pstats.Stats(*partes)
+    estatisticas.dump_stats(ARQUIVO_PERFIL)
+    for caminho in partes:
+        os.remove(caminho)
+    print(f"Perfis de {len(partes)} processos juntados em {ARQUIVO_PERFIL}")
+    estatisticas.sort_stats("cumulative").print_stats(linhas)
@@ -0,0 +1,137 @@
+import ctypes
+import multiprocessing as mp
+import time
+from contextlib import contextmanager
+import travas
+
+# Tentativas de leitura otimista antes de travar as faixas para ler
+MAX_TENTATIVAS = 100
+
+"""
+Gerenciador de locks por região do grid.
+O grid é dividido em faixas horizontais de `altura_faixa` linhas, cada uma com
+o seu próprio lock. Operações que tocam mais de uma célula (movimento entre
+faixas, batalha entre dois robôs) adquirem os locks de todas as faixas
+envolvidas sempre em ordem crescente, o que evita deadlock entre processos.
+As funções recebem índices lineares do grid (linha * largura + coluna).
+
+Cada faixa também tem um contador de versão (seqlock): quem escreve com
+`trava` deixa a versão ímpar durante a escrita e par ao terminar. Leitores
+copiam o grid (ou uma janela) sem lock e repetem a cópia se alguma faixa lida
+estava sendo escrita ou mudou de versão, então nunca bloqueiam os movimentos
+e nunca veem um quadro pela metade.
+
+Para os benchmarks, cada faixa conta as aquisições que encontraram o lock
+ocupado e o tempo total esperando por ele (só o caminho com disputa é medido).
+Com uma área de `estatisticas` (travas.py), os locks das faixas também
+registram histogramas de espera e posse, somados sob o nome "grid".
+
+Com compartilhada=False (motor assíncrono, um processo só), os arrays são
+comuns do processo e os locks não fazem nada.
+"""
+class Regioes():
+    def __init__(self, largura, altura, altura_faixa, estatisticas=None, compartilhada=True):
+        self.largura = largura
+        self.altura = altura
+        self.altura_faixa = altura_faixa
+        self.num_faixas = (altura + altura_faixa - 1) // altura_faixa
+        cria = mp.RawArray if compartilhada else lambda tipo, n: (tipo * n)()
+        self.locks = [travas.cria_lock(estatisticas, "grid", compartilhada) for _ in range(self.num_faixas)]
+        self.versoes = cria(ctypes.c_uint, self.num_faixas)
+        self.contencoes = cria(ctypes.c_long, self.num_faixas)
+        self.espera_ns = cria(ctypes.c_longlong, self.num_faixas)
+
+    # Retorna a faixa que contém a célula de índice idx
+    def faixa(self, idx):
+        return idx // (self.largura * self.altura_faixa)
+
+    # Adquire o lock da faixa f, medindo a espera quando ele está ocupado.
+    # Os contadores da faixa só são alterados por quem detém o lock dela.
+    def _adquire(self, f):
+        if not self.locks[f].acquire(False):
+            inicio = time.perf_counter_ns()
+            self.locks[f].acquire()
+            self.espera_ns[f] += time.perf_counter_ns() - inicio
+            self.contencoes[f] += 1
+
+    # Adquire os locks das faixas que contêm as células dadas, em ordem
+    @contextmanager
+    def trava(self, *indices):
+        faixas = sorted(set(self.faixa(idx) for idx in indices))
+        for f in faixas:
+            self._adquire(f)
+            self.versoes[f] += 1        # Ímpar: escrita em andamento
+        try:
+            yield
+        finally:
+            for f in reversed(faixas):
+                self.versoes[f] += 1    # Par: escrita concluída
+                self.locks[f].release()
+
+    # Adquire todas as faixas (inicialização e varreduras do grid inteiro)
+    @contextmanager
+    def trava_tudo(self):
+        for f in range(self.num_faixas):
+            self._adquire(f)
+            self.versoes[f] += 1
+        try:
+            yield
+        finally:
+            for f in reversed(range(self.num_faixas)):
+                self.versoes[f] += 1
+                self.locks[f].release()
+
+    # Faixas que contêm as linhas [linha_ini, linha_fim)
+    def faixas_das_linhas(self, linha_ini, linha_fim):
+        return range(linha_ini // self.altura_faixa, (linha_fim - 1) // self.altura_faixa + 1)
+
+    # Versões atuais de todas as faixas (início de uma leitura otimista)
+    def versoes_atuais(self):
+        return self.versoes[:]
+
+    # Verifica se as faixas das linhas lidas não foram escritas desde `versoes`
+    def valida(self, versoes, linha_ini, linha_fim):
+        for f in self.faixas_das_linhas(linha_ini, linha_fim):
+            if versoes[f] % 2 or self.versoes[f] != versoes[f]:
+                return False
+        return True
+
+    # Copia as linhas [y0, y1), colunas [x0, x1), do grid para um bytes
+    def _copia(self, grid, x0, y0, x1, y1):
+        tam = ctypes.sizeof(grid._type_)
+        base = ctypes.addressof(grid)
+        if x0 == 0 and x1 == self.largura:
+            return ctypes.string_at(base + y0 * self.largura * tam, (y1 - y0) * self.largura * tam)
+        return b''.join(ctypes.string_at(base + (y * self.largura + x0) * tam, (x1 - x0) * tam)
+                        for y in range(y0, y1))
+
+    def le_consistente(self, y0, y1, leitura):
+        """
+        Executa `leitura()`, que lê as linhas [y0, y1) direto do grid
+        compartilhado, até o resultado corresponder a um estado consistente
+        dessas linhas (nenhuma faixa escrita durante a leitura).
+        """
+        for _ in range(MAX_TENTATIVAS):
+            versoes = self.versoes_atuais()
+            resultado = leitura()
+            if self.valida(versoes, y0, y1):
+                return resultado
+
+        # Escrita contínua na região: lê travando as faixas para garantir progresso
+        linhas = self.faixas_das_linhas(y0, y1)
+        with self.trava(*[f * self.altura_faixa * self.largura for f in linhas]):
+            return leitura()
+
+    # Snapshot consistente de uma janela do grid, sem bloquear escritores
+    def snapshot_janela(self, grid, x0, y0, x1, y1):
+        if y1 <= y0 or x1 <= x0:
+            return b''
+        return self.le_consistente(y0, y1, lambda: self._copia(grid, x0, y0, x1, y1))
+
+    # Total de esperas por locks ocupados e tempo esperado (em segundos)
+    def estatisticas(self):
+        return sum(self.contencoes), sum(self.espera_ns) / 1e9
+
+    # Snapshot consistente do grid inteiro em uma única cópia
+    def snapshot(self, grid):
+        return self.snapshot_janela(grid, 0, 0, self.largura, self.altura)
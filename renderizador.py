@@ -0,0 +1,107 @@
+import sys
+import time
+
+# Trechos inalterados menores que isto são reescritos junto com as mudanças
+# vizinhas, porque custam menos que uma nova sequência de posicionamento
+LACUNA_MINIMA = 4
+
+"""
+Renderizador de terminal por diferença de quadros.
+Guarda o último quadro desenhado e, a cada novo quadro, só emite sequências
+ANSI de posicionamento do cursor + os caracteres que mudaram, tudo em uma
+única escrita. Linhas iguais ao quadro anterior são descartadas comparando os
+bytes crus do snapshot, sem convertê-las para texto.
+
+Também limita a taxa de quadros: espera_quadro() dorme até o próximo quadro
+e, se o desenho atrasou, pula os quadros perdidos em vez de tentar alcançá-los.
+atraso_quadro() só calcula a espera, para quem não pode bloquear dormindo
+(ex.: o viewer de motor_async.py, que espera com asyncio.sleep).
+"""
+class RenderizadorDiff():
+    def __init__(self, max_fps=10, converte=None, saida=None):
+        self.periodo = 1.0 / max_fps
+        self.converte = converte or (lambda linha: linha.decode('utf-8'))
+        self.saida = saida or sys.stdout
+        self.anterior = None            # Linhas cruas do último quadro
+        self.texto_anterior = None      # Mesmas linhas, já convertidas
+        self.proximo = time.monotonic()
+        self.quadros = 0
+        self.quadros_pulados = 0
+
+    # Sequências para levar `antigo` a `novo` na linha `y` (0-based) da tela
+    def _diff_linha(self, y, antigo, novo):
+        partes = []
+        comum = min(len(antigo), len(novo))
+        mudou = [x for x in range(comum) if antigo[x] != novo[x]]
+
+        i = 0
+        while i < len(mudou):
+            inicio = fim = mudou[i]
+            i += 1
+            # Junta mudanças separadas por lacunas pequenas num só trecho
+            while i < len(mudou) and mudou[i] - fim <= LACUNA_MINIMA:
+                fim = mudou[i]
+                i += 1
+            partes.append(f"\033[{y + 1};{inicio + 1}H{novo[inicio:fim + 1]}")
+
+        if len(novo) > comum:
+            partes.append(f"\033[{y + 1};{comum + 1}H{novo[comum:]}")
+        elif len(antigo) > comum:
+            partes.append(f"\033[{y + 1};{comum + 1}H\033[K")
+        return partes
+
+    # Desenha o quadro (lista de linhas cruas) emitindo só as diferenças
+    def desenha(self, linhas):
+        if self.anterior is None:
+            texto = [self.converte(linha) for linha in linhas]
+            saida = "\033[H\033[J" + "\n".join(texto)
+        else:
+            texto = list(self.texto_anterior)
+            partes = []
+            for y, linha in enumerate(linhas):
+                if y < len(self.anterior) and linha == self.anterior[y]:
+                    continue
+                novo = self.converte(linha)
+                if y < len(texto):
+                    partes.extend(self._diff_linha(y, texto[y], novo))
+                    texto[y] = novo
+                else:
+                    partes.append(f"\033[{y + 1};1H{novo}")
+                    texto.append(novo)
+            # Linhas que sobraram do quadro anterior são apagadas
+            for y in range(len(linhas), len(texto)):
+                partes.append(f"\033[{y + 1};1H\033[K")
+            del texto[len(linhas):]
+            saida = "".join(partes)
+
+        if saida:
+            self.saida.write(saida)
+            self.saida.flush()
+        self.anterior = list(linhas)
+        self.texto_anterior = texto
+        self.quadros += 1
+
+    # Segundos até o próximo quadro (já agendando o seguinte); sob carga,
+    # pula os quadros atrasados e retorna 0
+    def atraso_quadro(self):
+        agora = time.monotonic()
+        if agora < self.proximo:
+            atraso = self.proximo - agora
+            self.proximo += self.periodo
+            return atraso
+        atrasados = int((agora - self.proximo) / self.periodo)
+        self.quadros_pulados += atrasados
+        self.proximo += self.periodo * (atrasados + 1)
+        return 0.0
+
+    # Dorme até o próximo quadro
+    def espera_quadro(self):
+        atraso = self.atraso_quadro()
+        if atraso > 0:
+            time.sleep(atraso)
+
+    # Posiciona o cursor abaixo do último quadro
+    def fim(self):
+        linhas = len(self.anterior) if self.anterior else 0
+        self.saida.write(f"\033[{linhas + 1};1H\n")
+        self.saida.flush()
@@ -0,0 +1,239 @@
+"""
+Gravação e reprodução de partidas (replay).
+
+O gravador escreve dois arquivos:
+    - <nome>.eventos: cabeçalho + registros de tamanho fixo (REGISTRO), um
+      por evento (movimento, coleta, batalha, morte, bateria reposta),
+      escritos direto num mmap compartilhado pelos processos dos robôs
+    - <nome>.quadros: cabeçalho + quadros-chave de tamanho fixo, cada um
+      com o tick, a posição no fluxo de eventos e o grid inteiro
+
+Cada robô reserva o slot do evento com um contador compartilhado enquanto
+ainda tem os locks das faixas envolvidas, então eventos que tocam a mesma
+célula ficam no arquivo na ordem em que aconteceram. Os quadros-chave são
+gravados pelo processo do escalonador entre dois ticks, quando nenhum robô
+está agindo.
+
+Para ir a um tick, o player carrega o último quadro-chave até ele e aplica
+só os eventos seguintes, sem reler a partida desde o início:
+
+    python3 main.py --max-speed --gravar partida
+    python3 replay.py partida --de 500 --velocidade 20
+"""
+
+import argparse
+import ctypes
+import mmap
+import multiprocessing as mp
+import struct
+from array import array
+from bisect import bisect_right
+import celulas
+from renderizador import RenderizadorDiff
+from viewer import converte_linha, monta_linhas
+
+ASSINATURA_EVENTOS = b'ARENAEVT'
+ASSINATURA_QUADROS = b'ARENAQDR'
+CABECALHO = struct.Struct('<8sIIQ')         # assinatura, largura, altura, total de eventos
+REGISTRO = struct.Struct('<IB3xIII')        # tick, tipo, a, b, c
+QUADRO = struct.Struct('<iQ')               # tick, eventos antes do quadro
+
+# Tipos de evento e significado dos campos (a, b, c)
+NENHUM = 0          # Slot não escrito (gravação interrompida)
+MOVIMENTO = 1       # robô, célula de origem, célula de destino
+COLETA = 2          # robô, célula, número da bateria
+BATALHA = 3         # atacante, defensor, vencedor (EMPATE se ambos perderam)
+MORTE = 4           # robô, célula liberada, -
+BATERIA = 5         # número da bateria, célula, -
+NOMES_EVENTOS = {MOVIMENTO: "movimento", COLETA: "coleta", BATALHA: "batalha", MORTE: "morte", BATERIA: "bateria"}
+
+EMPATE = 0xFFFFFFFF
+
+# Capacidade do arquivo de eventos; ele é esparso e truncado no fim da gravação
+CAPACIDADE_EVENTOS = 1 << 24
+
+_gravador = None
+
+# Conecta o processo atual ao gravador (None = partida sem gravação)
+def conecta(gravador):
+    global _gravador
+    _gravador = gravador
+
+def registra(tipo, a, b=0, c=0):
+    if _gravador is not None:
+        _gravador.registra(tipo, a, b, c)
+
+"""
+Gravador compartilhado entre o processo principal, os robôs e o escalonador.
+O tick de cada evento é lido do contador do escalonador, que não muda
+enquanto os robôs agem no tick.
+"""
+class Gravador():
+    def __init__(self, nome, largura, altura, tick, quadros_a_cada=100, capacidade=CAPACIDADE_EVENTOS):
+        self.nome = nome
+        self.largura = largura
+        self.altura = altura
+        self.tick = tick
+        self.quadros_a_cada = quadros_a_cada
+        self.capacidade = capacidade
+        self.cursor = mp.RawValue(ctypes.c_long, 0)
+        self.lock = mp.Lock()
+
+        with open(nome + ".eventos", "wb") as f:
+            f.write(CABECALHO.pack(ASSINATURA_EVENTOS, largura, altura, 0))
+            f.truncate(CABECALHO.size + capacidade * REGISTRO.size)
+        self._arquivo = open(nome + ".eventos", "r+b")
+        self.eventos = mmap.mmap(self._arquivo.fileno(), 0)
+
+        with open(nome + ".quadros", "wb") as f:
+            f.write(CABECALHO.pack(ASSINATURA_QUADROS, largura, altura, 0))
+
+    def registra(self, tipo, a, b=0, c=0):
+        with self.lock:
+            slot = self.cursor.value
+            if slot >= self.capacidade:
+                return
+            self.cursor.value = slot + 1
+        REGISTRO.pack_into(self.eventos, CABECALHO.size + slot * REGISTRO.size,
+                           max(self.tick.value, 0), tipo, a, b, c)
+
+    # Grava o grid inteiro como quadro-chave do fim do tick `tick`
+    def quadro_chave(self, grid, tick):
+        dados = ctypes.string_at(ctypes.addressof(grid), ctypes.sizeof(grid))
+        with open(self.nome + ".quadros", "ab") as f:
+            f.write(QUADRO.pack(tick, self.cursor.value) + dados)
+
+    # Gancho do escalonador: quadro-chave a cada `quadros_a_cada` ticks
+    def fim_do_tick(self, grid, tick):
+        if tick % self.quadros_a_cada == 0:
+            self.quadro_chave(grid, tick)
+
+    # Fim da partida: último quadro-chave, total de eventos e arquivo truncado
+    def fecha(self, grid):
+        total = min(self.cursor.value, self.capacidade)
+        self.quadro_chave(grid, self.tick.value)
+        CABECALHO.pack_into(self.eventos, 0, ASSINATURA_EVENTOS, self.largura, self.altura, total)
+        self.eventos.close()
+        self._arquivo.truncate(CABECALHO.size + total * REGISTRO.size)
+        self._arquivo.close()
+
+class Replay():
+    def __init__(self, nome):
+        with open(nome + ".eventos", "rb") as f:
+            self.eventos = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        with open(nome + ".quadros", "rb") as f:
+            self.quadros = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        assinatura, self.largura, self.altura, total = CABECALHO.unpack_from(self.eventos)
+        if assinatura != ASSINATURA_EVENTOS or CABECALHO.unpack_from(self.quadros)[0] != ASSINATURA_QUADROS:
+            raise ValueError(f"'{nome}' não é uma gravação da arena")
+
+        self.tamanho_grid = self.largura * self.altura * celulas.TAMANHO_CELULA
+        self.tamanho_quadro = QUADRO.size + self.tamanho_grid
+        self.num_quadros = (len(self.quadros) - CABECALHO.size) // self.tamanho_quadro
+        if self.num_quadros == 0:
+            raise ValueError(f"'{nome}' não tem nenhum quadro-chave")
+        self.ticks_quadros = [QUADRO.unpack_from(self.quadros, self._pos_quadro(k))[0]
+                              for k in range(self.num_quadros)]
+
+        # Gravação interrompida: o total não foi escrito, os eventos vão até o
+        # primeiro slot vazio
+        if total == 0:
+            total = (len(self.eventos) - CABECALHO.size) // REGISTRO.size
+            for i in range(total):
+                if REGISTRO.unpack_from(self.eventos, CABECALHO.size + i * REGISTRO.size)[1] == NENHUM:
+                    total = i
+                    break
+        self.num_eventos = total
+
+    def _pos_quadro(self, k):
+        return CABECALHO.size + k * self.tamanho_quadro
+
+    @property
+    def ultimo_tick(self):
+        return self.ticks_quadros[-1]
+
+    # Eventos a partir do índice `inicio`, como tuplas (tick, tipo, a, b, c)
+    def eventos_desde(self, inicio):
+        dados = memoryview(self.eventos)[CABECALHO.size + inicio * REGISTRO.size:
+                                         CABECALHO.size + self.num_eventos * REGISTRO.size]
+        return REGISTRO.iter_unpack(dados)
+
+    @staticmethod
+    def aplica(grid, evento):
+        tick, tipo, a, b, c = evento
+        if tipo == MOVIMENTO:
+            grid[b] = celulas.VAZIO
+            grid[c] = celulas.robo(a)
+        elif tipo == MORTE:
+            grid[b] = celulas.VAZIO
+        elif tipo == BATERIA:
+            grid[b] = celulas.bateria(a)
+
+    def estado(self, tick):
+        """
+        Grid (array de células) no fim de `tick`: último quadro-chave até
+        o tick + eventos seguintes até ele. Retorna também o índice do
+        primeiro evento depois do tick, para continuar a reprodução.
+        """
+        k = max(bisect_right(self.ticks_quadros, tick) - 1, 0)
+        pos = self._pos_quadro(k)
+        _, inicio = QUADRO.unpack_from(self.quadros, pos)
+        grid = array(celulas.CODIGO_ARRAY, self.quadros[pos + QUADRO.size:pos + self.tamanho_quadro])
+
+        proximo = inicio
+        for evento in self.eventos_desde(inicio):
+            if evento[0] > tick:
+                break
+            self.aplica(grid, evento)
+            proximo += 1
+        return grid, proximo
+
+    def reproduz(self, de=0, ate=None, velocidade=10.0):
+        ate = self.ultimo_tick if ate is None else ate
+        renderizador = RenderizadorDiff(max(velocidade, 1), converte=converte_linha)
+        grid, proximo = self.estado(de)
+        eventos = self.eventos_desde(proximo)
+        pendente = next(eventos, None)
+
+        tick = de
+        while True:
+            titulo = f"=== Arena dos Robôs (Replay) === tick {tick}/{self.ultimo_tick}"
+            renderizador.desenha(monta_linhas(grid.tobytes(), titulo, "Ctrl+C para sair.", self.largura, self.altura))
+            if tick >= ate:
+                break
+            tick += 1
+            while pendente is not None and pendente[0] <= tick:
+                self.aplica(grid, pendente)
+                pendente = next(eventos, None)
+            renderizador.espera_quadro()
+        renderizador.fim()
+
+    def fecha(self):
+        self.eventos.close()
+        self.quadros.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Reproduz uma partida gravada com main.py --gravar")
+    parser.add_argument("nome", help="nome da gravação (sem .eventos/.quadros)")
+    parser.add_argument("--de", type=int, default=0, help="tick inicial")
+    parser.add_argument("--ate", type=int, default=None, help="tick final")
+    parser.add_argument("--velocidade", type=float, default=10.0, help="ticks por segundo")
+    parser.add_argument("--eventos", action="store_true", help="lista os eventos em vez de reproduzir")
+    args = parser.parse_args()
+
+    replay = Replay(args.nome)
+    try:
+        if args.eventos:
+            for tick, tipo, a, b, c in replay.eventos_desde(0):
+                if tick >= args.de and (args.ate is None or tick <= args.ate):
+                    print(f"{tick:>8} {NOMES_EVENTOS.get(tipo, tipo):<10} {a:>8} {b:>8} {c:>10}")
+        else:
+            replay.reproduz(args.de, args.ate, args.velocidade)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        replay.fecha()
+
+if __name__ == "__main__":
+    main()
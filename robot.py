@@ -1,168 +1,326 @@
 import time
-import random
 import os
-from constants import GRID_WIDTH, GRID_HEIGHT, MAX_ENERGY, ROBOT_IDS
+from constants import GRID_WIDTH, GRID_HEIGHT, MAX_ENERGY, ROBOT_IDS, LOG_FORMAT, BATTERY_RESPAWN
+import espacial
+import celulas
+import logger
+import replay
+import perfil
+from logger import log
 
 # --- FUNÇÕES AUXILIARES ---
 
-def log(robot_char, message):
-    filename = f"log_{robot_char}.txt"
-    with open(filename, "a") as f:
-        f.write(f"[{time.strftime('%H:%M:%S')}] {message}\n")
-
 def calculate_distance_sq(pos1, pos2):
     return (pos1[0] - pos2[0])**2 + (pos1[1] - pos2[1])**2
 
-def get_pos(grid, grid_mutex, rob_id_byte):
-    with grid_mutex:
-        for i in range(GRID_WIDTH * GRID_HEIGHT):
-            if grid[i] == rob_id_byte:
-                x = i % GRID_WIDTH
-                y = i // GRID_WIDTH
-                return (x, y)
-    return None
+def get_pos(posicoes, robot_id_index):
+    # Consulta direta na tabela de posições, sem varrer o grid.
+    # Só o próprio robô altera sua posição; os outros apenas o removem (-1).
+    x = posicoes[2 * robot_id_index]
+    y = posicoes[2 * robot_id_index + 1]
+    if x < 0 or y < 0:
+        return None
+    return (x, y)
+
+def remove_robots(grid, regioes, posicoes, indice, livres, robot_id_indexes):
+    while True:
+        posicoes_lidas = [get_pos(posicoes, i) for i in robot_id_indexes]
+        indices_grid = [p[1] * GRID_WIDTH + p[0] for p in posicoes_lidas if p is not None]
+        if not indices_grid:
+            return
+
+        # Trava as regiões de todos os perdedores de uma vez, em ordem
+        with regioes.trava(*indices_grid):
+            # Se algum perdedor se moveu antes do lock, lê as posições de novo
+            if [get_pos(posicoes, i) for i in robot_id_indexes] != posicoes_lidas:
+                continue
+            for i, pos in zip(robot_id_indexes, posicoes_lidas):
+                if pos is None:
+                    continue
+                grid[pos[1] * GRID_WIDTH + pos[0]] = celulas.VAZIO
+                livres.adiciona(pos[1] * GRID_WIDTH + pos[0])
+                replay.registra(replay.MORTE, i, pos[1] * GRID_WIDTH + pos[0])
+                espacial.remove(indice, pos)
+                posicoes[2 * i] = -1
+                posicoes[2 * i + 1] = -1
+            return
+
+def move_robot(grid, regioes, posicoes, indice, livres, robot_id_index, old_pos, new_pos):
+    old_idx = old_pos[1] * GRID_WIDTH + old_pos[0]
+    new_idx = new_pos[1] * GRID_WIDTH + new_pos[0]
 
-def move_robot(grid, grid_mutex, rob_id_byte, old_pos, new_pos):
-    with grid_mutex:
-        old_idx = old_pos[1] * GRID_WIDTH + old_pos[0]
-        new_idx = new_pos[1] * GRID_WIDTH + new_pos[0]
+    celula_robo = celulas.robo(robot_id_index)
+
+    with regioes.trava(old_idx, new_idx):
+        # O robô pode ter sido removido numa batalha iniciada por outro
+        if grid[old_idx] != celula_robo:
+            return False, None
 
         item_no_destino = grid[new_idx]
+        tipo_destino = celulas.tipo(item_no_destino)
 
-        if item_no_destino == b' ' or item_no_destino == b'&':
-            grid[old_idx] = b' '
-            grid[new_idx] = rob_id_byte
+        if tipo_destino == celulas.VAZIO or tipo_destino == celulas.BATERIA:
+            grid[old_idx] = celulas.VAZIO
+            grid[new_idx] = celula_robo
+            posicoes[2 * robot_id_index] = new_pos[0]
+            posicoes[2 * robot_id_index + 1] = new_pos[1]
+            livres.move(old_idx, new_idx)
+            espacial.move(indice, old_pos, new_pos, tipo_destino == celulas.BATERIA)
+            # Registrado ainda com os locks, na ordem real dos movimentos
+            replay.registra(replay.MOVIMENTO, robot_id_index, old_idx, new_idx)
+            if tipo_destino == celulas.BATERIA:
+                replay.registra(replay.COLETA, robot_id_index, new_idx, celulas.ident(item_no_destino))
             return True, item_no_destino
     return False, None
 
+# Coloca a bateria `numero` de volta numa célula livre sorteada (O(1), sem
+# tentativa e erro) e atualiza o índice espacial e o campo de distância dela
+def repoe_bateria(grid, indice, caminhos, livres, numero):
+    def ao_ocupar(idx):
+        espacial.adiciona(indice, (idx % GRID_WIDTH, idx // GRID_WIDTH))
+        replay.registra(replay.BATERIA, numero, idx)
+
+    idx = livres.ocupa(grid, celulas.bateria(numero), ao_ocupar)
+    if idx is not None:
+        caminhos.repoe(grid, numero, idx)
+    return idx
+
+# Primeiro passo da lista que cai numa célula livre ou com bateria (leitura sem lock)
+def escolhe_passo(grid, passos):
+    for passo in passos:
+        if 0 <= passo[0] < GRID_WIDTH and 0 <= passo[1] < GRID_HEIGHT:
+            tipo = celulas.tipo(grid[passo[1] * GRID_WIDTH + passo[0]])
+            if tipo == celulas.VAZIO or tipo == celulas.BATERIA:
+                return passo
+    return None
+
 # --- LÓGICA DE BATALHA ---
 
-def iniciar_batalha(atacante_id, defensor_id, flags):
-    try:
-        poder_atacante = (2 * flags[f'forca_{atacante_id}']) + flags[f'energia_{atacante_id}']
-        poder_defensor = (2 * flags[f'forca_{defensor_id}']) + flags[f'energia_{defensor_id}']
-    except KeyError:
-        log(atacante_id, "ERRO: Falha ao ler status de batalha do oponente.")
-        return None
+def define_energia(flags, flags_mutex, robot_id_index, nova_energia):
+    # Atualiza a energia e mantém a contagem de vivos de forma atômica
+    with flags_mutex:
+        antiga = flags.robos[robot_id_index].energia
+        if antiga <= 0:
+            # Derrotado numa batalha enquanto se movia: continua fora do jogo
+            return antiga
+        flags.robos[robot_id_index].energia = nova_energia
+        if nova_energia <= 0:
+            flags.vivos -= 1
+    return nova_energia
 
+def iniciar_batalha(atacante_idx, defensor_idx, flags, flags_mutex):
+    atacante = flags.robos[atacante_idx]
+    defensor = flags.robos[defensor_idx]
+    atacante_id = ROBOT_IDS[atacante_idx]
+    defensor_id = ROBOT_IDS[defensor_idx]
+
+    # Lê os poderes e aplica o resultado na mesma seção crítica
+    with flags_mutex:
+        poder_atacante = (2 * atacante.forca) + atacante.energia
+        poder_defensor = (2 * defensor.forca) + defensor.energia
+
+        if poder_atacante > poder_defensor:
+            perdedores = (defensor,)
+            perdedor = defensor_idx
+        elif poder_defensor > poder_atacante:
+            perdedores = (atacante,)
+            perdedor = atacante_idx
+        else:
+            perdedores = (atacante, defensor)
+            perdedor = (atacante_idx, defensor_idx)
+        vencedor = replay.EMPATE if isinstance(perdedor, tuple) else atacante_idx + defensor_idx - perdedor
+
+        for p in perdedores:
+            if p.energia > 0:
+                flags.vivos -= 1
+            p.energia = 0
+
+    replay.registra(replay.BATALHA, atacante_idx, defensor_idx, vencedor)
     log(atacante_id, f"BATALHA! Poder {poder_atacante} vs {defensor_id} (Poder {poder_defensor})")
     log(defensor_id, f"SOB ATAQUE! {atacante_id} (Poder {poder_atacante}) vs Poder {poder_defensor}")
 
-    if poder_atacante > poder_defensor:
-        flags[f'energia_{defensor_id}'] = 0
+    if perdedor == defensor_idx:
         log(atacante_id, f"VITÓRIA contra {defensor_id}!")
         log(defensor_id, "DERROTA!")
-        return defensor_id
-    elif poder_defensor > poder_atacante:
-        flags[f'energia_{atacante_id}'] = 0
+    elif perdedor == atacante_idx:
         log(defensor_id, f"VITÓRIA contra {atacante_id}!")
         log(atacante_id, "DERROTA!")
-        return atacante_id
     else:
-        flags[f'energia_{atacante_id}'] = 0
-        flags[f'energia_{defensor_id}'] = 0
         log(atacante_id, f"EMPATE com {defensor_id}! Ambos destruídos.")
         log(defensor_id, f"EMPATE com {atacante_id}! Ambos destruídos.")
-        return (atacante_id, defensor_id)
+    return perdedor
+
+# --- DECISÃO DO ROBÔ EM UM TICK ---
+
+# Intenções que um robô envia ao árbitro (ver arbitro.py)
+NADA = 0
+MOVER = 1           # alvo = índice da célula de destino
+ATACAR = 2          # alvo = índice do robô adjacente
+
+def decide_robo(grid, regioes, posicoes, indice, caminhos, flags, robot_id_index, cronometro=perfil.NULO):
+    """
+    Decide a ação do robô no tick atual, só lendo o estado do jogo (nenhum
+    lock do grid: o árbitro só escreve entre os ticks). Retorna a intenção
+    (tipo, alvo), ou None se o robô está fora do jogo. O `cronometro` passa
+    da fase de sensor para a de decisão depois da leitura do grid.
+    """
+    status = flags.robos[robot_id_index]
+
+    if status.energia <= 0:
+        return None
+    current_pos = get_pos(posicoes, robot_id_index)
+    if current_pos is None:
+        return None
+
+    def eh_alvo(conteudo):
+        tipo = celulas.tipo(conteudo)
+        if tipo == celulas.BATERIA:
+            return True
+        if tipo != celulas.ROBO:
+            return False
+        id_alvo = celulas.ident(conteudo)
+        return id_alvo != robot_id_index and flags.robos[id_alvo].energia > 0
 
-# --- PROCESSO PRINCIPAL DO ROBÔ ---
+    # Consulta o índice espacial: só visita buckets com entidades próximas.
+    # Leitura otimista (seqlock): repete se alguma faixa lida foi escrita.
+    while True:
+        versoes = regioes.versoes_atuais()
+        encontrado, linhas = espacial.alvo_mais_proximo(grid, indice, current_pos, eh_alvo)
+        if regioes.valida(versoes, *linhas):
+            break
+    cronometro.troca(perfil.DECISAO)
+
+    if not encontrado:
+        return NADA, 0
+
+    dist_sq, pos_alvo, conteudo = encontrado
+    if celulas.tipo(conteudo) == celulas.BATERIA:
+        alvo_mais_proximo = {'pos': pos_alvo, 'tipo': 'bateria', 'id': celulas.ident(conteudo)}
+    else:
+        alvo_mais_proximo = {'pos': pos_alvo, 'tipo': 'robo', 'id': celulas.ident(conteudo)}
+
+    if alvo_mais_proximo['tipo'] == 'robo' and dist_sq == 1:
+        return ATACAR, alvo_mais_proximo['id']
+
+    posicao_a_mover = None
+    destino_final = alvo_mais_proximo['pos']
+
+    if destino_final != current_pos:
+        x, y = current_pos
+        dx = destino_final[0] - x
+        dy = destino_final[1] - y
+
+        passos_preferenciais = []
+        if alvo_mais_proximo['tipo'] == 'bateria':
+            # Passo pelo campo de distância da bateria (contorna barreiras)
+            for v in caminhos.passos(y * GRID_WIDTH + x, alvo_mais_proximo['id']):
+                passos_preferenciais.append((v % GRID_WIDTH, v // GRID_WIDTH))
+
+        if not passos_preferenciais:
+            if abs(dx) > abs(dy):
+                if dx != 0: passos_preferenciais.append((x + (1 if dx > 0 else -1), y))
+                if dy != 0: passos_preferenciais.append((x, y + (1 if dy > 0 else -1)))
+            else:
+                if dy != 0: passos_preferenciais.append((x, y + (1 if dy > 0 else -1)))
+                if dx != 0: passos_preferenciais.append((x + (1 if dx > 0 else -1), y))
+
+        posicao_a_mover = escolhe_passo(grid, passos_preferenciais)
+
+        # Bloqueado a caminho de um robô: segue para a bateria mais próxima
+        if posicao_a_mover is None and alvo_mais_proximo['tipo'] == 'robo':
+            passos_bateria = [(v % GRID_WIDTH, v // GRID_WIDTH) for v in caminhos.passos(y * GRID_WIDTH + x)]
+            posicao_a_mover = escolhe_passo(grid, passos_bateria)
+
+    if posicao_a_mover:
+        return MOVER, posicao_a_mover[1] * GRID_WIDTH + posicao_a_mover[0]
+    return NADA, 0
 
-def robot_process(grid, grid_mutex, flags, robot_id_index):
+# --- APLICAÇÃO DAS INTENÇÕES (feita pelo árbitro) ---
+
+# Batalha pedida por `atacante_idx`, se os dois continuam vivos e adjacentes
+def executa_ataque(grid, regioes, posicoes, indice, livres, flags, flags_mutex, atacante_idx, defensor_idx):
+    if flags.robos[atacante_idx].energia <= 0 or flags.robos[defensor_idx].energia <= 0:
+        return      # Um dos dois já perdeu outra batalha neste tick
+    pos_atacante = get_pos(posicoes, atacante_idx)
+    pos_defensor = get_pos(posicoes, defensor_idx)
+    if pos_atacante is None or pos_defensor is None or calculate_distance_sq(pos_atacante, pos_defensor) != 1:
+        return
+
+    log(ROBOT_IDS[atacante_idx], f"Inimigo {ROBOT_IDS[defensor_idx]} adjacente. INICIANDO BATALHA!")
+    perdedor = iniciar_batalha(atacante_idx, defensor_idx, flags, flags_mutex)
+
+    perdedores = perdedor if isinstance(perdedor, tuple) else (perdedor,)
+
+    # Remove os perdedores usando a tabela de posições
+    remove_robots(grid, regioes, posicoes, indice, livres, list(perdedores))
+
+# Movimento pedido pelo robô para a célula `destino`, se ela ainda está livre
+def executa_movimento(grid, regioes, posicoes, indice, caminhos, livres, flags, flags_mutex, robot_id_index, destino):
     robot_char = ROBOT_IDS[robot_id_index]
-    rob_id_byte = robot_char.encode()
+    status = flags.robos[robot_id_index]
+    current_pos = get_pos(posicoes, robot_id_index)
+    if status.energia <= 0 or current_pos is None:
+        return
+    posicao_a_mover = (destino % GRID_WIDTH, destino // GRID_WIDTH)
+    if calculate_distance_sq(current_pos, posicao_a_mover) != 1:
+        return
+
+    # Célula ocupada por um robô que se moveu antes neste tick: fica parado
+    movido, item_coletado = move_robot(grid, regioes, posicoes, indice, livres, robot_id_index, current_pos, posicao_a_mover)
+    if movido:
+        energia_movimento = status.energia - 1
+        log_msg = f"Movido para {posicao_a_mover}. Energia: {energia_movimento}"
+        nova_energia = energia_movimento
+        if celulas.tipo(item_coletado) == celulas.BATERIA:
+            nova_energia = min(MAX_ENERGY, energia_movimento + 20)
+            log_msg += f". BATERIA COLETADA! Nova energia: {nova_energia}"
+            caminhos.consome(celulas.ident(item_coletado))
+            if BATTERY_RESPAWN:
+                repoe_bateria(grid, indice, caminhos, livres, celulas.ident(item_coletado))
+        define_energia(flags, flags_mutex, robot_id_index, nova_energia)
+        status.movimentos += 1
+        log(robot_char, log_msg)
 
-    flags[f'energia_{robot_char}'] = MAX_ENERGY
-    flags[f'forca_{robot_char}'] = random.randint(5, 15)
+# --- PROCESSO TRABALHADOR ---
 
-    log(robot_char, f"Robô IA '{robot_char}' iniciado. Força: {flags[f'forca_{robot_char}']}")
+def worker_process(grid, regioes, posicoes, indice, caminhos, flags, fila_log, escalonador, fragmentos, intencoes, num_trabalhador, fases=None):
+    # Um número fixo de trabalhadores decide pelos robôs: a cada tick, este
+    # processo decide a ação de cada robô do seu trecho (ver fragmentos.py) e
+    # envia as intenções em lote ao árbitro, que as aplica no fim do tick
+    logger.conecta(fila_log, LOG_FORMAT)
 
-    while flags.get(f'energia_{robot_char}', 0) > 0 and not flags['game_over']:
-        current_pos = get_pos(grid, grid_mutex, rob_id_byte)
-        if current_pos is None:
+    # Tempo por fase (ver perfil.py): o de cada robô na linha dele; o envio
+    # do lote e a espera do tick na linha do trabalhador
+    linha_trabalhador = fases.linha(f"trabalhador {num_trabalhador}") if fases else None
+    cronometro = perfil.cronometro(fases, linha_trabalhador)
+
+    for robot_id_index in fragmentos.trecho(num_trabalhador):
+        log(ROBOT_IDS[robot_id_index], f"Robô IA '{ROBOT_IDS[robot_id_index]}' iniciado. Força: {flags.robos[robot_id_index].forca}")
+
+    tick = 0
+
+    while not flags.game_over:
+        robos = fragmentos.trecho(num_trabalhador)
+        if fragmentos.tamanho.value == 0:
             break
 
-        alvos = []
-        with grid_mutex:
-            for i in range(GRID_WIDTH * GRID_HEIGHT):
-                conteudo = grid[i]
-                id_alvo_str = conteudo.decode(errors='ignore')
-                if conteudo == b'&':
-                    pos_alvo = (i % GRID_WIDTH, i // GRID_WIDTH)
-                    alvos.append({'pos': pos_alvo, 'tipo': 'bateria', 'id': None})
-                elif id_alvo_str in ROBOT_IDS and conteudo != rob_id_byte and flags.get(f'energia_{id_alvo_str}', 0) > 0:
-                    pos_alvo = (i % GRID_WIDTH, i // GRID_WIDTH)
-                    alvos.append({'pos': pos_alvo, 'tipo': 'robo', 'id': id_alvo_str})
-
-        acao_realizada = False
-        if alvos:
-            alvo_mais_proximo = min(alvos, key=lambda a: calculate_distance_sq(current_pos, a['pos']))
-            dist_sq = calculate_distance_sq(current_pos, alvo_mais_proximo['pos'])
-
-            if alvo_mais_proximo['tipo'] == 'robo' and dist_sq == 1:
-                log(robot_char, f"Inimigo {alvo_mais_proximo['id']} adjacente. INICIANDO BATALHA!")
-                perdedor = iniciar_batalha(robot_char, alvo_mais_proximo['id'], flags)
-
-                if perdedor:
-                    perdedores = perdedor if isinstance(perdedor, tuple) else (perdedor,)
-
-                    # --- CORREÇÃO DO DEADLOCK AQUI ---
-                    with grid_mutex: # Adquire o lock apenas uma vez
-                        for p_id in perdedores:
-                            # Busca pelo perdedor diretamente, sem chamar get_pos()
-                            id_a_remover = p_id.encode()
-                            for i in range(GRID_WIDTH * GRID_HEIGHT):
-                                if grid[i] == id_a_remover:
-                                    grid[i] = b' ' # Remove o robô do grid
-                                    break
-
-                acao_realizada = True
-
-            if not acao_realizada:
-                posicao_a_mover = None
-                destino_final = alvo_mais_proximo['pos']
-
-                if destino_final != current_pos:
-                    x, y = current_pos
-                    dx = destino_final[0] - x
-                    dy = destino_final[1] - y
-
-                    passos_preferenciais = []
-                    if abs(dx) > abs(dy):
-                        if dx != 0: passos_preferenciais.append((x + (1 if dx > 0 else -1), y))
-                        if dy != 0: passos_preferenciais.append((x, y + (1 if dy > 0 else -1)))
-                    else:
-                        if dy != 0: passos_preferenciais.append((x, y + (1 if dy > 0 else -1)))
-                        if dx != 0: passos_preferenciais.append((x + (1 if dx > 0 else -1), y))
-
-                    with grid_mutex:
-                        for passo in passos_preferenciais:
-                            if 0 <= passo[0] < GRID_WIDTH and 0 <= passo[1] < GRID_HEIGHT:
-                                conteudo = grid[passo[1] * GRID_WIDTH + passo[0]]
-                                if conteudo == b' ' or conteudo == b'&':
-                                    posicao_a_mover = passo
-                                    break
-
-                if posicao_a_mover:
-                    movido, item_coletado = move_robot(grid, grid_mutex, rob_id_byte, current_pos, posicao_a_mover)
-                    if movido:
-                        energia_atual = flags.get(f'energia_{robot_char}', 0)
-                        flags[f'energia_{robot_char}'] = energia_atual - 1
-                        log_msg = f"Movido para {posicao_a_mover}. Energia: {flags.get(f'energia_{robot_char}')}"
-                        if item_coletado == b'&':
-                            nova_energia = min(MAX_ENERGY, flags[f'energia_{robot_char}'] + 20)
-                            flags[f'energia_{robot_char}'] = nova_energia
-                            log_msg += f". BATERIA COLETADA! Nova energia: {nova_energia}"
-                        log(robot_char, log_msg)
-
-        time.sleep(0.3)
-
-    log(robot_char, "Processo encerrado.")
-
-    robos_vivos = 0
-    for r_id in ROBOT_IDS:
-        if flags.get(f'energia_{r_id}', 0) > 0:
-            robos_vivos += 1
-
-    if robos_vivos <= 1:
-        flags['game_over'] = True
-        log(robot_char, f"Fim de jogo detectado ({robos_vivos} robôs restantes).")
+        lote = []
+        for robot_id_index in robos:
+            status = flags.robos[robot_id_index]
+            inicio_cpu = time.process_time()
+            cronometro.troca(perfil.SENSOR, robot_id_index)
+            intencao = decide_robo(grid, regioes, posicoes, indice, caminhos, flags, robot_id_index, cronometro)
+            if intencao is None:
+                cronometro.troca(perfil.LOG)
+                log(ROBOT_IDS[robot_id_index], "Fora do jogo.")
+            elif intencao[0] != NADA:
+                lote.append((robot_id_index,) + intencao)
+            status.cpu += time.process_time() - inicio_cpu
+        cronometro.troca(perfil.ESPERA_LOCK, linha_trabalhador)
+        intencoes.publica(lote)
+
+        # Conclui o tick e espera os outros trabalhadores (ritmo dado pelo escalonador)
+        cronometro.troca(perfil.SONO)
+        tick = escalonador.proximo_tick(tick)
+
+    escalonador.sai(tick)
@@ -1,33 +1,54 @@
+import argparse
+import functools
 import multiprocessing
-import threading
 import ctypes
 import random
 import time
 import sys
 import termios
 import tty
-import os
+import numpy as np
+from regioes import Regioes
+import logger
+import travas
+import perfil
+from logger import logger_process
+from escalonador import Escalonador
+from renderizador import RenderizadorDiff
+from caminhos import Caminhos
+from temporizador import RodaTemporizadora
+from livres import CelulasLivres
+from segmentos import Segmentos
+from viewer_curses import executa_curses
+import celulas
 
 # Definição das constantes
-# Dimensões do tabuleiro
-GRID_WIDTH = 40
-GRID_HEIGHT = 20
+# Dimensões do tabuleiro, energia máxima e quantidades vêm de constants.py
+# (podem ser alteradas pelas variáveis de ambiente ARENA_*)
+from constants import GRID_WIDTH, GRID_HEIGHT, MAX_ENERGY, NUM_ROBOTS, NUM_BATTERIES, NUM_BARRIERS, REGION_HEIGHT, ROBOT_IDS, LOCK_STATS, BATTERY_RESPAWN, PHASE_STATS, CPROFILE
 
-# Energia máxima que um robô pode ter e valor da bateria
-MAX_ENERGY = 100
+# Valor da bateria
 BATTERY_VALUE = 20
 
-# Número total de robôs na arena
-NUM_ROBOTS = 4
+# Número de casas visíveis para o robô
+VISIBILITY = 10
 
-# Número de baterias a serem colocadas no grid
-NUM_BATTERIES = 5
+# Quantos alvos de cada tipo (baterias, robôs) o sense devolve, do mais próximo
+SENSE_K = 3
 
-# Número de barreiras fixas a serem colocadas no grid
-NUM_BARRIERS = 30
+# Distância ao quadrado de cada célula da janela de visão até o centro,
+# calculada uma vez; o sense só recorta o trecho dentro do grid
+_DESLOCAMENTOS = np.arange(-VISIBILITY, VISIBILITY + 1) ** 2
+DISTANCIAS_VISAO = _DESLOCAMENTOS[:, None] + _DESLOCAMENTOS[None, :]
 
-# Número de casas visíveis para o robô
-VISIBILITY = 10
+# Intervalo (em segundos) entre ticks; um robô de velocidade v age a cada v ticks
+TICK_INTERVAL = 0.2
+
+# Manutenção periódica, em ticks do escalonador (0 = desligada)
+ENERGY_DECAY_TICKS = 20         # Cada robô vivo perde 1 de energia
+BATTERY_RESPAWN_TICKS = 30      # Baterias coletadas reaparecem (com ARENA_BATTERY_RESPAWN=1)
+STATUS_TICKS = 10               # Resumo da partida em log_arena.txt
+LOG_FLUSH_TICKS = 5             # Grava o log pendente
 
 # Função para encontrar célula vazia no grid. Utilizada na inicialização dos robôs
 def find_empty_cell(grid):
@@ -39,24 +60,38 @@ def find_empty_cell(grid):
 
         #print("find_empty_cell WHILE 2")
         # Verifica se a célula está vazia
-        if grid[x][y] == b' ':
+        if grid[x][y] == celulas.VAZIO:
             print("find_empty_cell IF")
             time.sleep(1)
             return (x, y)
 
+# Valores especiais de Flags.winner
+SEM_VENCEDOR = -1
+EMPATE = -2
+
+# Avisa o escalonador de uma morte: o robô derrotado para de esperar o turno
+# na hora e, se restou no máximo um robô, o jogo acaba para todos
+def notifica_mortes(flags, escalonador):
+    if escalonador is None:
+        return
+    if flags.game_over <= 0:
+        escalonador.encerra()
+    else:
+        escalonador.acorda()
+
 # Memória compartilhada para as flags
 class Flags(ctypes.Structure):
     _fields_ = [
         ("init_done", ctypes.c_bool),
         ("game_over", ctypes.c_int),
-        ("winner", ctypes.c_char),
+        ("winner", ctypes.c_int),      # Índice do robô vencedor, SEM_VENCEDOR ou EMPATE
     ]
 
 """"
 Estrutura de dados para representar um robô no jogo.
 Utiliza ctypes para garantir a manipulação de dados entre processos.
 Cada robô tem:
-    - ID
+    - ID (índice do robô, o mesmo guardado na célula do grid)
     - força (1-10)
     - energia (10-100)
     - velocidade (1-5)
@@ -66,19 +101,21 @@ Cada robô tem:
 """
 class RobotStruct(ctypes.Structure):
     _fields_ = [
-        ("id", ctypes.c_char),
+        ("id", ctypes.c_int),
         ("strength", ctypes.c_int),
         ("energy", ctypes.c_int),
         ("speed", ctypes.c_int),
         ("x", ctypes.c_int),
         ("y", ctypes.c_int),
         ("status", ctypes.c_bool),
+        ("moves", ctypes.c_long),       # Movimentos feitos (benchmarks)
+        ("cpu", ctypes.c_double),       # Tempo de CPU do processo, gravado ao sair
     ]
 
 """
 Classe básica para representar um robô no jogo.
 A classe inclui métodos para:
-    - iniciar o robô e as threads para tomada de decisão e housekeeping
+    - iniciar o robô e o loop de tomada de decisão
     - obter a posição inicial
     - mover o robô
     - batalhar com outro robô
@@ -86,60 +123,84 @@ A classe inclui métodos para:
     - obter e definir posição
 """
 class Robot():
-    def __init__(self, id, grid, robots_array, flags, robotStruct: RobotStruct, grid_mutex, robots_mutex, flags_mutex):
+    def __init__(self, id, grid, robots_array, flags, robotStruct: RobotStruct, regioes, robots_mutex, flags_mutex, escalonador=None, caminhos=None, livres=None):
         self.id = id
         self.grid = grid
         self.robots_array = robots_array
         self.flags = flags
         self.robotStruct = robotStruct
-        self.grid_mutex = grid_mutex
+        self.regioes = regioes
         self.robots_mutex = robots_mutex
         self.flags_mutex = flags_mutex
+        self.escalonador = escalonador
+        self.caminhos = caminhos
+        self.livres = livres
+        # Numa partida retomada de um checkpoint o escalonador não começa do zero
+        self.tick = escalonador.tick.value if escalonador else 0
+        # Tempo por fase do tick (ver perfil.py), ligado pelo processo do robô
+        self.cronometro = perfil.NULO
+
+        # Vista NumPy (linhas x colunas) do RawArray do grid, sem cópia
+        self.grid_np = np.frombuffer(grid, dtype=np.uint32).reshape(GRID_HEIGHT, GRID_WIDTH)
+
+    # Espera a vez do robô: uma ação a cada `speed` ticks do escalonador.
+    # Retorna False se o robô morreu ou o jogo acabou durante a espera.
+    def espera_turno(self):
+        self.tick = self.escalonador.espera_ticks(self.tick, self.robotStruct.speed, self.fora_do_jogo)
+        return not self.fora_do_jogo() and not self.escalonador.encerrado.value
+
+    def fora_do_jogo(self):
+        return not self.robotStruct.status
 
     # Método para identificação de baterias e robôs no grid
     def sense(self):
-        #print(f"SENSE Robô {self.robotStruct.id.decode()} - ({self.robotStruct.x},{self.robotStruct.y})")
-        #time.sleep(2)
+        self.cronometro.troca(perfil.SENSOR)
         id = self.robotStruct.id
-        x_robot = self.robotStruct.x
-        y_robot = self.robotStruct.y
-
-        # Define os limites da visão do robô
-        left = x_robot - VISIBILITY if x_robot - VISIBILITY > 0 else 0
-        right = x_robot + VISIBILITY if x_robot + VISIBILITY < GRID_WIDTH else GRID_WIDTH
-        top = y_robot - VISIBILITY if y_robot - VISIBILITY > 0 else 0
-        bottom = y_robot + VISIBILITY if y_robot + VISIBILITY < GRID_HEIGHT else GRID_HEIGHT
-
-        # Armazena baterias e robôs por perto
-        btrs = []
-        rbts = []
-
-        # Percorre a visão do robô
-        for row in range(top, bottom):
-            for col in range(left, right):
-                cell = self.grid[row * GRID_WIDTH + col]
-                if cell == b'&': # Bateria
-                    btrs.append((row, col))
-
-                elif 65 <= ord(cell) <= 90 and cell != id: # Robô
-                    rbts.append((row, col, cell.decode()))
-
-        # Ordena as listas de baterias e robôs por distância
-        btrs.sort(key=lambda x: (x[0] - x_robot) ** 2 + (x[1] - y_robot) ** 2)
-        rbts.sort(key=lambda x: (x[0] - x_robot) ** 2 + (x[1] - y_robot) ** 2)
-
-        print(f"Robô {self.robotStruct.id.decode()}, ({x_robot},{y_robot}) - Baterias: {btrs}, Robôs: {rbts}")
-        time.sleep(1)
-
+        x_robot = self.robotStruct.x        # Linha
+        y_robot = self.robotStruct.y        # Coluna
+
+        # Limites da visão do robô (linhas top..bottom, colunas left..right)
+        top = max(x_robot - VISIBILITY, 0)
+        bottom = min(x_robot + VISIBILITY + 1, GRID_HEIGHT)
+        left = max(y_robot - VISIBILITY, 0)
+        right = min(y_robot + VISIBILITY + 1, GRID_WIDTH)
+        distancias = DISTANCIAS_VISAO[top - x_robot + VISIBILITY:bottom - x_robot + VISIBILITY,
+                                      left - y_robot + VISIBILITY:right - y_robot + VISIBILITY]
+
+        # Uma passada vetorizada sobre a janela, lida direto da memória
+        # compartilhada e validada pelas versões das faixas (seqlock)
+        def leitura():
+            janela = self.grid_np[top:bottom, left:right]
+            tipos = janela & celulas.TIPO_MASCARA
+            linhas_b, cols_b = self.mais_proximos(tipos == celulas.BATERIA, distancias)
+            linhas_r, cols_r = self.mais_proximos((tipos == celulas.ROBO) & (janela != celulas.robo(id)), distancias)
+            return linhas_b, cols_b, linhas_r, cols_r, janela[linhas_r, cols_r] >> celulas.TIPO_BITS
+
+        linhas_b, cols_b, linhas_r, cols_r, ids_r = self.regioes.le_consistente(top, bottom, leitura)
+
+        # Baterias (linha, coluna) e robôs (linha, coluna, índice), do mais próximo ao mais distante
+        btrs = list(zip((linhas_b + top).tolist(), (cols_b + left).tolist()))
+        rbts = list(zip((linhas_r + top).tolist(), (cols_r + left).tolist(), ids_r.tolist()))
         return btrs, rbts
 
+    # Posições (linhas, colunas) dos SENSE_K itens da máscara com menor distância, em ordem
+    @staticmethod
+    def mais_proximos(mascara, distancias):
+        linhas, cols = np.nonzero(mascara)
+        d = distancias[linhas, cols]
+        if len(d) > SENSE_K:
+            escolhidos = np.argpartition(d, SENSE_K - 1)[:SENSE_K]
+            linhas, cols, d = linhas[escolhidos], cols[escolhidos], d[escolhidos]
+        ordem = np.argsort(d, kind='stable')
+        return linhas[ordem], cols[ordem]
+
     # Método para tomada de decisão e ação do robô
     def act(self, btrs, rbts):
+        self.cronometro.troca(perfil.DECISAO)
         id = self.robotStruct.id
         x_robot = self.robotStruct.x
         y_robot = self.robotStruct.y
         energy = self.robotStruct.energy
-        speed = self.robotStruct.speed
 
         # Prioridade para baterias, depois para robôs. Se não houver, movimento aleatório.
         target = btrs[0] if btrs else (rbts[0] if rbts else random.choice([(0, 1), (1, 0), (0, -1), (-1, 0)]))
@@ -152,10 +213,17 @@ class Robot():
         move_x = 0 if dx == 0 else (1 if dx > 0 else -1)
         move_y = 0 if dy == 0 else (1 if dy > 0 else -1)
 
+        # Com bateria à vista, segue o campo de distância até a bateria mais
+        # próxima (contorna as barreiras em vez de andar aleatoriamente)
+        passos = self.caminhos.passos(x_robot * GRID_WIDTH + y_robot) if btrs and self.caminhos else []
+
         # Escolhe direção para andar para não fazer movimentos diagonais
         choice = random.choice([0, 1])
 
-        if choice == 0: # Escolhe mover na direção de x
+        if passos:
+            new_x, new_y = divmod(random.choice(passos), GRID_WIDTH)
+
+        elif choice == 0: # Escolhe mover na direção de x
             new_x = x_robot + move_x
             if new_x < 0 or new_x >= GRID_WIDTH: # Verifica se o movimento está dentro dos limites do grid
                 new_x = x_robot
@@ -173,14 +241,27 @@ class Robot():
             #time.sleep(1)
             #print("Loop ACT")
             #time.sleep(1)
-            time.sleep(0.2 * speed)
-            with self.grid_mutex:
+            self.cronometro.troca(perfil.SONO)
+            if not self.espera_turno():
+                return
+            # Trava só as faixas da posição atual e do destino (inclui o
+            # adversário em caso de duelo), sempre na mesma ordem
+            self.cronometro.troca(perfil.ESPERA_LOCK)
+            with self.regioes.trava(x_robot * GRID_WIDTH + y_robot, new_x * GRID_WIDTH + new_y):
+                self.cronometro.troca(perfil.MOVIMENTO)
+                # Derrotado (ex.: num duelo iniciado pelo adversário) entre a
+                # espera do turno e o lock: não age mais
+                if not self.robotStruct.status:
+                    return
+
                 # Obtém o conteúdo da célula do grid da nova posição
                 cell = self.grid[new_x * GRID_WIDTH + new_y]
+                tipo = celulas.tipo(cell)
                 
-                if cell == b' ': # Movimento para posição vazia
-                    self.grid[x_robot * GRID_WIDTH + y_robot] = b' '
-                    self.grid[new_x * GRID_WIDTH + new_y] = self.robotStruct.id
+                if tipo == celulas.VAZIO: # Movimento para posição vazia
+                    self.grid[x_robot * GRID_WIDTH + y_robot] = celulas.VAZIO
+                    self.grid[new_x * GRID_WIDTH + new_y] = celulas.robo(id)
+                    self.livres.move(x_robot * GRID_WIDTH + y_robot, new_x * GRID_WIDTH + new_y)
 
                     #print(f"Robô {self.robotStruct.id.decode()} movimentando de ({x_robot},{y_robot}) para vazia ({new_x},{new_y})")
                     #time.sleep(1)
@@ -190,40 +271,57 @@ class Robot():
                         self.robotStruct.x = new_x
                         self.robotStruct.y = new_y
                         self.robotStruct.energy -= 1
+                        self.robotStruct.moves += 1
 
                     # Verifica se a energia do robô chegou a zero
                     if self.robotStruct.energy == 0:
-                        self.grid[new_x * GRID_WIDTH + new_y] = b' '
+                        self.grid[new_x * GRID_WIDTH + new_y] = celulas.VAZIO
+                        self.livres.adiciona(new_x * GRID_WIDTH + new_y)
                         self.robotStruct.status = False
                         with self.flags_mutex:
                             self.flags.game_over -= 1
+                        notifica_mortes(self.flags, self.escalonador)
 
                     return
 
-                elif cell == b'&': # Movimento para posição com bateria
-                    print(f"Robô {self.robotStruct.id.decode()} recarregando em ({new_x},{new_y})")
-                    self.grid[x_robot * GRID_WIDTH + y_robot] = b' '
-                    self.grid[new_x * GRID_WIDTH + new_y] = self.robotStruct.id
-                    self.recharge(BATTERY_VALUE)
+                elif tipo == celulas.BATERIA: # Movimento para posição com bateria
+                    self.log(f"Recarregando em ({new_x},{new_y})")
+                    self.grid[x_robot * GRID_WIDTH + y_robot] = celulas.VAZIO
+                    self.grid[new_x * GRID_WIDTH + new_y] = celulas.robo(id)
+                    self.livres.move(x_robot * GRID_WIDTH + y_robot, new_x * GRID_WIDTH + new_y)
+
+                    # Atualiza a posição e a energia do robô, como no movimento para célula vazia
+                    with self.robots_mutex:
+                        self.robotStruct.x = new_x
+                        self.robotStruct.y = new_y
+                        self.recharge(BATTERY_VALUE)
+                        self.robotStruct.moves += 1
+                    if self.caminhos:
+                        self.caminhos.consome(celulas.ident(cell))
                     
                     return
 
-                elif 65 <= ord(cell) <= 90:
+                elif tipo == celulas.ROBO and celulas.ident(cell) != id:
                     # Realiza o duelo com o robô adversário
+                    self.cronometro.troca(perfil.ESPERA_LOCK)
                     with self.robots_mutex:
-                        print(f"Robô {self.robotStruct.id.decode()} duela com {cell.decode()}")
+                        self.cronometro.troca(perfil.MOVIMENTO)
+                        self.log(f"Duela com {ROBOT_IDS[celulas.ident(cell)]}")
+                        self.cronometro.troca(perfil.SONO)
                         time.sleep(2)
-                        self.battle(cell)
+                        self.cronometro.troca(perfil.MOVIMENTO)
+                        self.battle(celulas.ident(cell))
 
                         # Verifica se a energia do robô chegou a zero
                         if self.robotStruct.energy == 0:
-                            self.status = False
+                            self.robotStruct.status = False
                             with self.flags_mutex:
                                 self.flags.game_over -= 1
 
+                    notifica_mortes(self.flags, self.escalonador)
                     return
 
-                elif self.grid[new_x * GRID_WIDTH + new_y] == b'#':
+                elif tipo == celulas.BARREIRA:
                     # Movimento aleatório em caso de barreira
                     move_x, move_y = random.choice([(0, 1), (1, 0), (0, -1), (-1, 0)])
                     new_x = x_robot + move_x
@@ -243,17 +341,19 @@ class Robot():
         y_self = self.robotStruct.y
         power_self = 2 * self.robotStruct.strength + self.robotStruct.energy
         
-        # Obtém dados e calcula poder do robô adversário
-        id_other = self.robots_array[ord(other_robot_id) - 65].id
-        x_other  = self.robots_array[ord(other_robot_id) - 65].x
-        y_other = self.robots_array[ord(other_robot_id) - 65].y
-        power_other = 2 * self.robots_array[ord(other_robot_id) - 65].strength + self.robots_array[ord(other_robot_id) - 65].energy
+        # Obtém dados e calcula poder do robô adversário (other_robot_id é o índice do robô)
+        other = self.robots_array[other_robot_id]
+        id_other = other.id
+        x_other  = other.x
+        y_other = other.y
+        power_other = 2 * other.strength + other.energy
 
         if power_self > power_other:
             # Se robô que chamou o método vencer, muda o status do outro robô para "morto"
-            self.robots_array[id_other].status = False
-            self.grid[x_self * GRID_WIDTH + y_self] = b' '
-            self.grid[x_other * GRID_WIDTH + y_other] = self.robotStruct.id
+            other.status = False
+            self.grid[x_self * GRID_WIDTH + y_self] = celulas.VAZIO
+            self.livres.adiciona(x_self * GRID_WIDTH + y_self)
+            self.grid[x_other * GRID_WIDTH + y_other] = celulas.robo(id_self)
             self.robotStruct.x = x_other
             self.robotStruct.y = y_other
             self.robotStruct.energy -= 1
@@ -261,35 +361,38 @@ class Robot():
             with self.flags_mutex:
                 self.flags.game_over -= 1
                 if self.flags.game_over == 0:
-                    self.flags.winner = self.robotStruct.id
+                    self.flags.winner = id_self
 
                 return
 
         elif power_self < power_other:
             # Se robô que chamou o método perder, muda o próprio status para "morto"
-            self.status = False
-            self.grid[x_self * GRID_WIDTH + y_self] = b' '
-            self.robots_array[ord(other_robot_id) - 65].energy -= 1
+            self.robotStruct.status = False
+            self.grid[x_self * GRID_WIDTH + y_self] = celulas.VAZIO
+            self.livres.adiciona(x_self * GRID_WIDTH + y_self)
+            other.energy -= 1
             
             with self.flags_mutex:
                 self.flags.game_over -= 1
                 if self.flags.game_over == 0:
-                    self.flags.winner = self.robots_array[id_other].id
+                    self.flags.winner = id_other
 
                 return
 
         else:
             # Em caso de empate, ambos os robôs mudam o status para "morto"
-            self.status = False
-            self.grid[self.robotStruct.x * GRID_WIDTH + self.robotStruct.y] = b' '
+            self.robotStruct.status = False
+            self.grid[self.robotStruct.x * GRID_WIDTH + self.robotStruct.y] = celulas.VAZIO
+            self.livres.adiciona(self.robotStruct.x * GRID_WIDTH + self.robotStruct.y)
             
-            self.robots_array[ord(other_robot_id) - 65].status = False
-            self.grid[x_other * GRID_WIDTH + y_other] = b' '
+            other.status = False
+            self.grid[x_other * GRID_WIDTH + y_other] = celulas.VAZIO
+            self.livres.adiciona(x_other * GRID_WIDTH + y_other)
             
             with self.flags_mutex:
                 self.flags.game_over -= 2
                 if self.flags.game_over == 0:
-                    self.flags.winner = b'-'
+                    self.flags.winner = EMPATE
                     
                 return
     
@@ -302,11 +405,12 @@ class Robot():
 
     """
     Método auxiliar para registrar ações do robô em arquivo.
-    Registra a mensagem com o horário atual.
+    Só enfileira a mensagem; o processo escritor do log grava em log_<id>.txt.
     """
-    #def log(self, robot, message):
-    #with open(robot.log_file, "a") as f:
-        #f.write(f"[{time.strftime('%H:%M:%S')}] {message}\n")  # grava mensagem com horário
+    def log(self, message):
+        fase = self.cronometro.troca(perfil.LOG)
+        logger.log(self.id, message)
+        self.cronometro.troca(fase)
 
 
 
@@ -316,8 +420,8 @@ Além das funcionalidades básicas de um robô, ela inclui a capacidade de receb
 """
 """
 class PlayerRobot(Robot):
-    def __init__(self, id, grid, robots_array, robotStruct: RobotStruct, grid_mutex, robots_mutex, flags_mutex):
-        super().__init__(id, grid, robots_array, robotStruct, grid_mutex, robots_mutex, flags_mutex)
+    def __init__(self, id, grid, robots_array, robotStruct: RobotStruct, regioes, robots_mutex, flags_mutex):
+        super().__init__(id, grid, robots_array, robotStruct, regioes, robots_mutex, flags_mutex)
         self.input_thread = threading.Thread(target=self.get_input)
 
     def get_input(self):
@@ -339,89 +443,84 @@ Classe para gerenciar o processo de um robô.
 Inclui a lógica de inicialização e execução do robô.
 """
 class RobotProcess(multiprocessing.Process):
-    def __init__(self, id, grid, robots_array, flags, grid_mutex, robots_mutex, flags_mutex):
+    def __init__(self, id, grid, robots_array, flags, regioes, robots_mutex, flags_mutex, fila_log, escalonador, caminhos, livres, fases=None):
         super().__init__()
         self.id = id
         self.grid = grid
         self.robots_array = robots_array
         self.flags = flags
-        self.robot = Robot(chr(id+65), grid, robots_array, flags, robots_array[id], grid_mutex, robots_mutex, flags_mutex)
-        self.grid_mutex = grid_mutex
+        self.escalonador = escalonador
+        self.robot = Robot(ROBOT_IDS[id], grid, robots_array, flags, robots_array[id], regioes, robots_mutex, flags_mutex, escalonador, caminhos, livres)
+        self.regioes = regioes
+        self.caminhos = caminhos
+        self.livres = livres
         self.robots_mutex = robots_mutex
         self.flags_mutex = flags_mutex
-        self.log_file = f"log_{self.robot.id}.txt"
+        self.fila_log = fila_log
+        self.fases = fases
 
     """
     Método principal que inicia o robô e é utilizado como target do processo.
-    Inicializa o grid, se for o primeiro a executar, e inicia as threads de tomada de decisão e housekeeping.
+    Inicializa o grid, se for o primeiro a executar, e roda o loop de tomada de decisão.
     """
     def run(self):
+        # Conecta o robô ao processo escritor do log
+        logger.conecta(self.fila_log)
+        travas.define_robo(self.id)
+
         # Inicializa o grid se for o primeiro robô a executar
         with self.flags_mutex:
             if not self.flags.init_done:
                 self.initialization()
                 self.flags.init_done = True
             
-        # Inicia as threads de tomada de decisão e housekeeping
-        sense_act_thread = threading.Thread(target=self.sense_act)
-        sense_act_thread.start()
-        housekeeping_thread = threading.Thread(target=self.housekeeping)
-        housekeeping_thread.start()
-
-        # Aguarda o término das threads
-        sense_act_thread.join()
-        housekeeping_thread.join()
+        # Loop de tomada de decisão no próprio processo: sem threads extras
+        # (o antigo housekeeping era uma espera ocupada que não fazia nada),
+        # medido por fase e, com ARENA_CPROFILE=1, sob o cProfile
+        self.robot.cronometro = perfil.cronometro(self.fases, self.id)
+        perfil.perfilado(ROBOT_IDS[self.id], self.sense_act)
+        self.robot.robotStruct.cpu = time.process_time()
 
     # Função para encontrar célula vazia no grid. Utilizada na inicialização dos robôs
+    # Sorteia direto do conjunto de células livres, sem tentativa e erro
     def find_empty_cell(self):
-        while True:
-            x = random.randint(0, GRID_HEIGHT - 1)
-            y = random.randint(0, GRID_WIDTH - 1)
-
-            #print("find_empty_cell WHILE 2")
-            # Verifica se a célula está vazia
-            if self.grid[x * GRID_WIDTH + y] == b' ':
-                return (x, y)
+        return divmod(self.livres.sorteia(), GRID_WIDTH)
 
     """
     Método de inicialização: realiza a inicialização dos segmentos de memória compartilhada.
     """
     def initialization(self):
-        with self.grid_mutex:
+        with self.regioes.trava_tudo():
             # Inicializa o grid com espaços vazios
             for row in range(GRID_HEIGHT):
                 for col in range(GRID_WIDTH):
-                    self.grid[row * GRID_WIDTH + col] = b' '
+                    self.grid[row * GRID_WIDTH + col] = celulas.VAZIO
+            self.livres.enche(self.grid)
                     
             # Posiciona as barreiras
             for _ in range(NUM_BARRIERS):
-                while True:
-                    x = random.randint(0, GRID_HEIGHT - 1)
-                    y = random.randint(0, GRID_WIDTH - 1)
-                    if self.grid[x * GRID_WIDTH + y] == b' ':
-                        self.grid[x * GRID_WIDTH + y] = b'#'
-                        break
+                x, y = self.find_empty_cell()
+                self.grid[x * GRID_WIDTH + y] = celulas.BARREIRA
 
             # Posiciona as baterias
-            for _ in range(NUM_BATTERIES):
-                while True:
-                    x = random.randint(0, GRID_HEIGHT - 1)
-                    y = random.randint(0, GRID_WIDTH - 1)
-                    if self.grid[x * GRID_WIDTH + y] == b' ':
-                        self.grid[x * GRID_WIDTH + y] = b'&'
-                        break
+            for numero in range(NUM_BATTERIES):
+                x, y = self.find_empty_cell()
+                self.grid[x * GRID_WIDTH + y] = celulas.bateria(numero)
 
             # Posiciona os robôs
             for rbt in range(NUM_ROBOTS):
                 with self.robots_mutex:
-                    self.robots_array[rbt].id = chr(rbt + 65).encode()
+                    self.robots_array[rbt].id = rbt
                     self.robots_array[rbt].strength = random.randint(1, 10)
                     self.robots_array[rbt].energy = random.randint(10, 100)
                     self.robots_array[rbt].speed = random.randint(1, 5)
                     self.robots_array[rbt].x, self.robots_array[rbt].y = self.find_empty_cell()
-                    self.grid[self.robots_array[rbt].x * GRID_WIDTH + self.robots_array[rbt].y] = self.robots_array[rbt].id
+                    self.grid[self.robots_array[rbt].x * GRID_WIDTH + self.robots_array[rbt].y] = celulas.robo(rbt)
                     self.robots_array[rbt].status = True
 
+            # Campos de distância até as baterias sobre o mapa recém-criado
+            self.caminhos.constroi(self.grid)
+
     """
     Loop do robô: realiza a tomada de decisão e ação do robô.
     """
@@ -429,86 +528,356 @@ class RobotProcess(multiprocessing.Process):
         while self.robot.robotStruct.status and self.flags.game_over > 0:
             btrs, rbts = self.robot.sense()
             self.robot.act(btrs, rbts)
+        self.robot.cronometro.troca(perfil.SONO)
 
-    """
-    Método de housekeeping: realiza a manutenção do robô.
-    """
-    def housekeeping(self):
-        while self.robot.robotStruct.status and self.flags.game_over > 0:
-            continue
+        # Deixa de ser esperado pelo escalonador de ticks
+        self.escalonador.sai(self.robot.tick)
+
+"""
+Processo de manutenção da arena, orientado a eventos.
+Não é um participante do escalonador: dorme na condição dele até o tick
+mudar ou o jogo acabar (sem CPU enquanto espera) e, a cada tick, avança uma
+roda de temporizadores com as tarefas periódicas:
+    - desgaste de energia dos robôs vivos
+    - reposição das baterias coletadas
+    - publicação do resumo da partida no log
+    - gravação do log pendente
+"""
+class HousekeepingProcess(multiprocessing.Process):
+    def __init__(self, grid, robots_array, flags, regioes, robots_mutex, flags_mutex, fila_log, escalonador, caminhos, livres):
+        super().__init__()
+        self.grid = grid
+        self.robots_array = robots_array
+        self.flags = flags
+        self.regioes = regioes
+        self.robots_mutex = robots_mutex
+        self.flags_mutex = flags_mutex
+        self.fila_log = fila_log
+        self.escalonador = escalonador
+        self.caminhos = caminhos
+        self.livres = livres
+
+    def run(self):
+        logger.conecta(self.fila_log)
+
+        tick = self.escalonador.tick.value
+        roda = RodaTemporizadora(agora=tick)
+        tarefas = (
+            (ENERGY_DECAY_TICKS, self.energy_decay),
+            (BATTERY_RESPAWN_TICKS if BATTERY_RESPAWN else 0, self.battery_respawn),
+            (STATUS_TICKS, self.publish_status),
+            (LOG_FLUSH_TICKS, self.flush_log),
+        )
+        for periodo, tarefa in tarefas:
+            if periodo:
+                roda.agenda(periodo, tarefa, periodo)
+
+        while True:
+            tick = self.escalonador.observa(tick)
+            if self.escalonador.encerrado.value:
+                break
+            roda.avanca(tick)
+
+    # Cada robô vivo perde 1 de energia; quem chega a zero sai do grid
+    def energy_decay(self, tick):
+        mortos = []
+        divergentes = []
+        for i in range(NUM_ROBOTS):
+            robot = self.robots_array[i]
+            if not robot.status:
+                continue
+            cell = robot.x * GRID_WIDTH + robot.y
+            with self.regioes.trava(cell):
+                with self.robots_mutex:
+                    # O robô pode ter se movido ou morrido antes do lock
+                    if not robot.status or robot.x * GRID_WIDTH + robot.y != cell:
+                        continue
+                    robot.energy -= 1
+                    if robot.energy > 0:
+                        continue
+                    robot.status = False
+                    # Só libera a célula se ela ainda for deste robô
+                    if self.grid[cell] == celulas.robo(i):
+                        self.grid[cell] = celulas.VAZIO
+                        self.livres.adiciona(cell)
+                    else:
+                        divergentes.append((i, cell))
+            mortos.append(i)
+
+        for i, cell in divergentes:
+            logger.log(ROBOT_IDS[i], f"Célula ({cell // GRID_WIDTH}, {cell % GRID_WIDTH}) não contém o robô; mantida no desgaste.")
+        if not mortos:
+            return
+        with self.flags_mutex:
+            self.flags.game_over -= len(mortos)
+            if self.flags.game_over <= 0 and self.flags.winner == SEM_VENCEDOR:
+                vivos = [j for j in range(NUM_ROBOTS) if self.robots_array[j].status]
+                self.flags.winner = vivos[0] if vivos else EMPATE
+        for i in mortos:
+            logger.log(ROBOT_IDS[i], "Sem energia (desgaste).")
+        notifica_mortes(self.flags, self.escalonador)
+
+    # Baterias coletadas reaparecem numa célula livre sorteada
+    def battery_respawn(self, tick):
+        for numero in range(NUM_BATTERIES):
+            if not self.caminhos.ativas[numero]:
+                idx = self.livres.ocupa(self.grid, celulas.bateria(numero))
+                if idx is not None:
+                    self.caminhos.repoe(self.grid, numero, idx)
+
+    def publish_status(self, tick):
+        vivos = [self.robots_array[i] for i in range(NUM_ROBOTS) if self.robots_array[i].status]
+        baterias = sum(self.caminhos.ativas[:])
+        logger.log("arena", f"Tick {tick}: {len(vivos)} robôs vivos, energia total {sum(r.energy for r in vivos)}, {baterias} baterias")
+
+    def flush_log(self, tick):
+        logger.descarrega()
 
 class ViewerProcess(multiprocessing.Process):
-    def __init__(self, grid, robots_array, flags, refresh_rate=0.2):
+    def __init__(self, grid, robots_array, flags, regioes, refresh_rate=0.2):
         super().__init__()
         self.grid = grid
+        self.regioes = regioes
         self.robots_array = robots_array
         self.flags = flags
         self.refresh_rate = refresh_rate
 
     def run(self):
-        while True:
+        # Linhas do grid são bytes crus (células de 32 bits); as demais já são texto
+        renderizador = RenderizadorDiff(1 / self.refresh_rate, converte=lambda linha: linha if isinstance(linha, str) else '#' + celulas.texto(linha) + '#')
+        largura_linha = GRID_WIDTH * celulas.TAMANHO_CELULA
+        # Até o fim do jogo (mesma condição do CursesViewerProcess)
+        while not (self.flags.init_done and self.flags.game_over <= 0):
             if self.flags.init_done:
-                os.system('cls' if os.name == 'nt' else 'clear')
-                print("=== Arena dos Robôs (Viewer) ===\n")
-                
-                for r in range(GRID_HEIGHT + 2):
-                    if r == 0 or r == GRID_HEIGHT + 1:
-                        print('#' * (GRID_WIDTH + 1))
-                        continue
-                    for c in range(GRID_WIDTH + 2):
-                        if c == 0 or c == GRID_WIDTH + 1:
-                            print('#', end = '')
-                        else:
-                            print(self.grid[(r - 1)  * GRID_WIDTH + (c - 1)].decode(), end = '')
-                    print()
-
-                print()
+                # Copia o grid inteiro de uma vez (snapshot consistente, sem lock)
+                quadro = self.regioes.snapshot(self.grid)
+
+                linhas = ["=== Arena dos Robôs (Viewer) ===", ""]
+                linhas.append('#' * (GRID_WIDTH + 1))
+                for r in range(GRID_HEIGHT):
+                    linhas.append(quadro[r * largura_linha:(r + 1) * largura_linha])
+                linhas.append('#' * (GRID_WIDTH + 1))
+
+                linhas.append("")
                 for i in range(NUM_ROBOTS):
-                    print(f"Robô {self.robots_array[i].id.decode()}: Energia = {self.robots_array[i].energy}, Status = {'Vivo' if self.robots_array[i].status else 'Morto'}, Posição = ({self.robots_array[i].x},{self.robots_array[i].y})")
-                print("\nCtrl+C para sair.")
-                time.sleep(self.refresh_rate)
+                    linhas.append(f"Robô {ROBOT_IDS[self.robots_array[i].id]}: Energia = {self.robots_array[i].energy}, Status = {'Vivo' if self.robots_array[i].status else 'Morto'}, Posição = ({self.robots_array[i].x},{self.robots_array[i].y})")
+                linhas.append("")
+                linhas.append("Ctrl+C para sair.")
+
+                # Emite só o que mudou desde o último quadro, em uma escrita
+                renderizador.desenha(linhas)
+            renderizador.espera_quadro()
+
+        renderizador.fim()
+
+# Gancho do escalonador entre dois ticks: grava o checkpoint periódico ou
+# pedido de fora (segmentos.py checkpoint). Os robôs esperam o próximo tick,
+# mas a manutenção pode estar agindo: a cópia é feita com todos os locks, na
+# mesma ordem em que os robôs os adquirem
+def checkpoint_fim_do_tick(segmentos, regioes, robots_mutex, flags_mutex, a_cada, tick):
+    if not segmentos.pedido() and not (a_cada and tick % a_cada == 0):
+        return
+    with regioes.trava_tudo(), robots_mutex, flags_mutex:
+        copia = segmentos.copia()
+    segmentos.grava_checkpoint(tick, copia)
+    logger.log("arena", f"Checkpoint do tick {tick} gravado em {segmentos.arquivo_checkpoint}")
 
-def main():
-    # Flags na memória compartilhada
-    flags = multiprocessing.RawValue(Flags)
+"""
+Viewer em curses: só uma janela rolável do grid, com minimapa e status dos
+robôs (ver viewer_curses.py), para arenas maiores que o terminal.
+"""
+class CursesViewerProcess(multiprocessing.Process):
+    def __init__(self, grid, robots_array, flags, regioes, refresh_rate=0.2):
+        super().__init__()
+        self.grid = grid
+        self.regioes = regioes
+        self.robots_array = robots_array
+        self.flags = flags
+        self.refresh_rate = refresh_rate
 
-    flags.init_done = False
-    flags.game_over = NUM_ROBOTS-1
-    flags.winner=b' '
+    # Coluna, linha, energia e status do robô (x é a linha e y a coluna no robot_v2)
+    def robo(self, i):
+        robot = self.robots_array[i]
+        return robot.y, robot.x, robot.energy, robot.status
 
-    # Grid na memória compartilhada
-    gridShared = multiprocessing.RawArray(ctypes.c_char, GRID_WIDTH * GRID_HEIGHT)
+    def fim(self):
+        return self.flags.init_done and self.flags.game_over <= 0
+
+    def run(self):
+        executa_curses(self.grid, self.regioes, GRID_WIDTH, GRID_HEIGHT, ROBOT_IDS, self.robo, self.fim,
+                       1 / self.refresh_rate)
 
-    # Memória compartilhada para o array de robôs
-    robots_array = multiprocessing.RawArray(RobotStruct, NUM_ROBOTS)
+"""
+Roda uma partida. Com viewer=False a partida roda sem exibição (usado pelos
+benchmarks) e com viewer="curses" ela é exibida numa janela rolável; com
+`limite` (segundos) a partida é encerrada se não acabar antes. Com
+`segmentos`, o grid, a tabela de robôs e as flags ficam em arquivos
+mapeados com esse nome (ver segmentos.py), com checkpoint a cada
+`checkpoint_a_cada` ticks ou quando pedido; com `retomar`, a partida continua
+do último checkpoint em vez de ser inicializada. Retorna as métricas da
+partida em um dicionário.
+"""
+def main(intervalo=TICK_INTERVAL, viewer=True, limite=None, segmentos=None, retomar=False, checkpoint_a_cada=0):
+    if segmentos:
+        # Grid, robôs e flags em arquivos mapeados, herdados pelos processos
+        segmentos = Segmentos(segmentos, grid=celulas.c_celula * (GRID_WIDTH * GRID_HEIGHT),
+                              robos=RobotStruct * NUM_ROBOTS, flags=Flags)
+        flags = segmentos.flags
+        gridShared = segmentos.grid
+        robots_array = segmentos.robos
+    else:
+        # Flags, grid e array de robôs na memória compartilhada anônima
+        flags = multiprocessing.RawValue(Flags)
+        gridShared = multiprocessing.RawArray(celulas.c_celula, GRID_WIDTH * GRID_HEIGHT)
+        robots_array = multiprocessing.RawArray(RobotStruct, NUM_ROBOTS)
     robos = []
 
-    # Criação dos mutexes
-    grid_mutex = multiprocessing.Lock()
-    robots_mutex = multiprocessing.Lock()
-    flags_mutex = multiprocessing.Lock()
+    tick_inicial = 0
+    if retomar:
+        tick_inicial = segmentos.retoma()
+    else:
+        flags.init_done = False
+        flags.game_over = NUM_ROBOTS-1
+        flags.winner = SEM_VENCEDOR
+
+    # Criação dos mutexes (instrumentados com ARENA_LOCK_STATS=1, ver travas.py)
+    estatisticas = travas.EstatisticasLocks(["grid", "robots_mutex", "flags_mutex"], NUM_ROBOTS) if LOCK_STATS else None
+    regioes = Regioes(GRID_WIDTH, GRID_HEIGHT, REGION_HEIGHT, estatisticas)
+    robots_mutex = travas.cria_lock(estatisticas, "robots_mutex")
+    flags_mutex = travas.cria_lock(estatisticas, "flags_mutex")
+
+    # Tempo de cada robô por fase do tick, impresso no fim (ver perfil.py)
+    fases = perfil.EstatisticasFases(ROBOT_IDS, NUM_ROBOTS) if PHASE_STATS else None
+    if CPROFILE:
+        perfil.limpa_perfis()
+
+    # Processo escritor do log
+    fila_log = multiprocessing.Queue()
+    escritor_log = multiprocessing.Process(target=logger_process, args=(fila_log,))
+    escritor_log.start()
+    # Conectado antes dos forks: o processo do escalonador herda a conexão
+    logger.conecta(fila_log)
+
+    # Campos de distância até as baterias (preenchidos pelo robô que inicializa o grid)
+    caminhos = Caminhos(GRID_WIDTH, GRID_HEIGHT, NUM_BATTERIES)
+
+    # Conjunto de células livres, mantido pelos movimentos e mortes
+    livres = CelulasLivres(regioes)
+
+    # Partida retomada: o grid já está pronto, só as estruturas derivadas
+    # dele são refeitas, e só os robôs vivos voltam a ter processo
+    participantes = range(NUM_ROBOTS)
+    if retomar:
+        with regioes.trava_tudo():
+            livres.enche(gridShared)
+        caminhos.constroi(gridShared)
+        participantes = [i for i in range(NUM_ROBOTS) if robots_array[i].status]
+        logger.log("arena", f"Partida retomada do checkpoint do tick {tick_inicial} ({len(participantes)} robôs vivos).")
+
+    # Escalonador de ticks em lockstep, com o checkpoint entre dois ticks
+    escalonador = Escalonador(len(participantes))
+    escalonador.tick.value = tick_inicial
+    ao_fim_do_tick = None
+    if segmentos:
+        ao_fim_do_tick = functools.partial(checkpoint_fim_do_tick, segmentos, regioes, robots_mutex, flags_mutex,
+                                           checkpoint_a_cada)
+    proc_escalonador = multiprocessing.Process(target=escalonador.executa, args=(intervalo, ao_fim_do_tick))
+    proc_escalonador.start()
+
+    # Manutenção periódica (desgaste, baterias, resumo e log), acordada pelos ticks
+    manutencao = HousekeepingProcess(gridShared, robots_array, flags, regioes, robots_mutex, flags_mutex, fila_log, escalonador, caminhos, livres)
+    manutencao.start()
 
     # Cria os processos para os robôs
-    for i in range(NUM_ROBOTS):
-        robot_process = RobotProcess(i, gridShared, robots_array, flags, grid_mutex, robots_mutex, flags_mutex)
+    inicio = time.perf_counter()
+    for i in participantes:
+        robot_process = RobotProcess(i, gridShared, robots_array, flags, regioes, robots_mutex, flags_mutex, fila_log, escalonador, caminhos, livres, fases)
         robot_process.start()
         robos.append(robot_process)
 
     # Cria o processo viewer
-    viewer = ViewerProcess(gridShared, robots_array, flags)
-    viewer.start()
+    if viewer:
+        if viewer == "curses":
+            proc_viewer = CursesViewerProcess(gridShared, robots_array, flags, regioes)
+        else:
+            proc_viewer = ViewerProcess(gridShared, robots_array, flags, regioes)
+        proc_viewer.start()
 
     # Aguarda o término dos processos dos robôs
+    encerrada = False
     for r in range(len(robos)):
-        robos[r].join()
+        restante = None if limite is None else max(0.0, inicio + limite - time.perf_counter())
+        robos[r].join(restante)
+        if robos[r].is_alive():
+            # Tempo esgotado: encerra a partida e espera os robôs saírem
+            encerrada = True
+            flags.game_over = 0
+            escalonador.encerra()
+            robos[r].join()
+    duracao = time.perf_counter() - inicio
 
     # Depois que robôs terminam, sinaliza fim pro viewer
     flags.game_over = 0
+    escalonador.encerra()
+    proc_escalonador.join()
+    manutencao.join()
+
+    # O escritor grava o que falta no log e termina
+    fila_log.put(None)
+    escritor_log.join()
 
     # Espera o viewer terminar
-    viewer.join()
+    if viewer:
+        proc_viewer.join()
 
     print("Jogo finalizado.")
+    if estatisticas:
+        travas.imprime(estatisticas, ROBOT_IDS)
+        estatisticas.fecha()
+    if fases:
+        perfil.imprime(fases, por_robo=NUM_ROBOTS <= 26)
+    if CPROFILE:
+        perfil.junta_perfis()
+
+    vencedor = None
+    if not encerrada and flags.winner >= 0:
+        vencedor = ROBOT_IDS[flags.winner]
+    movimentos = sum(robots_array[i].moves for i in range(NUM_ROBOTS))
+    contencoes, espera = regioes.estatisticas()
+    return {
+        'duracao': duracao,
+        'ticks': escalonador.tick.value - tick_inicial,
+        'movimentos': movimentos,
+        'movimentos_s': movimentos / duracao,
+        'ticks_s': (escalonador.tick.value - tick_inicial) / duracao,
+        'contencoes_lock': contencoes,
+        'espera_lock_s': espera,
+        'vencedor': vencedor,
+        'tempo_vencedor': duracao if vencedor else None,
+        'encerrada_por_limite': encerrada,
+        'cpu_robos': [robots_array[i].cpu for i in range(NUM_ROBOTS)],
+    }
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Arena dos Robôs (versão 2)")
+    parser.add_argument("--max-speed", action="store_true",
+                        help="roda os ticks sem espera, o mais rápido possível")
+    parser.add_argument("--sem-viewer", action="store_true",
+                        help="roda sem exibir a arena")
+    parser.add_argument("--curses", action="store_true",
+                        help="exibe só uma janela rolável da arena (para arenas maiores que o terminal)")
+    parser.add_argument("--limite", type=float, default=None,
+                        help="encerra a partida depois de LIMITE segundos")
+    parser.add_argument("--segmentos", metavar="NOME",
+                        help="grid, robôs e flags em arquivos mapeados NOME.* (ver segmentos.py)")
+    parser.add_argument("--checkpoint-a-cada", type=int, default=0, metavar="TICKS",
+                        help="grava NOME.checkpoint a cada TICKS ticks (com --segmentos)")
+    parser.add_argument("--retoma", action="store_true",
+                        help="continua a partida de NOME.checkpoint (com --segmentos)")
+    args = parser.parse_args()
+    if (args.retoma or args.checkpoint_a_cada) and not args.segmentos:
+        parser.error("--retoma e --checkpoint-a-cada precisam de --segmentos")
+
+    viewer = False if args.sem_viewer else ("curses" if args.curses else True)
+    main(0 if args.max_speed else TICK_INTERVAL, viewer, args.limite,
+         args.segmentos, args.retoma, args.checkpoint_a_cada)
\ No newline at end of file
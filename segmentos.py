@@ -0,0 +1,181 @@
+"""
+Segmentos nomeados do estado da partida em arquivos mapeados (mmap).
+
+Cada segmento (grid, tabela de robôs, flags) é um arquivo <nome>.<segmento>
+mapeado com MAP_SHARED: os processos criados depois do mapeamento (fork)
+enxergam a mesma memória, como num RawArray, mas o estado fica num arquivo
+com nome e sobrevive ao fim do processo principal.
+
+O arquivo vivo muda a todo instante e não serve para recomeçar depois de uma
+falha. Um checkpoint copia todos os segmentos de uma vez (quem chama trava
+o que for preciso para a cópia ser consistente) e grava a cópia em
+<nome>.checkpoint: arquivo temporário, fsync e rename atômico, então o
+checkpoint anterior só é substituído por um completo. Retomar é copiar o
+checkpoint de volta nos segmentos antes de criar os processos, sem passar
+pela inicialização da partida.
+
+Um checkpoint pode ser pedido de fora pelo segmento de controle
+(<nome>.controle), que a partida consulta a cada tick:
+
+    python3 robot_v2.py --segmentos partida --checkpoint-a-cada 500
+    python3 segmentos.py checkpoint partida
+    python3 segmentos.py info partida
+    python3 robot_v2.py --segmentos partida --retoma
+"""
+
+import argparse
+import ctypes
+import mmap
+import os
+import struct
+import sys
+import time
+
+ASSINATURA = b'ARENACKP'
+CABECALHO = struct.Struct('<8sqdI')         # assinatura, tick, instante, número de segmentos
+SEGMENTO = struct.Struct('<16sQ')           # nome, tamanho
+
+# Pedidos de checkpoint vindos de outro processo (python3 segmentos.py checkpoint)
+class Controle(ctypes.Structure):
+    _fields_ = [
+        ("pedidos", ctypes.c_uint),
+        ("atendidos", ctypes.c_uint),
+        ("tick", ctypes.c_long),        # Tick do último checkpoint gravado
+    ]
+
+# Mapeia o arquivo `caminho` com o tamanho de `tipo`; zera o conteúdo se `limpa`
+def _mapeia(caminho, tipo, limpa=True):
+    tamanho = ctypes.sizeof(tipo)
+    fd = os.open(caminho, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if limpa:
+            os.ftruncate(fd, 0)
+        os.ftruncate(fd, tamanho)
+        mapa = mmap.mmap(fd, tamanho)
+    finally:
+        os.close(fd)
+    return mapa, tipo.from_buffer(mapa)
+
+"""
+Conjunto de segmentos de uma partida. `tipos` leva o nome de cada segmento
+ao seu tipo ctypes; o objeto de cada um fica num atributo de mesmo nome.
+Os mapeamentos nunca são fechados: os objetos ctypes apontam para eles até
+o processo terminar.
+"""
+class Segmentos():
+    def __init__(self, nome, **tipos):
+        self.nome = nome
+        self.mapas = {}
+        for segmento, tipo in tipos.items():
+            self.mapas[segmento], objeto = _mapeia(f"{nome}.{segmento}", tipo)
+            setattr(self, segmento, objeto)
+        self._mapa_controle, self.controle = _mapeia(f"{nome}.controle", Controle)
+
+    @property
+    def arquivo_checkpoint(self):
+        return self.nome + ".checkpoint"
+
+    # Há pedido de checkpoint ainda não atendido?
+    def pedido(self):
+        return self.controle.pedidos != self.controle.atendidos
+
+    # Cópia de todos os segmentos; chamada com o estado parado (locks do chamador)
+    def copia(self):
+        return {segmento: bytes(mapa) for segmento, mapa in self.mapas.items()}
+
+    # Grava a cópia como checkpoint do fim de `tick`: temporário, fsync e rename
+    def grava_checkpoint(self, tick, copia):
+        temporario = self.arquivo_checkpoint + ".tmp"
+        with open(temporario, "wb") as f:
+            f.write(CABECALHO.pack(ASSINATURA, tick, time.time(), len(copia)))
+            for segmento, dados in copia.items():
+                f.write(SEGMENTO.pack(segmento.encode(), len(dados)))
+                f.write(dados)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporario, self.arquivo_checkpoint)
+
+        # O rename só é durável depois do fsync do diretório
+        diretorio = os.open(os.path.dirname(os.path.abspath(self.arquivo_checkpoint)), os.O_RDONLY)
+        try:
+            os.fsync(diretorio)
+        finally:
+            os.close(diretorio)
+
+        self.controle.tick = tick
+        self.controle.atendidos = self.controle.pedidos
+
+    def retoma(self):
+        """
+        Copia o checkpoint de volta nos segmentos. Retorna o tick em que ele
+        foi gravado. Levanta ValueError se o checkpoint não é da arena ou se
+        os tamanhos não batem com os segmentos atuais (ex.: outras
+        dimensões do grid ou outro número de robôs).
+        """
+        tick, _, segmentos = le_checkpoint(self.arquivo_checkpoint)
+        if set(segmentos) != set(self.mapas):
+            raise ValueError(f"checkpoint com segmentos {sorted(segmentos)}, esperados {sorted(self.mapas)}")
+        for segmento, dados in segmentos.items():
+            if len(dados) != len(self.mapas[segmento]):
+                raise ValueError(f"segmento '{segmento}' com {len(dados)} bytes no checkpoint, "
+                                 f"{len(self.mapas[segmento])} na partida")
+        for segmento, dados in segmentos.items():
+            self.mapas[segmento][:] = dados
+        self.controle.tick = tick
+        return tick
+
+# Lê um checkpoint: (tick, instante, {segmento: bytes})
+def le_checkpoint(caminho):
+    with open(caminho, "rb") as f:
+        dados = f.read()
+    assinatura, tick, instante, num_segmentos = CABECALHO.unpack_from(dados)
+    if assinatura != ASSINATURA:
+        raise ValueError(f"'{caminho}' não é um checkpoint da arena")
+    segmentos = {}
+    pos = CABECALHO.size
+    for _ in range(num_segmentos):
+        nome, tamanho = SEGMENTO.unpack_from(dados, pos)
+        pos += SEGMENTO.size
+        segmentos[nome.rstrip(b'\0').decode()] = dados[pos:pos + tamanho]
+        pos += tamanho
+    return tick, instante, segmentos
+
+# Pede um checkpoint à partida `nome` em andamento e espera ele ser gravado
+def pede_checkpoint(nome, espera=10.0):
+    mapa, controle = _mapeia(nome + ".controle", Controle, limpa=False)
+    controle.pedidos += 1
+    pedido = controle.pedidos
+    limite = time.monotonic() + espera
+    try:
+        while controle.atendidos != pedido:
+            if time.monotonic() > limite:
+                return None
+            time.sleep(0.01)
+        return controle.tick
+    finally:
+        del controle
+        mapa.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Checkpoints dos segmentos de uma partida (robot_v2.py --segmentos)")
+    parser.add_argument("comando", choices=["checkpoint", "info"])
+    parser.add_argument("nome", help="nome dos segmentos da partida")
+    parser.add_argument("--espera", type=float, default=10.0,
+                        help="segundos esperando a partida gravar o checkpoint")
+    args = parser.parse_args()
+
+    if args.comando == "checkpoint":
+        if not os.path.exists(args.nome + ".controle"):
+            sys.exit(f"nenhuma partida com segmentos '{args.nome}'")
+        tick = pede_checkpoint(args.nome, args.espera)
+        if tick is None:
+            sys.exit("a partida não atendeu o pedido (parada ou já encerrada?)")
+        print(f"checkpoint do tick {tick} gravado em {args.nome}.checkpoint")
+    else:
+        tick, instante, segmentos = le_checkpoint(args.nome + ".checkpoint")
+        print(f"tick {tick}, gravado em {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(instante))}")
+        for segmento, dados in segmentos.items():
+            print(f"  {segmento:<10} {len(dados):>10} bytes")
+
+if __name__ == "__main__":
+    main()
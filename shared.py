@@ -0,0 +1,21 @@
+from ctypes import Structure, c_bool, c_double, c_int, c_long
+from constants import NUM_ROBOTS
+
+# Registro de status de um robô na memória compartilhada
+class RobotStats(Structure):
+    _fields_ = [
+        ("energia", c_int),
+        ("forca", c_int),
+        ("movimentos", c_long),         # Escrito só pelo próprio robô
+        ("cpu", c_double),              # Tempo de CPU gasto nos passos do robô
+    ]
+
+# Bloco de estado do jogo: cabeçalho + um registro por robô (indexado pelo id).
+# Leituras são acessos diretos à memória; escritas que envolvem mais de um
+# campo (energia + vivos, batalhas) são feitas com o flags_mutex adquirido.
+class Flags(Structure):
+    _fields_ = [
+        ("game_over", c_bool),
+        ("vivos", c_int),               # Robôs com energia > 0
+        ("robos", RobotStats * NUM_ROBOTS),
+    ]
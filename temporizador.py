@@ -0,0 +1,90 @@
+"""
+Roda de temporizadores hierárquica (hierarchical timer wheel).
+
+Agenda ações para daqui a N ticks, uma vez ou periodicamente, com custo O(1)
+para agendar, cancelar e avançar um tick, independente de quantos
+temporizadores existem. Cada nível tem 2^bits posições: o nível 0 guarda os
+temporizadores que vencem nos próximos 2^bits ticks, uma posição por tick; o
+nível 1 guarda os que vencem nos próximos 2^(2*bits) ticks, uma posição por
+bloco de 2^bits ticks, e assim por diante. Quando o tick atual entra num
+bloco novo, a posição correspondente do nível de cima é redistribuída nos
+níveis de baixo (cascata). Temporizadores além do último nível ficam numa
+lista à parte, revista a cada volta completa da roda.
+
+A roda não dorme nem mede tempo: quem a usa chama avanca(tick) quando o tick
+muda (ex.: a manutenção do robot_v2.py, acordada pelo escalonador).
+"""
+
+class Temporizador():
+    __slots__ = ('expira', 'acao', 'periodo', 'cancelado')
+
+    def __init__(self, expira, acao, periodo):
+        self.expira = expira
+        self.acao = acao
+        self.periodo = periodo
+        self.cancelado = False
+
+class RodaTemporizadora():
+    def __init__(self, bits=6, niveis=3, agora=0):
+        self.bits = bits
+        self.mascara = (1 << bits) - 1
+        self.niveis = [[[] for _ in range(1 << bits)] for _ in range(niveis)]
+        self.distantes = []
+        self.agora = agora
+
+    # Agenda `acao(tick)` para daqui a `atraso` ticks; com `periodo`, repete
+    def agenda(self, atraso, acao, periodo=0):
+        t = Temporizador(self.agora + max(1, atraso), acao, periodo)
+        self._insere(t)
+        return t
+
+    # Cancelamento preguiçoso: o temporizador é descartado quando vencer
+    def cancela(self, t):
+        t.cancelado = True
+
+    def _insere(self, t):
+        atraso = t.expira - self.agora
+        for nivel, posicoes in enumerate(self.niveis):
+            if atraso < 1 << (self.bits * (nivel + 1)):
+                posicoes[(t.expira >> (self.bits * nivel)) & self.mascara].append(t)
+                return
+        self.distantes.append(t)
+
+    # Redistribui a posição do `nivel` correspondente ao bloco que começa agora
+    def _cascata(self, nivel):
+        posicoes = self.niveis[nivel]
+        i = (self.agora >> (self.bits * nivel)) & self.mascara
+        pendentes, posicoes[i] = posicoes[i], []
+        for t in pendentes:
+            if not t.cancelado:
+                self._insere(t)
+
+    def _avanca_um(self):
+        self.agora += 1
+
+        if self.agora & ((1 << (self.bits * len(self.niveis))) - 1) == 0:
+            pendentes, self.distantes = self.distantes, []
+            for t in pendentes:
+                if not t.cancelado:
+                    self._insere(t)
+        # Do nível mais alto para o mais baixo: o que desce de um nível pode
+        # cair justo na posição do bloco atual do nível de baixo
+        for nivel in range(len(self.niveis) - 1, 0, -1):
+            if self.agora & ((1 << (self.bits * nivel)) - 1) == 0:
+                self._cascata(nivel)
+
+        posicoes = self.niveis[0]
+        i = self.agora & self.mascara
+        vencidos, posicoes[i] = posicoes[i], []
+        for t in vencidos:
+            if t.cancelado:
+                continue
+            t.acao(self.agora)
+            if t.periodo and not t.cancelado:
+                t.expira = self.agora + t.periodo
+                self._insere(t)
+
+    # Avança até `tick`, executando os temporizadores vencidos, em ordem
+    def avanca(self, tick):
+        while self.agora < tick:
+            self._avanca_um()
@@ -0,0 +1,154 @@
+"""
+Torneio: milhares de partidas com semente, em paralelo em todos os núcleos.
+
+Cada tarefa do pool de processos é um bloco de partidas simuladas pelo motor
+vetorizado (motor_numpy.py: as decisões de robot.py, com os campos de
+distância até as baterias, e a resolução do árbitro, sem sleeps, viewer nem
+log), com a semente (semente do torneio, número do bloco). Assim o resultado de um
+bloco não depende do processo que o executou nem da ordem em que os blocos
+terminam. Cada processo devolve só contagens agregadas, que o processo
+principal soma à medida que os blocos chegam; no fim são mostradas as taxas
+de vitória por força, por velocidade e pela região onde o robô nasceu.
+
+    python3 torneio.py --partidas 10000
+    python3 torneio.py --partidas 10000 --velocidade-max 5 --saida torneio.json
+"""
+
+import argparse
+import json
+import multiprocessing as mp
+import os
+import sys
+import time
+import numpy as np
+from constants import GRID_WIDTH, GRID_HEIGHT, NUM_ROBOTS, NUM_BATTERIES, NUM_BARRIERS
+from motor_numpy import MotorVetorizado
+
+# Regiões de nascimento: o grid dividido em 3x3
+REGIOES = ("noroeste", "norte", "nordeste", "oeste", "centro", "leste", "sudoeste", "sul", "sudeste")
+
+def _regiao(x, y, largura, altura):
+    return (3 * y // altura) * 3 + 3 * x // largura
+
+# Partidas e vitórias de cada valor de um atributo dos robôs
+def _conta(valores, vencedores, minimo):
+    return {
+        'partidas': np.bincount(valores.ravel(), minlength=minimo).tolist(),
+        'vitorias': np.bincount(vencedores, minlength=minimo).tolist(),
+    }
+
+# Tarefa do pool: simula um bloco de partidas e devolve as contagens
+def _bloco(args):
+    semente, bloco, partidas, config = args
+    motor = MotorVetorizado(partidas, (semente, bloco), config['largura'], config['altura'],
+                            config['robos'], config['baterias'], config['barreiras'],
+                            config['velocidade_max'], config['campos'])
+    # Atributos de nascimento, antes de as partidas saírem dos arrays de trabalho
+    forca = motor.forca.copy()
+    velocidade = motor.velocidade.copy()
+    regiao = _regiao(motor.x, motor.y, motor.W, motor.H)
+
+    vencedor, ticks = motor.executa(config['max_ticks'])
+    com_vencedor = np.nonzero(vencedor >= 0)[0]
+    v = vencedor[com_vencedor]
+
+    return {
+        'partidas': partidas,
+        'sem_vencedor': int((vencedor < 0).sum()),
+        'travadas': int(motor.travada.sum()),
+        'no_limite': int(motor.no_limite.sum()),
+        'ticks': int(ticks.sum()),
+        'passos_robo': motor.passos_robo,
+        'forca': _conta(forca, forca[com_vencedor, v], 16),
+        'velocidade': _conta(velocidade, velocidade[com_vencedor, v], config['velocidade_max'] + 1),
+        'regiao': _conta(regiao, regiao[com_vencedor, v], len(REGIOES)),
+    }
+
+def _soma(total, parcial):
+    if total is None:
+        return parcial
+    for chave, valor in parcial.items():
+        if isinstance(valor, dict):
+            for campo in valor:
+                total[chave][campo] = [a + b for a, b in zip(total[chave][campo], valor[campo])]
+        else:
+            total[chave] += valor
+    return total
+
+def torneio(partidas, semente, processos=None, tamanho_bloco=500, progresso=None, **config):
+    """
+    Roda `partidas` partidas em blocos de `tamanho_bloco` num pool com
+    `processos` processos (padrão: um por núcleo). `progresso(feitas,
+    total)` é chamado a cada bloco concluído. Retorna as contagens somadas.
+    """
+    tarefas = [(semente, b, min(tamanho_bloco, partidas - inicio), config)
+               for b, inicio in enumerate(range(0, partidas, tamanho_bloco))]
+    total = None
+    with mp.Pool(processos) as pool:
+        for parcial in pool.imap_unordered(_bloco, tarefas):
+            total = _soma(total, parcial)
+            if progresso:
+                progresso(total['partidas'], partidas)
+    return total
+
+def _taxas(contagem, rotulos):
+    linhas = []
+    for valor, (n, v) in enumerate(zip(contagem['partidas'], contagem['vitorias'])):
+        if n:
+            linhas.append((rotulos(valor), n, v, v / n))
+    return linhas
+
+def imprime(total, num_robos):
+    n = total['partidas']
+    print(f"{n} partidas, {total['ticks'] / n:.1f} ticks por partida em média")
+    print(f"  sem vencedor: {total['sem_vencedor']} ({total['travadas']} travadas, {total['no_limite']} no limite de ticks)")
+    print(f"  taxa de vitória esperada ao acaso: {1 / num_robos:.1%}")
+    for titulo, chave, rotulos in (("força", 'forca', str), ("velocidade", 'velocidade', str),
+                                   ("região de nascimento", 'regiao', REGIOES.__getitem__)):
+        print(f"\n{titulo:<22} {'robôs':>10} {'vitórias':>10} {'taxa':>8}")
+        for rotulo, robos, vitorias, taxa in _taxas(total[chave], rotulos):
+            print(f"{rotulo:<22} {robos:>10} {vitorias:>10} {taxa:>8.1%}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Torneio de partidas headless em paralelo")
+    parser.add_argument("--partidas", type=int, default=10000)
+    parser.add_argument("--semente", type=int, default=None, help="semente do torneio (padrão: sorteada e exibida)")
+    parser.add_argument("--processos", type=int, default=None, help="padrão: um por núcleo")
+    parser.add_argument("--bloco", type=int, default=500, help="partidas por tarefa do pool")
+    parser.add_argument("--max-ticks", type=int, default=2000)
+    parser.add_argument("--robos", type=int, default=NUM_ROBOTS)
+    parser.add_argument("--largura", type=int, default=GRID_WIDTH)
+    parser.add_argument("--altura", type=int, default=GRID_HEIGHT)
+    parser.add_argument("--baterias", type=int, default=NUM_BATTERIES)
+    parser.add_argument("--barreiras", type=int, default=NUM_BARRIERS)
+    parser.add_argument("--velocidade-max", type=int, default=1,
+                        help="velocidades sorteadas entre 1 e este valor (1 = regras de robot.py)")
+    parser.add_argument("--sem-campos", action="store_true",
+                        help="só o passo preferencial, sem os campos de distância (mais rápido, mais partidas travadas)")
+    parser.add_argument("--saida", help="arquivo JSON com as contagens")
+    args = parser.parse_args()
+
+    semente = args.semente
+    if semente is None:
+        semente = int(np.random.SeedSequence().entropy % 2**32)
+    print(f"semente {semente}, {args.processos or os.cpu_count()} processos", file=sys.stderr)
+
+    def progresso(feitas, total):
+        print(f"\r{feitas}/{total} partidas", end="", file=sys.stderr, flush=True)
+
+    inicio = time.perf_counter()
+    total = torneio(args.partidas, semente, args.processos, args.bloco, progresso,
+                    largura=args.largura, altura=args.altura, robos=args.robos,
+                    baterias=args.baterias, barreiras=args.barreiras,
+                    velocidade_max=args.velocidade_max, campos=not args.sem_campos, max_ticks=args.max_ticks)
+    duracao = time.perf_counter() - inicio
+    print(f" em {duracao:.1f}s ({total['passos_robo'] / duracao:,.0f} passos de robô/s)", file=sys.stderr)
+
+    imprime(total, args.robos)
+
+    if args.saida:
+        with open(args.saida, "w") as f:
+            json.dump({'semente': semente, 'argumentos': vars(args), 'duracao': duracao, **total}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
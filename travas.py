@@ -0,0 +1,259 @@
+"""
+Locks instrumentados e área de estatísticas de contenção.
+
+Uma TravaInstrumentada envolve um multiprocessing.Lock e registra, para cada
+aquisição, o tempo esperando pelo lock e o tempo com ele adquirido, em
+histogramas log2 (balde i = [2^i, 2^(i+1)) ns) por lock e por robô. Os
+histogramas ficam numa área de memória compartilhada com nome, então o CLI
+deste módulo consegue ler os percentis ao vivo, de outro terminal:
+
+    ARENA_LOCK_STATS=1 python3 main.py
+    python3 travas.py                 # em outro terminal
+    python3 travas.py --por-robo
+
+Os contadores de um lock só são alterados por quem o detém (a espera é
+registrada logo depois de adquirir e a posse logo antes de liberar), então
+não precisam de outra sincronização. Vários locks físicos podem compartilhar
+o mesmo nome lógico (ex.: os locks das faixas do grid, somados em "grid");
+nesse caso a linha de cada robô continua tendo um único escritor, e só a
+linha "outros" (viewer, inicialização) pode perder alguma contagem.
+"""
+
+import argparse
+import ctypes
+import multiprocessing as mp
+import sys
+import time
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+
+AREA_PADRAO = "arena_locks"
+ASSINATURA = 0x41524E4C4F434B53     # "ARNLOCKS"
+NUM_BALDES = 40                     # Até 2^40 ns (~18 min)
+TAMANHO_NOME = 32
+
+ESPERA = 0
+POSSE = 1
+TIPOS = ("espera", "posse")
+
+# Cada série: NUM_BALDES baldes + quantidade + soma dos tempos em ns
+CONTAGEM = NUM_BALDES
+SOMA = NUM_BALDES + 1
+TAMANHO_SERIE = NUM_BALDES + 2
+
+# Robô do processo atual (linha dos histogramas); None = "outros"
+_robo = None
+
+def define_robo(robot_id_index):
+    global _robo
+    _robo = robot_id_index
+
+"""
+Área compartilhada: cabeçalho (assinatura, número de locks, de linhas e de
+baldes), nomes dos locks e as séries [lock][linha][tipo]. A linha num_robos
+é a dos processos que não são robôs. Com criar=False, abre uma área já
+existente pelo nome (usado pelo CLI).
+"""
+class EstatisticasLocks():
+    def __init__(self, nomes_locks=(), num_robos=0, nome=AREA_PADRAO, criar=True):
+        self.nome = nome
+        self.criar = criar
+        if criar:
+            self.nomes = list(nomes_locks)
+            self.num_linhas = num_robos + 1
+            tamanho = 4 * 8 + len(self.nomes) * TAMANHO_NOME + self._num_valores() * 8
+            try:
+                SharedMemory(name=nome).unlink()    # Sobra de uma execução interrompida
+            except FileNotFoundError:
+                pass
+            self.shm = SharedMemory(name=nome, create=True, size=tamanho)
+            cabecalho = (ctypes.c_uint64 * 4).from_buffer(self.shm.buf)
+            cabecalho[:] = [ASSINATURA, len(self.nomes), self.num_linhas, NUM_BALDES]
+            del cabecalho
+            for i, n in enumerate(self.nomes):
+                inicio = 32 + i * TAMANHO_NOME
+                self.shm.buf[inicio:inicio + TAMANHO_NOME] = n.encode()[:TAMANHO_NOME].ljust(TAMANHO_NOME, b'\0')
+        else:
+            self._anexa()
+        self._mapeia()
+
+    def _num_valores(self):
+        return len(self.nomes) * self.num_linhas * 2 * TAMANHO_SERIE
+
+    def _anexa(self):
+        self.shm = SharedMemory(name=self.nome)
+        # Só o criador remove a área; o leitor não deve apagá-la ao sair
+        resource_tracker.unregister(self.shm._name, "shared_memory")
+        assinatura, num_locks, self.num_linhas, baldes = (ctypes.c_uint64 * 4).from_buffer_copy(self.shm.buf[:32])
+        if assinatura != ASSINATURA or baldes != NUM_BALDES:
+            raise ValueError(f"área '{self.nome}' não contém estatísticas de locks")
+        self.nomes = [bytes(self.shm.buf[32 + i * TAMANHO_NOME:32 + (i + 1) * TAMANHO_NOME]).rstrip(b'\0').decode()
+                      for i in range(num_locks)]
+
+    def _mapeia(self):
+        inicio = 32 + len(self.nomes) * TAMANHO_NOME
+        self.valores = (ctypes.c_uint64 * self._num_valores()).from_buffer(self.shm.buf, inicio)
+
+    # Os processos filhos reabrem a área pelo nome
+    def __getstate__(self):
+        return {'nome': self.nome}
+
+    def __setstate__(self, estado):
+        self.nome = estado['nome']
+        self.criar = False
+        self._anexa()
+        self._mapeia()
+
+    def indice_lock(self, nome):
+        return self.nomes.index(nome)
+
+    def _base(self, lock, linha, tipo):
+        return ((lock * self.num_linhas + linha) * 2 + tipo) * TAMANHO_SERIE
+
+    def registra(self, lock, tipo, ns):
+        linha = self.num_linhas - 1 if _robo is None else _robo
+        base = self._base(lock, linha, tipo)
+        self.valores[base + min(max(ns, 1).bit_length() - 1, NUM_BALDES - 1)] += 1
+        self.valores[base + CONTAGEM] += 1
+        self.valores[base + SOMA] += ns
+
+    # Série (baldes, quantidade, soma) de um lock, somando as linhas pedidas
+    def serie(self, lock, tipo, linhas=None):
+        total = [0] * TAMANHO_SERIE
+        for linha in (range(self.num_linhas) if linhas is None else linhas):
+            base = self._base(lock, linha, tipo)
+            for i, v in enumerate(self.valores[base:base + TAMANHO_SERIE]):
+                total[i] += v
+        return total
+
+    def fecha(self):
+        del self.valores
+        self.shm.close()
+        if self.criar:
+            self.shm.unlink()
+
+class TravaInstrumentada():
+    def __init__(self, estatisticas, nome):
+        self.lock = mp.Lock()
+        self.estatisticas = estatisticas
+        self.indice = estatisticas.indice_lock(nome)
+        self._adquirido_em = 0
+
+    def acquire(self, block=True, timeout=None):
+        inicio = time.perf_counter_ns()
+        if timeout is None:
+            ok = self.lock.acquire(block)
+        else:
+            ok = self.lock.acquire(block, timeout)
+        if ok:
+            self._adquirido_em = time.perf_counter_ns()
+            self.estatisticas.registra(self.indice, ESPERA, self._adquirido_em - inicio)
+        return ok
+
+    def release(self):
+        self.estatisticas.registra(self.indice, POSSE, time.perf_counter_ns() - self._adquirido_em)
+        self.lock.release()
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, *args):
+        self.release()
+
+# Lock que nunca espera, para estruturas de um processo e uma thread só
+# (motor assíncrono): mesma interface de mp.Lock, sem custo de sistema
+class TravaNula():
+    def acquire(self, block=True, timeout=None):
+        return True
+
+    def release(self):
+        pass
+
+    def __enter__(self):
+        return True
+
+    def __exit__(self, *args):
+        pass
+
+# Lock comum, ou instrumentado quando há área de estatísticas; sem
+# compartilhar entre processos, uma TravaNula
+def cria_lock(estatisticas, nome, compartilhada=True):
+    if not compartilhada:
+        return TravaNula()
+    if estatisticas is None:
+        return mp.Lock()
+    return TravaInstrumentada(estatisticas, nome)
+
+# Valor (limite superior do balde, em ns) abaixo do qual está a fração p
+def percentil(serie, p):
+    quantidade = serie[CONTAGEM]
+    if quantidade == 0:
+        return 0
+    alvo = p * quantidade
+    acumulado = 0
+    for i in range(NUM_BALDES):
+        acumulado += serie[i]
+        if acumulado >= alvo:
+            return 2 ** (i + 1)
+    return 2 ** NUM_BALDES
+
+def formata_ns(ns):
+    if ns < 1e3:
+        return f"{ns:.0f}ns"
+    if ns < 1e6:
+        return f"{ns / 1e3:.1f}µs"
+    if ns < 1e9:
+        return f"{ns / 1e6:.1f}ms"
+    return f"{ns / 1e9:.2f}s"
+
+def imprime(estatisticas, nomes_robos=None, por_robo=False):
+    print(f"{'lock':<14} {'robô':<6} {'tipo':<7} {'qtd':>9} {'média':>9} {'p50':>9} {'p90':>9} {'p99':>9} {'total':>9}")
+    for lock, nome in enumerate(estatisticas.nomes):
+        linhas = [None]
+        if por_robo:
+            linhas += list(range(estatisticas.num_linhas))
+        for linha in linhas:
+            if linha is None:
+                rotulo = "todos"
+            elif linha == estatisticas.num_linhas - 1:
+                rotulo = "outros"
+            else:
+                rotulo = nomes_robos[linha] if nomes_robos and linha < len(nomes_robos) else f"R{linha}"
+            for tipo in (ESPERA, POSSE):
+                serie = estatisticas.serie(lock, tipo, None if linha is None else [linha])
+                if serie[CONTAGEM] == 0:
+                    continue
+                print(f"{nome:<14} {rotulo:<6} {TIPOS[tipo]:<7} {serie[CONTAGEM]:>9} "
+                      f"{formata_ns(serie[SOMA] / serie[CONTAGEM]):>9} "
+                      f"{formata_ns(percentil(serie, 0.5)):>9} {formata_ns(percentil(serie, 0.9)):>9} "
+                      f"{formata_ns(percentil(serie, 0.99)):>9} {formata_ns(serie[SOMA]):>9}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Percentis de espera e posse dos locks da arena, ao vivo")
+    parser.add_argument("--area", default=AREA_PADRAO, help="nome da área de memória compartilhada")
+    parser.add_argument("--intervalo", type=float, default=1.0, help="segundos entre atualizações")
+    parser.add_argument("--por-robo", action="store_true", help="mostra também uma linha por robô")
+    parser.add_argument("--uma-vez", action="store_true", help="imprime uma vez e sai")
+    args = parser.parse_args()
+
+    try:
+        estatisticas = EstatisticasLocks(nome=args.area, criar=False)
+    except FileNotFoundError:
+        sys.exit(f"área '{args.area}' não encontrada (rode o jogo com ARENA_LOCK_STATS=1)")
+
+    from constants import ROBOT_IDS
+    try:
+        while True:
+            if not args.uma_vez:
+                print("\033[H\033[J", end="")
+            imprime(estatisticas, ROBOT_IDS, args.por_robo)
+            if args.uma_vez:
+                break
+            time.sleep(args.intervalo)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        estatisticas.fecha()
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,31 @@
-import time
 from constants import GRID_WIDTH, GRID_HEIGHT		# Importa as constantes de constants.py
+from renderizador import RenderizadorDiff
+import celulas
 
-def char_repr(b):
-    """Converte byte para caractere ASCII para exibir no terminal."""
-    if b == b' ':
-        return ' '
-    return b.decode('utf-8')
+# Linhas do grid chegam como bytes crus (células de 32 bits); textos fixos já são str
+def converte_linha(linha):
+    return linha if isinstance(linha, str) else celulas.texto(linha)
 
-def viewer_process(grid, flags):
-    print("=== Arena dos Robôs (Viewer) ===\n")
+# Linhas de um quadro: título, uma linha crua por linha do grid e rodapé
+def monta_linhas(quadro, titulo="=== Arena dos Robôs (Viewer) ===", rodape="Ctrl+C para sair.",
+                 largura=GRID_WIDTH, altura=GRID_HEIGHT):
+    largura_linha = largura * celulas.TAMANHO_CELULA
+    linhas = [titulo, '']
+    linhas += [quadro[y * largura_linha:(y + 1) * largura_linha] for y in range(altura)]
+    linhas.append('')
+    linhas.append(rodape)
+    return linhas
 
-    while not flags['game_over']:			# acesso direto, sem .value
-        # Monta uma string para o grid atual
-        output = []
-        for y in range(GRID_HEIGHT):
-            linha = ''
-            for x in range(GRID_WIDTH):
-                idx = y * GRID_WIDTH + x
-                linha += char_repr(grid[idx])
-            output.append(linha)
+def viewer_process(grid, regioes, flags, max_fps=10):
+    renderizador = RenderizadorDiff(max_fps, converte=converte_linha)
 
-        # Limpa tela e imprime o grid (usando ANSI simples)
-        print("\033[H\033[J", end='')			# ANSI escape para limpar tela
-        print('\n'.join(output))
-        print("\nCtrl+C para sair.")
+    while not flags.game_over:			# leitura direta da memória compartilhada
+        # Copia o grid inteiro de uma vez (snapshot consistente, sem lock)
+        quadro = regioes.snapshot(grid)
 
-        time.sleep(0.1)
+        # Emite só as células que mudaram desde o último quadro
+        renderizador.desenha(monta_linhas(quadro))
+        renderizador.espera_quadro()
 
-    print("Viewer finalizado - jogo acabou.")
+    renderizador.fim()
+    print("Viewer finalizado - jogo acabou.")
\ No newline at end of file
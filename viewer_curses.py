@@ -0,0 +1,302 @@
+"""
+Viewer em curses para arenas maiores que o terminal.
+
+Em vez do grid inteiro, desenha só a janela visível (viewport), que pode ser
+rolada ou seguir um robô, ao lado de um painel com:
+    - minimapa com a densidade de robôs vivos em cada região da arena e o
+      retângulo da janela visível
+    - status ao vivo: robôs vivos, o robô seguido e os de maior energia
+
+O custo de um quadro não depende do tamanho da arena: só as linhas da janela
+são copiadas do grid (snapshot consistente por seqlock, sem lock), só as
+células que mudaram na janela são reescritas, e o minimapa e o status são
+montados a partir da tabela de robôs, sem varrer o grid.
+
+    python3 main.py --curses
+    ARENA_GRID_WIDTH=2000 ARENA_GRID_HEIGHT=1000 ARENA_NUM_ROBOTS=500 python3 main.py --curses
+    python3 robot_v2.py --curses
+
+Teclas: setas ou hjkl rolam (HJKL rolam uma tela), f/F seguem o próximo/
+anterior robô vivo, c para de seguir, q fecha o viewer (a partida continua).
+"""
+
+import curses
+import heapq
+import os
+import time
+import celulas
+
+PAINEL = 28                 # Largura do painel lateral, com a borda
+MINIMAPA_ALTURA = 10
+DENSIDADE = " .:-=+*#%@"
+ROBOS_NO_PAINEL = 8
+
+# Trechos inalterados menores que isto são reescritos junto com as mudanças
+# vizinhas (como em renderizador.py)
+LACUNA_MINIMA = 4
+
+# Símbolo do minimapa para `n` robôs numa região (`maximo` = região mais cheia)
+def simbolo_densidade(n, maximo):
+    if n == 0:
+        return DENSIDADE[0]
+    return DENSIDADE[-(-n * (len(DENSIDADE) - 1) // maximo)]
+
+# Trechos (coluna, texto) que levam a linha `antigo` à linha `novo`
+def trechos_alterados(antigo, novo):
+    if antigo is None or len(antigo) != len(novo):
+        return [(0, novo)]
+    trechos = []
+    mudou = [x for x in range(len(novo)) if antigo[x] != novo[x]]
+    i = 0
+    while i < len(mudou):
+        inicio = fim = mudou[i]
+        i += 1
+        while i < len(mudou) and mudou[i] - fim <= LACUNA_MINIMA:
+            fim = mudou[i]
+            i += 1
+        trechos.append((inicio, novo[inicio:fim + 1]))
+    return trechos
+
+"""
+Estado do viewer: origem da janela, robô seguido e as linhas desenhadas no
+quadro anterior (bytes crus e texto), para reescrever só o que mudou.
+`robo(i)` retorna (coluna, linha, energia, vivo) do robô de índice i, então
+o mesmo viewer serve para main.py e para robot_v2.py.
+"""
+class ViewerCurses():
+    def __init__(self, tela, grid, regioes, largura, altura, ids, robo):
+        self.tela = tela
+        self.grid = grid
+        self.regioes = regioes
+        self.largura = largura
+        self.altura = altura
+        self.ids = ids
+        self.robo = robo
+        self.x0 = 0
+        self.y0 = 0
+        self.seguindo = None
+        self.anteriores = {}        # Linha da janela -> (bytes crus, texto)
+        self.origem_anterior = None
+        self.destaque = None
+        self._dimensoes()
+
+    # Tamanho da janela do grid para o tamanho atual do terminal
+    def _dimensoes(self):
+        linhas, colunas = self.tela.getmaxyx()
+        self.linhas_tela = linhas
+        self.colunas_tela = colunas
+        self.janela_largura = max(1, min(self.largura, colunas - PAINEL))
+        self.janela_altura = max(1, min(self.altura, linhas - 2))
+        self.tela.erase()
+        self.anteriores = {}
+        self.destaque = None
+
+    def _limita(self):
+        self.x0 = max(0, min(self.x0, self.largura - self.janela_largura))
+        self.y0 = max(0, min(self.y0, self.altura - self.janela_altura))
+
+    def _rola(self, dx, dy):
+        self.seguindo = None
+        self.x0 += dx
+        self.y0 += dy
+        self._limita()
+
+    # Próximo robô vivo a seguir, a partir do atual, no sentido `passo`
+    def _segue(self, passo):
+        n = len(self.ids)
+        atual = self.seguindo if self.seguindo is not None else (-1 if passo > 0 else n)
+        for k in range(1, n + 1):
+            i = (atual + passo * k) % n
+            if self.robo(i)[3]:
+                self.seguindo = i
+                return
+
+    # Lê as teclas pendentes; retorna False para fechar o viewer
+    def teclas(self):
+        while True:
+            tecla = self.tela.getch()
+            if tecla == -1:
+                return True
+            if tecla in (ord('q'), ord('Q')):
+                return False
+            if tecla == curses.KEY_RESIZE:
+                self._dimensoes()
+            elif tecla in (curses.KEY_LEFT, ord('h')):
+                self._rola(-1, 0)
+            elif tecla in (curses.KEY_RIGHT, ord('l')):
+                self._rola(1, 0)
+            elif tecla in (curses.KEY_UP, ord('k')):
+                self._rola(0, -1)
+            elif tecla in (curses.KEY_DOWN, ord('j')):
+                self._rola(0, 1)
+            elif tecla == ord('H'):
+                self._rola(-self.janela_largura, 0)
+            elif tecla == ord('L'):
+                self._rola(self.janela_largura, 0)
+            elif tecla in (curses.KEY_PPAGE, ord('K')):
+                self._rola(0, -self.janela_altura)
+            elif tecla in (curses.KEY_NPAGE, ord('J')):
+                self._rola(0, self.janela_altura)
+            elif tecla == ord('f'):
+                self._segue(1)
+            elif tecla == ord('F'):
+                self._segue(-1)
+            elif tecla == ord('c'):
+                self.seguindo = None
+
+    def _escreve(self, y, x, texto, atributo=curses.A_NORMAL):
+        # A última célula da tela não pode ser escrita sem erro em curses
+        largura = self.colunas_tela - x - (1 if y == self.linhas_tela - 1 else 0)
+        if 0 <= y < self.linhas_tela and largura > 0:
+            self.tela.addnstr(y, x, texto, largura, atributo)
+
+    # Janela do grid: só as células que mudaram desde o último quadro
+    def _desenha_janela(self):
+        if self.seguindo is not None:
+            coluna, linha, _, vivo = self.robo(self.seguindo)
+            if vivo:
+                self.x0 = coluna - self.janela_largura // 2
+                self.y0 = linha - self.janela_altura // 2
+                self._limita()
+
+        x1 = self.x0 + self.janela_largura
+        y1 = self.y0 + self.janela_altura
+        if self.origem_anterior != (self.x0, self.y0):
+            # Janela rolou: as linhas anteriores não valem mais
+            self.anteriores = {}
+            self.origem_anterior = (self.x0, self.y0)
+            self.destaque = None
+
+        dados = self.regioes.snapshot_janela(self.grid, self.x0, self.y0, x1, y1)
+        tam_linha = self.janela_largura * celulas.TAMANHO_CELULA
+        for r in range(self.janela_altura):
+            crua = dados[r * tam_linha:(r + 1) * tam_linha]
+            anterior = self.anteriores.get(r)
+            if anterior is not None and anterior[0] == crua:
+                continue
+            texto = celulas.texto(crua)
+            for coluna, trecho in trechos_alterados(anterior and anterior[1], texto):
+                self._escreve(1 + r, coluna, trecho)
+            self.anteriores[r] = (crua, texto)
+
+        # Robô seguido em destaque (a célula antiga volta ao normal)
+        destaque = None
+        if self.seguindo is not None:
+            coluna, linha, _, vivo = self.robo(self.seguindo)
+            if vivo and self.x0 <= coluna < x1 and self.y0 <= linha < y1:
+                destaque = (1 + linha - self.y0, coluna - self.x0)
+        if destaque != self.destaque:
+            if self.destaque is not None:
+                self.tela.chgat(*self.destaque, 1, curses.A_NORMAL)
+            self.destaque = destaque
+        if destaque is not None:
+            self.tela.chgat(*destaque, 1, curses.A_REVERSE)
+
+    # Minimapa e status, montados a partir da tabela de robôs
+    def _desenha_painel(self, robos):
+        x = self.janela_largura + 1
+        largura = min(PAINEL - 2, self.colunas_tela - x - 1)
+        if largura <= 0:
+            return
+        for y in range(1, self.linhas_tela - 1):
+            self._escreve(y, x - 1, '│')
+
+        contagem = [0] * (largura * MINIMAPA_ALTURA)
+        for coluna, linha, *_ in robos:
+            contagem[(linha * MINIMAPA_ALTURA // self.altura) * largura + coluna * largura // self.largura] += 1
+        maximo = max(contagem) if robos else 0
+
+        # Retângulo da janela visível no minimapa
+        jx0 = self.x0 * largura // self.largura
+        jx1 = (self.x0 + self.janela_largura - 1) * largura // self.largura
+        jy0 = self.y0 * MINIMAPA_ALTURA // self.altura
+        jy1 = (self.y0 + self.janela_altura - 1) * MINIMAPA_ALTURA // self.altura
+        for my in range(MINIMAPA_ALTURA):
+            linha = ''.join(simbolo_densidade(n, maximo) for n in contagem[my * largura:(my + 1) * largura])
+            self._escreve(1 + my, x, linha)
+            if jy0 <= my <= jy1:
+                self.tela.chgat(1 + my, x + jx0, jx1 - jx0 + 1, curses.A_REVERSE)
+
+        status = [f"Vivos: {len(robos)}/{len(self.ids)}", ""]
+        if self.seguindo is not None:
+            coluna, linha, energia, vivo = self.robo(self.seguindo)
+            estado = f"E={energia} ({coluna},{linha})" if vivo else "fora do jogo"
+            status.append(f"Seguindo {self.ids[self.seguindo]}: {estado}")
+        else:
+            status.append("Seguindo: nenhum (f)")
+        status += ["", "Maior energia:"]
+        for energia, i in heapq.nlargest(ROBOS_NO_PAINEL, ((r[2], i) for i, r in enumerate(robos))):
+            coluna, linha = robos[i][0], robos[i][1]
+            status.append(f"{robos[i][4]:>4} E={energia:<4} ({coluna},{linha})")
+
+        y = 2 + MINIMAPA_ALTURA
+        for texto in status:
+            if y >= self.linhas_tela - 1:
+                break
+            self._escreve(y, x, texto.ljust(largura)[:largura])
+            y += 1
+        # Linhas que sobraram do quadro anterior (menos robôs no ranking)
+        while y < min(2 + MINIMAPA_ALTURA + 4 + ROBOS_NO_PAINEL, self.linhas_tela - 1):
+            self._escreve(y, x, ' ' * largura)
+            y += 1
+
+    def desenha(self):
+        robos = []
+        for i in range(len(self.ids)):
+            coluna, linha, energia, vivo = self.robo(i)
+            if vivo:
+                robos.append((coluna, linha, energia, i, self.ids[i]))
+
+        titulo = (f"=== Arena dos Robôs === colunas {self.x0}-{self.x0 + self.janela_largura - 1}, "
+                  f"linhas {self.y0}-{self.y0 + self.janela_altura - 1} de {self.largura}x{self.altura}")
+        self._escreve(0, 0, titulo.ljust(self.colunas_tela))
+        self._desenha_janela()
+        self._desenha_painel(robos)
+        self._escreve(self.linhas_tela - 1, 0,
+                      "setas/hjkl: rolar  HJKL: uma tela  f/F: seguir robô  c: soltar  q: fechar".ljust(self.colunas_tela),
+                      curses.A_DIM)
+        self.tela.noutrefresh()
+        curses.doupdate()
+
+    def executa(self, fim, max_fps=10):
+        periodo = 1.0 / max_fps
+        proximo = time.monotonic()
+        while not fim():
+            if not self.teclas():
+                return
+            self.desenha()
+            # Mesmo ritmo de renderizador.py: sob carga, pula os quadros atrasados
+            proximo = max(proximo + periodo, time.monotonic())
+            time.sleep(max(0.0, proximo - time.monotonic()))
+
+def executa_curses(grid, regioes, largura, altura, ids, robo, fim, max_fps=10):
+    """
+    Roda o viewer no terminal até `fim()` ficar verdadeiro ou o usuário
+    fechá-lo. `robo(i)` retorna (coluna, linha, energia, vivo).
+    """
+    # O multiprocessing troca a entrada dos processos filhos por /dev/null:
+    # o teclado é lido direto do terminal
+    try:
+        tty = os.open('/dev/tty', os.O_RDONLY)
+        os.dup2(tty, 0)
+        os.close(tty)
+    except OSError:
+        pass
+
+    def inicia(tela):
+        curses.curs_set(0)
+        tela.nodelay(True)
+        tela.keypad(True)
+        ViewerCurses(tela, grid, regioes, largura, altura, ids, robo).executa(fim, max_fps)
+
+    curses.wrapper(inicia)
+
+# Processo do viewer de main.py: posições e energia vêm das tabelas compartilhadas
+def viewer_curses_process(grid, regioes, posicoes, flags, largura, altura, ids, max_fps=10):
+    def robo(i):
+        coluna, linha = posicoes[2 * i], posicoes[2 * i + 1]
+        energia = flags.robos[i].energia
+        return coluna, linha, energia, energia > 0 and coluna >= 0
+
+    executa_curses(grid, regioes, largura, altura, ids, robo, lambda: flags.game_over, max_fps)
+    print("Viewer finalizado - jogo acabou." if flags.game_over else "Viewer fechado.")